@@ -59,11 +59,12 @@ def run_bot():
         logger.error(f"❌ Ошибка запуска бота: {e}")
         raise
 
-def run_web():
+def run_web(wait_for_bot: bool = True):
     """Запуск веб-сервера"""
     try:
         logger.info("🌐 Запуск веб-сервера...")
-        time.sleep(3)  # Даем боту время запуститься
+        if wait_for_bot:
+            time.sleep(3)  # Даем боту время запуститься
         
         # Импортируем и запускаем веб-сервер
         from party_bot.web import app
@@ -75,8 +76,24 @@ def run_web():
         logger.error(f"❌ Ошибка запуска веб-сервера: {e}")
         raise
 
+def run_bot_only():
+    """Только Discord бот: веб-панель запускается отдельно (gunicorn party_bot.web:app)
+    и передаёт боту команды через command_bus.db и Unix-сокет"""
+    print("=" * 60)
+    print("🤖 BIGBOT: только Discord бот (веб-панель — отдельный процесс)")
+    print("=" * 60)
+    run_bot()
+
 def main():
     """Главная функция запуска"""
+    if "--bot-only" in sys.argv[1:]:
+        run_bot_only()
+        return
+    if "--web-only" in sys.argv[1:]:
+        # Для разработки; в продакшене — gunicorn с несколькими воркерами (см. Procfile)
+        run_web(wait_for_bot=False)
+        return
+
     print("=" * 60)
     print("🚀 BIGBOT: Объединенный Discord бот + веб-интерфейс")
     print("=" * 60)
@@ -0,0 +1,166 @@
+"""
+Постоянный мост из синхронного кода (Flask) в asyncio.
+Один фоновый поток держит цикл событий на всё время жизни процесса;
+маршруты вызывают корутины через run_sync() вместо asyncio.run(), который
+создаёт и разрушает цикл (и потоки aiosqlite) на каждый запрос.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+DEFAULT_TIMEOUT = 10.0
+
+# Верхние границы корзин гистограммы задержек, мс
+LATENCY_BUCKETS_MS = (1, 5, 20, 100, 500, 2000)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class AsyncBridge:
+    """Фоновый цикл событий и синхронный вызов корутин в нём"""
+
+    def __init__(self, name: str = "web-async", timeout: float = None):
+        self.name = name
+        self.timeout = timeout if timeout is not None else _env_float("WEB_ASYNC_TIMEOUT", DEFAULT_TIMEOUT)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Вызываются в потоке цикла при его создании (например, включение пула БД)
+        self._startup_hooks: List[Callable[[asyncio.AbstractEventLoop], None]] = []
+        self.stats = {
+            "bridge_calls": 0,
+            "bridge_errors": 0,
+            "bridge_timeouts": 0,
+            "bridge_loops_created": 0,
+            "bridge_latency_ms_total": 0.0,
+            "bridge_latency_ms_max": 0.0,
+        }
+        self.latency_buckets = {bound: 0 for bound in LATENCY_BUCKETS_MS}
+        self.latency_buckets["inf"] = 0
+
+    # ---- Цикл ----
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            return loop
+        with self._lock:
+            if self._loop is not None and self._loop.is_running():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                for hook in list(self._startup_hooks):
+                    try:
+                        hook(loop)
+                    except Exception as e:
+                        print(f"⚠️ Ошибка стартового хука {self.name}: {e}")
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=_run, name=self.name, daemon=True)
+            self._thread.start()
+            started.wait()
+            self._loop = loop
+            self.stats["bridge_loops_created"] += 1
+            return loop
+
+    def add_startup_hook(self, hook: Callable[[asyncio.AbstractEventLoop], None]):
+        """Зарегистрировать hook(loop); если цикл уже запущен — вызвать в нём сейчас"""
+        with self._lock:
+            self._startup_hooks.append(hook)
+            loop = self._loop
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(hook, loop)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._ensure_loop()
+
+    # ---- Вызовы ----
+
+    def run_sync(self, coro: Coroutine, timeout: float = None) -> Any:
+        """Выполнить корутину в фоновом цикле и дождаться результата.
+        По таймауту корутина отменяется, наружу уходит TimeoutError.
+        """
+        if self._thread is not None and threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run_sync нельзя вызывать из потока самого моста")
+        loop = self._ensure_loop()
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        self.stats["bridge_calls"] += 1
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.stats["bridge_timeouts"] += 1
+            raise TimeoutError(f"Корутина не завершилась за {timeout} с")
+        except Exception:
+            self.stats["bridge_errors"] += 1
+            raise
+        finally:
+            self._record_latency((time.perf_counter() - started) * 1000)
+
+    def _record_latency(self, elapsed_ms: float):
+        self.stats["bridge_latency_ms_total"] += elapsed_ms
+        if elapsed_ms > self.stats["bridge_latency_ms_max"]:
+            self.stats["bridge_latency_ms_max"] = elapsed_ms
+        for bound in LATENCY_BUCKETS_MS:
+            if elapsed_ms <= bound:
+                self.latency_buckets[bound] += 1
+                return
+        self.latency_buckets["inf"] += 1
+
+    def shutdown(self, timeout: float = 5.0):
+        """Остановить фоновый цикл (при завершении процесса)"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["bridge_latency_ms_avg"] = stats["bridge_latency_ms_total"] / max(stats["bridge_calls"], 1)
+        stats["bridge_latency_buckets_ms"] = {
+            (f"le_{bound}" if bound != "inf" else "inf"): count
+            for bound, count in self.latency_buckets.items()
+        }
+        return stats
+
+
+# Глобальный экземпляр для быстрого доступа
+_bridge_instance: Optional[AsyncBridge] = None
+_bridge_lock = threading.Lock()
+
+
+def get_async_bridge() -> AsyncBridge:
+    """Получить глобальный мост веб-процесса"""
+    global _bridge_instance
+    if _bridge_instance is None:
+        with _bridge_lock:
+            if _bridge_instance is None:
+                _bridge_instance = AsyncBridge()
+    return _bridge_instance
+
+
+def run_sync(coro: Coroutine, timeout: float = None) -> Any:
+    """Выполнить корутину в общем фоновом цикле веб-процесса"""
+    return get_async_bridge().run_sync(coro, timeout)
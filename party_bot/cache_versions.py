@@ -0,0 +1,124 @@
+"""
+Версии кэшей, общие для процессов бота и веб-панели.
+Веб в режиме gunicorn не получает событий гейтвея: бот увеличивает счётчик
+в таблице cache_versions (command_bus.db), а воркеры сверяют его и сбрасывают
+свои кэши, когда счётчик изменился. Таблица читается целиком не чаще раза
+в WEB_CACHE_VERSION_INTERVAL секунд.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from party_bot.command_bus import BUSY_TIMEOUT_MS, COMMAND_DB_PATH
+
+DEFAULT_REFRESH_INTERVAL = 2.0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class SharedVersions:
+    """Счётчики версий в SQLite: бот увеличивает, веб-воркеры сверяют"""
+
+    def __init__(self, db_path: str = None, refresh_interval: float = None):
+        self.db_path = os.path.abspath(db_path or COMMAND_DB_PATH)
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else _env_float("WEB_CACHE_VERSION_INTERVAL", DEFAULT_REFRESH_INTERVAL)
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._next_refresh = 0.0
+        self.stats = {"bumps": 0, "refreshes": 0, "errors": 0}
+        self._init_database()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    def _init_database(self):
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                key TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    def bump(self, *keys: str):
+        """Увеличить версии ключей (вызывать вне цикла бота: это запись в SQLite)"""
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO cache_versions (key, version) VALUES (?, 1) "
+                    "ON CONFLICT(key) DO UPDATE SET version = version + 1",
+                    [(key,) for key in keys],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            print(f"⚠️ Не удалось обновить версии кэшей {keys}: {e}")
+            return
+        with self._lock:
+            self.stats["bumps"] += 1
+            # Свой процесс видит изменение сразу, без ожидания интервала
+            self._next_refresh = 0.0
+
+    def get(self, key: str) -> int:
+        """Текущая версия ключа (снимок таблицы не старше refresh_interval)"""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_refresh:
+                return self._versions.get(key, 0)
+            self._next_refresh = now + self.refresh_interval
+        try:
+            rows = self._connection().execute("SELECT key, version FROM cache_versions").fetchall()
+        except sqlite3.Error as e:
+            print(f"⚠️ Не удалось прочитать версии кэшей: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+                return self._versions.get(key, 0)
+        with self._lock:
+            self._versions = dict(rows)
+            self.stats["refreshes"] += 1
+            return self._versions.get(key, 0)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["keys"] = len(self._versions)
+        return stats
+
+
+# Глобальный экземпляр для быстрого доступа
+_versions_instance: Optional[SharedVersions] = None
+_versions_instance_lock = threading.Lock()
+
+
+def get_shared_versions() -> SharedVersions:
+    """Получить общие версии кэшей"""
+    global _versions_instance
+    if _versions_instance is None:
+        with _versions_instance_lock:
+            if _versions_instance is None:
+                _versions_instance = SharedVersions()
+    return _versions_instance
@@ -0,0 +1,549 @@
+"""
+Шина команд от веб-панели к боту (вместо опроса command_queue.json).
+
+Если бот работает в том же процессе, что и веб (bot_main.py), команда
+передаётся напрямую в asyncio.Queue цикла бота. Если веб работает отдельно
+(gunicorn), команда записывается в command_bus.db (SQLite, WAL), а бот
+будится датаграммой в Unix-сокет; при недоступном сокете бот опрашивает
+таблицу раз в несколько секунд.
+
+Доставка «хотя бы один раз»: взятая ботом команда получает аренду, и если
+бот упал, не завершив её, после истечения аренды команда выполнится снова.
+Повторная отправка с тем же ключом идемпотентности возвращает уже
+существующую команду. Результат выполнения доступен по id команды.
+Обработчик, не уложившийся в таймаут, не отменяется: команда получает
+статус timeout («результат неизвестен»), а итог записывается, когда
+обработчик всё же завершится.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMAND_DB_PATH = os.path.join(BASE_DIR, "command_bus.db")
+DEFAULT_SOCKET_PATH = os.path.join(BASE_DIR, "command_bus.sock")
+# Старая файловая очередь (переносится в шину при запуске бота)
+LEGACY_QUEUE_FILE = "command_queue.json"
+
+BUSY_TIMEOUT_MS = 5000
+LEASE_SECONDS = 60.0
+POLL_INTERVAL = 5.0
+CLAIM_BATCH = 10
+# Дольше этого бот не подтверждает команду и отдаёт статус timeout (меньше аренды, чтобы не было повторной доставки)
+HANDLER_TIMEOUT = 30.0
+# Верхние границы корзин гистограммы задержки команд, мс
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Сколько хранить выполненные команды в БД и в памяти
+KEEP_DONE_SECONDS = 7 * 24 * 3600
+MAX_LOCAL_RECORDS = 1000
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+# Обработчик не завершился за HANDLER_TIMEOUT: действие могло выполниться, итог запишется позже
+STATUS_TIMEOUT = "timeout"
+FINISHED = (STATUS_DONE, STATUS_FAILED, STATUS_TIMEOUT)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class CommandStore:
+    """Надёжная очередь команд в SQLite (общая для процессов веба и бота)"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = os.path.abspath(db_path or COMMAND_DB_PATH)
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._init_database()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_database(self):
+        with self.lock:
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS commands (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    idempotency_key TEXT UNIQUE,
+                    type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_commands_status ON commands(status, seq)")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "idempotency_key": row["idempotency_key"],
+            "type": row["type"],
+            "payload": json.loads(row["payload"]),
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def enqueue(self, command_type: str, payload: Dict[str, Any], idempotency_key: str = None) -> Dict[str, Any]:
+        """Поставить команду; с тем же ключом идемпотентности вернуть уже существующую
+        (у записи тогда duplicate=True)"""
+        conn = self._connection()
+        with self.lock:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO commands (id, idempotency_key, type, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (uuid.uuid4().hex, idempotency_key, command_type,
+                 json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+            if idempotency_key:
+                row = conn.execute("SELECT * FROM commands WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+            else:
+                row = conn.execute("SELECT * FROM commands WHERE seq = last_insert_rowid()").fetchone()
+        record = self._to_dict(row)
+        record["duplicate"] = cursor.rowcount == 0
+        return record
+
+    def claim(self, limit: int = CLAIM_BATCH, lease: float = LEASE_SECONDS) -> List[Dict[str, Any]]:
+        """Взять ожидающие команды (и команды с истёкшей арендой) в работу"""
+        conn = self._connection()
+        now = time.time()
+        with self.lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT * FROM commands WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY seq LIMIT ?",
+                    (STATUS_PENDING, STATUS_RUNNING, now, limit),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE commands SET status = ?, attempts = attempts + 1, lease_until = ? WHERE seq = ?",
+                    [(STATUS_RUNNING, now + lease, row["seq"]) for row in rows],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        claimed = [self._to_dict(row) for row in rows]
+        for command in claimed:
+            command["status"] = STATUS_RUNNING
+            command["attempts"] += 1
+        return claimed
+
+    def finish(self, command_id: str, status: str, result: Any = None, error: str = None):
+        conn = self._connection()
+        with self.lock:
+            conn.execute(
+                "UPDATE commands SET status = ?, result = ?, error = ?, lease_until = NULL, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                 error, time.time(), command_id),
+            )
+
+    def get(self, command_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT * FROM commands WHERE id = ?", (command_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def purge(self, older_than: float = KEEP_DONE_SECONDS) -> int:
+        """Удалить давно завершённые команды"""
+        conn = self._connection()
+        with self.lock:
+            cursor = conn.execute(
+                "DELETE FROM commands WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (*FINISHED, time.time() - older_than),
+            )
+        return cursor.rowcount
+
+    def latency_by_type(self) -> Dict[str, Dict[str, Any]]:
+        """Гистограммы задержки завершённых команд по типам, посчитанные по БД:
+        их видит любой процесс (воркеры gunicorn), окно — срок хранения команд."""
+        bucket_case = " ".join(f"WHEN ms <= {bound} THEN 'le_{bound}'" for bound in LATENCY_BUCKETS_MS)
+        conn = self._connection()
+        timings = (
+            "SELECT type, (finished_at - created_at) * 1000 AS ms FROM commands "
+            f"WHERE finished_at IS NOT NULL AND status != '{STATUS_TIMEOUT}'"
+        )
+        totals = conn.execute(
+            f"SELECT type, COUNT(*), SUM(ms), MAX(ms) FROM ({timings}) GROUP BY type"
+        ).fetchall()
+        buckets = conn.execute(
+            f"SELECT type, CASE {bucket_case} ELSE 'inf' END AS bucket, COUNT(*) FROM ({timings}) GROUP BY type, bucket"
+        ).fetchall()
+        latency = {
+            command_type: {"count": count, "ms_total": ms_total or 0.0, "ms_max": ms_max or 0.0, "buckets": _empty_buckets()}
+            for command_type, count, ms_total, ms_max in totals
+        }
+        for command_type, bucket, count in buckets:
+            latency[command_type]["buckets"][bucket] = count
+        return latency
+
+
+def _empty_buckets() -> Dict[str, int]:
+    return {**{f"le_{bound}": 0 for bound in LATENCY_BUCKETS_MS}, "inf": 0}
+
+
+class CommandBus:
+    """Отправка команд (веб) и их выполнение (цикл бота)"""
+
+    def __init__(self, store: CommandStore = None, socket_path: str = None):
+        self._store = store
+        self.socket_path = socket_path or os.getenv("COMMAND_BUS_SOCKET", DEFAULT_SOCKET_PATH)
+        self.poll_interval = _env_float("COMMAND_BUS_POLL_INTERVAL", POLL_INTERVAL)
+        self.handler_timeout = min(_env_float("COMMAND_BUS_HANDLER_TIMEOUT", HANDLER_TIMEOUT), LEASE_SECONDS)
+        self._handlers: Dict[str, Handler] = {}
+        # Локальная доставка: цикл и очередь бота, если он работает в этом процессе
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._local_records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._local_keys: Dict[str, str] = {}
+        self._done_events: Dict[str, threading.Event] = {}
+        # Обработчики, пережившие таймаут: их итог запишется после завершения
+        self._late: set = set()
+        self._lock = threading.Lock()
+        self.stats = {
+            "submitted_local": 0,
+            "submitted_durable": 0,
+            "duplicates": 0,
+            "executed": 0,
+            "failed": 0,
+            "redelivered": 0,
+            "wakeups": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0,
+            "timeouts": 0,
+        }
+        # Команды локальной доставки (в БД их нет): type -> {"count", "ms_total", "ms_max", "buckets": {...}}
+        self.latency: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def store(self) -> CommandStore:
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = CommandStore()
+        return self._store
+
+    def register(self, command_type: str, handler: Handler):
+        """Обработчик команды: async handler(payload) -> результат (JSON-совместимый)"""
+        self._handlers[command_type] = handler
+
+    def _local_active(self) -> bool:
+        loop = self._loop
+        return loop is not None and loop.is_running() and not loop.is_closed()
+
+    # ---- Отправка (любой поток) ----
+
+    def submit(self, command_type: str, payload: Dict[str, Any], idempotency_key: str = None) -> Dict[str, Any]:
+        """Отправить команду боту; вернуть запись команды (id, status, ...)"""
+        if self._local_active():
+            return self._submit_local(command_type, payload, idempotency_key)
+        record = self.store.enqueue(command_type, payload, idempotency_key)
+        if record["duplicate"]:
+            self.stats["duplicates"] += 1
+        else:
+            self.stats["submitted_durable"] += 1
+            self._notify()
+        return record
+
+    def _submit_local(self, command_type: str, payload: Dict[str, Any], idempotency_key: str = None) -> Dict[str, Any]:
+        with self._lock:
+            existing_id = self._local_keys.get(idempotency_key) if idempotency_key else None
+            if existing_id and existing_id in self._local_records:
+                self.stats["duplicates"] += 1
+                return dict(self._local_records[existing_id], duplicate=True)
+            record = {
+                "id": uuid.uuid4().hex,
+                "idempotency_key": idempotency_key,
+                "type": command_type,
+                "payload": payload,
+                "status": STATUS_PENDING,
+                "result": None,
+                "error": None,
+                "attempts": 0,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+            self._local_records[record["id"]] = record
+            if idempotency_key:
+                self._local_keys[idempotency_key] = record["id"]
+            self._done_events[record["id"]] = threading.Event()
+            while len(self._local_records) > MAX_LOCAL_RECORDS:
+                old_id, old = self._local_records.popitem(last=False)
+                self._done_events.pop(old_id, None)
+                if old.get("idempotency_key"):
+                    self._local_keys.pop(old["idempotency_key"], None)
+            self.stats["submitted_local"] += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, record)
+        return dict(record, duplicate=False)
+
+    def _notify(self):
+        # Разбудить бота в другом процессе; не вышло — он найдёт команду при опросе
+        if not hasattr(socket, "AF_UNIX"):
+            return
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                sock.setblocking(False)
+                sock.sendto(b"1", self.socket_path)
+        except OSError:
+            pass
+
+    def get(self, command_id: str) -> Optional[Dict[str, Any]]:
+        """Текущее состояние команды (None — неизвестна)"""
+        with self._lock:
+            record = self._local_records.get(command_id)
+            if record is not None:
+                return dict(record)
+        return self.store.get(command_id)
+
+    def wait(self, command_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Подождать завершения команды не дольше timeout; вернуть её состояние"""
+        event = self._done_events.get(command_id)
+        if event is not None:
+            event.wait(timeout)
+            return self.get(command_id)
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while True:
+            record = self.get(command_id)
+            if record is None or record["status"] in FINISHED or time.monotonic() >= deadline:
+                return record
+            time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, 0.5)
+
+    # ---- Выполнение (цикл бота) ----
+
+    async def serve(self, run_blocking: Callable[..., Awaitable[Any]] = None):
+        """Принимать команды в текущем цикле (запускается ботом один раз)"""
+        if self._local_active():
+            return
+        loop = asyncio.get_running_loop()
+        if run_blocking is None:
+            async def run_blocking(func, *args):
+                return await loop.run_in_executor(None, func, *args)
+        self._queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._loop = loop
+
+        sock = self._bind_wakeup_socket(loop)
+        try:
+            moved = await run_blocking(self._import_legacy_queue)
+            if moved:
+                print(f"📥 Перенесено команд из {LEGACY_QUEUE_FILE}: {moved}")
+            await run_blocking(self.store.purge)
+            await asyncio.gather(self._serve_local(), self._serve_durable(run_blocking))
+        finally:
+            self._loop = None
+            if sock is not None:
+                loop.remove_reader(sock.fileno())
+                sock.close()
+
+    def _bind_wakeup_socket(self, loop: asyncio.AbstractEventLoop) -> Optional[socket.socket]:
+        if not hasattr(socket, "AF_UNIX"):
+            print(f"ℹ️ Шина команд: Unix-сокеты недоступны, опрос раз в {self.poll_interval:g} с")
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            sock.bind(self.socket_path)
+            sock.setblocking(False)
+        except OSError as e:
+            sock.close()
+            print(f"⚠️ Шина команд: сокет {self.socket_path} недоступен ({e}), опрос раз в {self.poll_interval:g} с")
+            return None
+        loop.add_reader(sock.fileno(), self._on_wakeup, sock)
+        return sock
+
+    def _on_wakeup(self, sock: socket.socket):
+        try:
+            while sock.recv(64):
+                pass
+        except OSError:
+            pass
+        self.stats["wakeups"] += 1
+        self._wakeup.set()
+
+    def _import_legacy_queue(self) -> int:
+        if not os.path.exists(LEGACY_QUEUE_FILE):
+            return 0
+        try:
+            with open(LEGACY_QUEUE_FILE, "r", encoding="utf-8") as f:
+                commands = json.load(f) or []
+        except (OSError, json.JSONDecodeError):
+            commands = []
+        for command in commands:
+            payload = {k: v for k, v in command.items() if k != "type"}
+            self.store.enqueue(command.get("type", "unknown"), payload)
+        os.remove(LEGACY_QUEUE_FILE)
+        return len(commands)
+
+    async def _serve_local(self):
+        while True:
+            record = await self._queue.get()
+            with self._lock:
+                record["status"] = STATUS_RUNNING
+                record["attempts"] += 1
+            await self._execute(record, functools.partial(self._finish_local, record))
+
+    async def _finish_local(self, record: Dict[str, Any], status: str, result: Any, error: Optional[str]):
+        with self._lock:
+            record.update(status=status, result=result, error=error, finished_at=time.time())
+            if status != STATUS_TIMEOUT:
+                self._record_latency(record["type"], (record["finished_at"] - record["created_at"]) * 1000)
+            event = self._done_events.get(record["id"])
+        if event is not None:
+            event.set()
+
+    async def _serve_durable(self, run_blocking):
+        while True:
+            try:
+                commands = await run_blocking(self.store.claim)
+            except Exception as e:
+                print(f"❌ Шина команд: ошибка чтения очереди: {e}")
+                commands = []
+            for command in commands:
+                if command["attempts"] > 1:
+                    self.stats["redelivered"] += 1
+                await self._execute(command, functools.partial(self._finish_durable, run_blocking, command["id"]))
+            if len(commands) == CLAIM_BATCH:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _finish_durable(self, run_blocking, command_id: str, status: str, result: Any, error: Optional[str]):
+        await run_blocking(self.store.finish, command_id, status, result, error)
+
+    async def _execute(self, command: Dict[str, Any], finish: Callable[[str, Any, Optional[str]], Awaitable[None]]):
+        """Выполнить команду и сохранить итог через finish(status, result, error).
+        По таймауту обработчик не отменяется: отмена между действием в Discord и записью
+        (например, между channel.send и save_event) оставила бы сообщение без ивента.
+        """
+        handler = self._handlers.get(command["type"])
+        if handler is None:
+            print(f"❌ Ошибка обработки команды {command['type']}: неизвестный тип команды")
+            self.stats["failed"] += 1
+            await finish(STATUS_FAILED, None, f"неизвестный тип команды: {command['type']}")
+            return
+        task = asyncio.ensure_future(handler(command["payload"]))
+        done, _ = await asyncio.wait({task}, timeout=self.handler_timeout)
+        if done:
+            await self._complete(command, task, finish)
+            return
+        print(f"⚠️ Команда {command['type']} не завершилась за {self.handler_timeout:g} с, итог будет записан позже")
+        self.stats["timeouts"] += 1
+        await finish(STATUS_TIMEOUT, None, f"Бот не подтвердил выполнение за {self.handler_timeout:g} с")
+        late = asyncio.ensure_future(self._complete_late(command, task, finish))
+        self._late.add(late)
+        late.add_done_callback(self._late.discard)
+
+    async def _complete_late(self, command: Dict[str, Any], task: asyncio.Future, finish):
+        await asyncio.wait({task})
+        await self._complete(command, task, finish)
+
+    async def _complete(self, command: Dict[str, Any], task: asyncio.Future, finish):
+        try:
+            result = task.result()
+            status, error = STATUS_DONE, None
+            self.stats["executed"] += 1
+        except asyncio.CancelledError:
+            status, result, error = STATUS_FAILED, None, "Операция отменена"
+            self.stats["failed"] += 1
+        except Exception as e:
+            print(f"❌ Ошибка обработки команды {command['type']}: {e}")
+            status, result, error = STATUS_FAILED, None, str(e)
+            self.stats["failed"] += 1
+        elapsed_ms = (time.time() - command["created_at"]) * 1000
+        self.stats["latency_ms_total"] += elapsed_ms
+        self.stats["latency_ms_max"] = max(self.stats["latency_ms_max"], elapsed_ms)
+        await finish(status, result, error)
+
+    def _record_latency(self, command_type: str, elapsed_ms: float):
+        # Время от постановки до завершения, включая ожидание в очереди
+        hist = self.latency.get(command_type)
+        if hist is None:
+            hist = self.latency[command_type] = {
+                "count": 0, "ms_total": 0.0, "ms_max": 0.0, "buckets": _empty_buckets(),
+            }
+        hist["count"] += 1
+        hist["ms_total"] += elapsed_ms
+        hist["ms_max"] = max(hist["ms_max"], elapsed_ms)
+        for bound in LATENCY_BUCKETS_MS:
+            if elapsed_ms <= bound:
+                hist["buckets"][f"le_{bound}"] += 1
+                return
+        hist["buckets"]["inf"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        finished = stats["executed"] + stats["failed"]
+        stats["latency_ms_avg"] = stats["latency_ms_total"] / max(finished, 1)
+        stats["local_consumer"] = self._local_active()
+        # Гистограммы: команды через БД (выполнены ботом в любом процессе) + локальная доставка
+        try:
+            latency = self.store.latency_by_type()
+        except sqlite3.Error as e:
+            print(f"⚠️ Шина команд: не удалось посчитать задержки по БД: {e}")
+            latency = {}
+        with self._lock:
+            for command_type, hist in self.latency.items():
+                merged = latency.setdefault(command_type, {"count": 0, "ms_total": 0.0, "ms_max": 0.0, "buckets": _empty_buckets()})
+                merged["count"] += hist["count"]
+                merged["ms_total"] += hist["ms_total"]
+                merged["ms_max"] = max(merged["ms_max"], hist["ms_max"])
+                for bucket, count in hist["buckets"].items():
+                    merged["buckets"][bucket] += count
+        for hist in latency.values():
+            hist["ms_avg"] = hist["ms_total"] / max(hist["count"], 1)
+        stats["latency_by_type"] = latency
+        return stats
+
+
+# Глобальный экземпляр для быстрого доступа
+_bus_instance: Optional[CommandBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_command_bus() -> CommandBus:
+    """Получить шину команд процесса"""
+    global _bus_instance
+    if _bus_instance is None:
+        with _bus_lock:
+            if _bus_instance is None:
+                _bus_instance = CommandBus()
+    return _bus_instance
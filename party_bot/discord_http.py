@@ -0,0 +1,279 @@
+"""
+Общий HTTP-клиент веб-панели для Discord REST API.
+Один requests.Session с пулом keep-alive соединений на весь процесс, таймауты
+и повторы, учёт лимитов Discord по корзинам (X-RateLimit-*): если корзина
+исчерпана, запрос заранее ждёт её сброса, а не получает 429.
+Для каждого маршрута ведётся статистика задержек и числа 429.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DISCORD_API_BASE_URL = "https://discord.com/api/v10"
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 10.0
+DEFAULT_MAX_RETRIES = 2
+# Дольше этого запрос не ждёт сброса лимита — вернётся ответ 429
+DEFAULT_MAX_RATE_LIMIT_WAIT = 10.0
+DEFAULT_POOL_SIZE = 16
+
+# Параметры пути, по которым Discord разделяет лимиты (major parameters)
+MAJOR_PARAMETERS = ("guilds", "channels", "webhooks")
+
+# Методы, которые безопасно повторять после сетевой ошибки или 5xx
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def route_key(method: str, path: str) -> str:
+    """Шаблон маршрута: ID после guilds/channels/webhooks сохраняются, остальные — {id}.
+    GET /guilds/1/members/2 -> 'GET /guilds/1/members/{id}'
+    """
+    path = path.split("?", 1)[0]
+    segments = path.strip("/").split("/")
+    for i, segment in enumerate(segments):
+        if segment.isdigit() and not (i and segments[i - 1] in MAJOR_PARAMETERS):
+            segments[i] = "{id}"
+    return f"{method.upper()} /" + "/".join(segments)
+
+
+def _auth_key(headers: Optional[Dict[str, str]]) -> str:
+    # Лимиты Discord считаются на токен: бот и каждый OAuth-пользователь отдельно
+    auth = (headers or {}).get("Authorization")
+    if not auth:
+        return "anon"
+    return hashlib.sha256(auth.encode("utf-8")).hexdigest()[:16]
+
+
+class _Bucket:
+    __slots__ = ("remaining", "reset_at")
+
+    def __init__(self):
+        self.remaining: Optional[int] = None  # None — лимит ещё неизвестен
+        self.reset_at = 0.0
+
+
+class RateLimiter:
+    """Состояние корзин лимитов Discord (без сетевого кода)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (auth, route) -> hash корзины из X-RateLimit-Bucket
+        self._route_buckets: Dict[Tuple[str, str], str] = {}
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._global_until = 0.0
+
+    def _bucket_key(self, auth: str, route: str) -> Tuple[str, str]:
+        bucket_hash = self._route_buckets.get((auth, route))
+        if bucket_hash is None:
+            return auth, route
+        # Один hash корзины делят маршруты с разными major-параметрами
+        major = "/".join(part for part in route.split("/") if part.isdigit())
+        return auth, f"{bucket_hash}:{major}"
+
+    def acquire(self, auth: str, route: str) -> float:
+        """Занять место в корзине; вернуть, сколько секунд нужно подождать перед запросом"""
+        now = time.monotonic()
+        with self._lock:
+            wait = max(self._global_until - now, 0.0)
+            bucket = self._buckets.get(self._bucket_key(auth, route))
+            if bucket is not None and bucket.remaining is not None:
+                if bucket.reset_at <= now:
+                    bucket.remaining = None
+                elif bucket.remaining <= 0:
+                    wait = max(wait, bucket.reset_at - now)
+                else:
+                    bucket.remaining -= 1
+            return wait
+
+    def update(self, auth: str, route: str, headers: Dict[str, str]):
+        """Обновить корзину по заголовкам ответа"""
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        with self._lock:
+            if bucket_hash:
+                self._route_buckets[(auth, route)] = bucket_hash
+            if remaining is None or reset_after is None:
+                return
+            key = self._bucket_key(auth, route)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            try:
+                bucket.remaining = int(remaining)
+                bucket.reset_at = time.monotonic() + float(reset_after)
+            except ValueError:
+                bucket.remaining = None
+
+    def limited(self, auth: str, route: str, retry_after: float, is_global: bool):
+        """Ответ 429: закрыть корзину (или все запросы при глобальном лимите) на retry_after"""
+        until = time.monotonic() + retry_after
+        with self._lock:
+            if is_global:
+                self._global_until = max(self._global_until, until)
+                return
+            key = self._bucket_key(auth, route)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            bucket.remaining = 0
+            bucket.reset_at = max(bucket.reset_at, until)
+
+
+class DiscordHTTP:
+    """Пул соединений к Discord API с учётом лимитов и статистикой по маршрутам"""
+
+    def __init__(self, base_url: str = DISCORD_API_BASE_URL):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (
+            _env_float("DISCORD_HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+            _env_float("DISCORD_HTTP_READ_TIMEOUT", DEFAULT_READ_TIMEOUT),
+        )
+        self.max_retries = int(_env_float("DISCORD_HTTP_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+        self.max_rate_limit_wait = _env_float("DISCORD_HTTP_MAX_WAIT", DEFAULT_MAX_RATE_LIMIT_WAIT)
+        self.limiter = RateLimiter()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DEFAULT_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = "DiscordBot (Bigbot web panel, 1.0)"
+        self._stats_lock = threading.Lock()
+        self.route_stats: Dict[str, Dict[str, float]] = {}
+
+    # ---- Запросы ----
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Запрос к API; path — относительный ('/users/@me') или полный URL.
+        Ответ возвращается как есть (вызывающий код проверяет status_code);
+        исключение — только если сеть недоступна после всех повторов.
+        """
+        method = method.upper()
+        url = path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+        route = route_key(method, url[len(self.base_url):] if url.startswith(self.base_url) else url)
+        auth = _auth_key(kwargs.get("headers"))
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            wait = self.limiter.acquire(auth, route)
+            if wait > 0:
+                self._record(route, wait_s=min(wait, self.max_rate_limit_wait))
+                time.sleep(min(wait, self.max_rate_limit_wait))
+
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(route, elapsed_ms=(time.perf_counter() - started) * 1000, error=True)
+                if method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                time.sleep(0.5 * 2 ** (attempt - 1))
+                continue
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.limiter.update(auth, route, response.headers)
+
+            if response.status_code == 429:
+                retry_after, is_global = self._retry_after(response)
+                self.limiter.limited(auth, route, retry_after, is_global)
+                self._record(route, elapsed_ms=elapsed_ms, rate_limited=True)
+                if attempt >= self.max_retries or retry_after > self.max_rate_limit_wait:
+                    return response
+                attempt += 1
+                continue
+
+            if response.status_code >= 500 and method in IDEMPOTENT_METHODS and attempt < self.max_retries:
+                self._record(route, elapsed_ms=elapsed_ms, error=True)
+                attempt += 1
+                time.sleep(0.5 * 2 ** (attempt - 1))
+                continue
+
+            self._record(route, elapsed_ms=elapsed_ms, error=response.status_code >= 400)
+            return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Tuple[float, bool]:
+        is_global = response.headers.get("X-RateLimit-Global", "").lower() == "true"
+        retry_after = response.headers.get("Retry-After")
+        try:
+            data = response.json()
+            retry_after = data.get("retry_after", retry_after)
+            is_global = is_global or bool(data.get("global"))
+        except ValueError:
+            pass
+        try:
+            return float(retry_after), is_global
+        except (TypeError, ValueError):
+            return 1.0, is_global
+
+    # ---- Статистика ----
+
+    def _record(self, route: str, elapsed_ms: float = None, error: bool = False,
+                rate_limited: bool = False, wait_s: float = None):
+        with self._stats_lock:
+            stats = self.route_stats.get(route)
+            if stats is None:
+                stats = self.route_stats[route] = {
+                    "requests": 0,
+                    "errors": 0,
+                    "rate_limited": 0,
+                    "waits": 0,
+                    "wait_ms_total": 0.0,
+                    "latency_ms_total": 0.0,
+                    "latency_ms_max": 0.0,
+                }
+            if wait_s is not None:
+                stats["waits"] += 1
+                stats["wait_ms_total"] += wait_s * 1000
+            if elapsed_ms is None:
+                return
+            stats["requests"] += 1
+            stats["latency_ms_total"] += elapsed_ms
+            stats["latency_ms_max"] = max(stats["latency_ms_max"], elapsed_ms)
+            if error:
+                stats["errors"] += 1
+            if rate_limited:
+                stats["rate_limited"] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            result = {route: dict(stats) for route, stats in self.route_stats.items()}
+        for stats in result.values():
+            stats["latency_ms_avg"] = stats["latency_ms_total"] / max(stats["requests"], 1)
+        return result
+
+
+# Глобальный экземпляр для быстрого доступа
+_http_instance: Optional[DiscordHTTP] = None
+_http_lock = threading.Lock()
+
+
+def get_discord_http() -> DiscordHTTP:
+    """Получить общий HTTP-клиент веб-процесса"""
+    global _http_instance
+    if _http_instance is None:
+        with _http_lock:
+            if _http_instance is None:
+                _http_instance = DiscordHTTP()
+    return _http_instance
@@ -0,0 +1,33 @@
+"""
+Полосатые (striped) блокировки ивентов.
+Фиксированный набор asyncio.Lock, ивент выбирает замок по своему ID:
+изменения одного ивента сериализуются, а разные ивенты почти всегда
+попадают в разные замки и выполняются параллельно.
+"""
+
+import asyncio
+import os
+from typing import List
+
+DEFAULT_STRIPES = 64
+
+
+class StripedLocks:
+    """Набор замков, распределённых по ID ивента"""
+
+    def __init__(self, stripes: int = None):
+        if stripes is None:
+            try:
+                stripes = int(os.getenv("PARTY_LOCK_STRIPES", DEFAULT_STRIPES))
+            except ValueError:
+                stripes = DEFAULT_STRIPES
+        self.stripes = max(stripes, 1)
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(self.stripes)]
+
+    def for_event(self, event_id) -> asyncio.Lock:
+        """Замок ивента (snowflake перемешиваем, чтобы использовать и время, и счётчик)"""
+        event_id = int(event_id)
+        return self._locks[(event_id ^ (event_id >> 22)) % self.stripes]
+
+    def locked_count(self) -> int:
+        return sum(1 for lock in self._locks if lock.locked())
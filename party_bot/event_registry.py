@@ -0,0 +1,107 @@
+"""
+Реестр ивентов в памяти с вторичными индексами.
+Заменяет голый словарь ALL_SESSIONS: ключи — строковые ID ивентов,
+значения — словари сессий. Индексы по серверу, каналу и активности
+обновляются при каждой мутации через методы реестра.
+"""
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+
+class EventRegistry(MutableMapping):
+    """Словарь сессий с индексами guild -> ids, channel -> ids и множеством активных"""
+
+    def __init__(self, sessions: Dict[Any, dict] = None):
+        self._sessions: Dict[str, dict] = {}
+        self._by_guild: Dict[int, Set[str]] = {}
+        self._by_channel: Dict[int, Set[str]] = {}
+        self._active: Set[str] = set()
+        for sid, session in (sessions or {}).items():
+            self[sid] = session
+
+    # ---- MutableMapping ----
+
+    def __getitem__(self, sid) -> dict:
+        return self._sessions[str(sid)]
+
+    def __setitem__(self, sid, session: dict):
+        sid = str(sid)
+        old = self._sessions.get(sid)
+        if old is not None:
+            self._unindex(sid, old)
+        self._sessions[sid] = session
+        self._index(sid, session)
+
+    def __delitem__(self, sid):
+        sid = str(sid)
+        session = self._sessions.pop(sid)
+        self._unindex(sid, session)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, sid) -> bool:
+        return str(sid) in self._sessions
+
+    def get(self, sid, default=None):
+        return self._sessions.get(str(sid), default)
+
+    # ---- Индексы ----
+
+    def _index(self, sid: str, session: dict):
+        self._by_guild.setdefault(session.get("guild_id"), set()).add(sid)
+        self._by_channel.setdefault(session.get("channel_id"), set()).add(sid)
+        if not session.get("stopped"):
+            self._active.add(sid)
+
+    def _unindex(self, sid: str, session: dict):
+        for index, key in ((self._by_guild, session.get("guild_id")), (self._by_channel, session.get("channel_id"))):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(sid)
+                if not ids:
+                    del index[key]
+        self._active.discard(sid)
+
+    # ---- Мутации состояния ----
+
+    def mark_stopped(self, sid, stopped: bool = True) -> dict:
+        """Остановить (или возобновить) ивент, обновив индекс активных"""
+        sid = str(sid)
+        session = self._sessions[sid]
+        session["stopped"] = stopped
+        if stopped:
+            self._active.discard(sid)
+        else:
+            self._active.add(sid)
+        return session
+
+    # ---- Выборки ----
+
+    def _items(self, ids) -> List[Tuple[str, dict]]:
+        # Порядок вставки сохраняем как у обычного словаря
+        return [(sid, self._sessions[sid]) for sid in sorted(ids, key=int)]
+
+    def by_guild(self, guild_id: int) -> List[Tuple[str, dict]]:
+        """Ивенты сервера: [(sid, session), ...]"""
+        return self._items(self._by_guild.get(int(guild_id), ()))
+
+    def by_channel(self, channel_id: int) -> List[Tuple[str, dict]]:
+        """Ивенты канала: [(sid, session), ...]"""
+        return self._items(self._by_channel.get(int(channel_id), ()))
+
+    def active(self) -> List[Tuple[str, dict]]:
+        """Активные (не остановленные) ивенты"""
+        return self._items(self._active)
+
+    def active_in_guild(self, guild_id: int) -> List[Tuple[str, dict]]:
+        """Активные ивенты сервера"""
+        ids = self._by_guild.get(int(guild_id), set())
+        return self._items(ids & self._active)
+
+    def active_count(self) -> int:
+        return len(self._active)
@@ -0,0 +1,524 @@
+"""
+Построчное хранилище ивентов party bot в events.db.
+Сессии, слоты и посещаемость лежат отдельными строками: запись/выписка
+меняет одну строку слота, а не перезаписывает все ивенты целиком.
+"""
+
+import sqlite3
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+# Поля сессии, которые хранятся отдельными колонками таблицы events
+EVENT_FIELDS = (
+    "guild_id", "channel_id", "main_msg_id", "thread_id", "title",
+    "description", "time", "creator_id", "stopped", "last_reminder_time",
+    "creator_role_id", "stopped_at",
+)
+
+
+class EventStore:
+    """SQLite-хранилище ивентов, слотов и посещаемости"""
+
+    def __init__(self, db_path: str = None):
+        if db_path is None:
+            db_path = os.path.join(os.path.dirname(__file__), "..", "events.db")
+
+        self.db_path = os.path.abspath(db_path)
+        self.lock = threading.Lock()
+        # Одно постоянное соединение; доступ сериализуется через lock
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_database()
+
+    def _init_database(self):
+        """Создание таблиц и добавление недостающих колонок"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            # WAL: веб-панель в отдельных процессах читает ивенты, не блокируя запись бота
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY,
+                    guild_id INTEGER,
+                    channel_id INTEGER,
+                    main_msg_id INTEGER,
+                    thread_id INTEGER,
+                    title TEXT,
+                    description TEXT,
+                    time TEXT,
+                    party_roles TEXT,
+                    creator_id INTEGER,
+                    stopped INTEGER DEFAULT 0
+                )
+            """)
+            existing = {row[1] for row in cursor.execute("PRAGMA table_info(events)")}
+            for column, column_def in [
+                ("last_reminder_time", "REAL DEFAULT 0"),
+                ("creator_role_id", "INTEGER"),
+                ("render_hash", "TEXT"),
+                ("stopped_at", "REAL"),
+            ]:
+                if column not in existing:
+                    cursor.execute(f"ALTER TABLE events ADD COLUMN {column} {column_def}")
+            # Для ранее остановленных ивентов отсчёт до архивации начинаем с текущего момента
+            cursor.execute(
+                "UPDATE events SET stopped_at = ? WHERE stopped = 1 AND stopped_at IS NULL", (time.time(),)
+            )
+
+            # Ивенты сервера для страниц веб-панели, работающей без бота в процессе
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_guild ON events (guild_id, id)")
+
+            # Архив остановленных ивентов: в память не загружается, читается по запросу
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS events_archive (
+                    id INTEGER PRIMARY KEY,
+                    guild_id INTEGER,
+                    channel_id INTEGER,
+                    main_msg_id INTEGER,
+                    thread_id INTEGER,
+                    title TEXT,
+                    description TEXT,
+                    time TEXT,
+                    party_roles TEXT,
+                    creator_id INTEGER,
+                    creator_role_id INTEGER,
+                    stopped_at REAL,
+                    archived_at REAL
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_events_archive_guild
+                ON events_archive (guild_id, id)
+            """)
+
+            # Слоты ивента: одна строка на роль
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS event_slots (
+                    event_id INTEGER NOT NULL,
+                    slot_index INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    user_id INTEGER,
+                    PRIMARY KEY (event_id, slot_index)
+                )
+            """)
+            # Посещаемость (бывший party_stats.json)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS party_attendance (
+                    user_id INTEGER NOT NULL,
+                    event_id INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, event_id)
+                )
+            """)
+
+            # Открытые автоопросы «Чем займемся?» — переживают перезапуск бота
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS polls (
+                    message_id INTEGER PRIMARY KEY,
+                    guild_id INTEGER NOT NULL,
+                    channel_id INTEGER NOT NULL,
+                    options TEXT NOT NULL,
+                    deadline REAL NOT NULL
+                )
+            """)
+
+            # Старые строки хранили роли JSON-колонкой — раскладываем их в слоты один раз
+            rows = cursor.execute("""
+                SELECT id, party_roles FROM events
+                WHERE party_roles IS NOT NULL AND party_roles != ''
+                  AND id NOT IN (SELECT DISTINCT event_id FROM event_slots)
+            """).fetchall()
+            for event_id, roles_json in rows:
+                try:
+                    roles = json.loads(roles_json) or []
+                except (json.JSONDecodeError, TypeError):
+                    roles = []
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO event_slots (event_id, slot_index, name, user_id) VALUES (?, ?, ?, ?)",
+                    [(event_id, i, r.get("name", ""), r.get("user_id")) for i, r in enumerate(roles)]
+                )
+            self.conn.commit()
+
+    # ---- Запись ----
+    # Каждая операция записи — метод _op_<name>(cursor, ...) без commit.
+    # apply_batch выполняет пачку операций одной транзакцией (см. event_writer),
+    # публичные методы — пачка из одной операции.
+
+    WRITE_OPS = ("upsert_event", "update_event_fields", "set_slots", "set_render_hash", "add_attendance")
+
+    def apply_batch(self, ops: Iterable[tuple]):
+        """Выполнить операции [(name, args, kwargs), ...] одной транзакцией"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            try:
+                for name, args, kwargs in ops:
+                    if name not in self.WRITE_OPS:
+                        raise ValueError(f"Неизвестная операция записи: {name}")
+                    getattr(self, f"_op_{name}")(cursor, *args, **kwargs)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def upsert_event(self, event_id: int, data: Dict[str, Any]):
+        """Полная запись ивента (создание/редактирование) вместе со слотами"""
+        self.apply_batch([("upsert_event", (event_id, data), {})])
+
+    def update_event_fields(self, event_id: int, **fields):
+        """Точечное обновление колонок ивента (stopped, last_reminder_time, ...)"""
+        self.apply_batch([("update_event_fields", (event_id,), fields)])
+
+    def set_slots(self, event_id: int, slots: Iterable[tuple]):
+        """Обновить занятость слотов: slots — пары (slot_index, user_id)"""
+        self.apply_batch([("set_slots", (event_id, list(slots)), {})])
+
+    def set_render_hash(self, event_id: int, render_hash: Optional[str]):
+        """Сохранить хэш последнего успешно отрисованного сообщения"""
+        self.apply_batch([("set_render_hash", (event_id, render_hash), {})])
+
+    def add_attendance(self, user_id: int, event_id: int):
+        """Отметить участие пользователя в ивенте"""
+        self.apply_batch([("add_attendance", (user_id, event_id), {})])
+
+    def _op_upsert_event(self, cursor, event_id: int, data: Dict[str, Any]):
+        roles = data.get("party_roles", [])
+        # ON CONFLICT вместо REPLACE, чтобы не терять render_hash при редактировании
+        cursor.execute("""
+            INSERT INTO events (id, guild_id, channel_id, main_msg_id, thread_id, title,
+                                description, time, party_roles, creator_id, stopped,
+                                last_reminder_time, creator_role_id, stopped_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                guild_id = excluded.guild_id,
+                channel_id = excluded.channel_id,
+                main_msg_id = excluded.main_msg_id,
+                thread_id = excluded.thread_id,
+                title = excluded.title,
+                description = excluded.description,
+                time = excluded.time,
+                party_roles = NULL,
+                creator_id = excluded.creator_id,
+                stopped = excluded.stopped,
+                last_reminder_time = excluded.last_reminder_time,
+                creator_role_id = excluded.creator_role_id,
+                stopped_at = CASE WHEN excluded.stopped = 1
+                                  THEN COALESCE(events.stopped_at, excluded.stopped_at)
+                                  ELSE NULL END
+        """, (
+            event_id,
+            data["guild_id"],
+            data["channel_id"],
+            data["main_msg_id"],
+            data["thread_id"],
+            data["title"],
+            data["description"],
+            data.get("time", ""),
+            data["creator_id"],
+            int(data.get("stopped", False)),
+            data.get("last_reminder_time", 0),
+            data.get("creator_role_id"),
+            time.time() if data.get("stopped") else None,
+        ))
+        cursor.execute("DELETE FROM event_slots WHERE event_id = ?", (event_id,))
+        cursor.executemany(
+            "INSERT INTO event_slots (event_id, slot_index, name, user_id) VALUES (?, ?, ?, ?)",
+            [(event_id, i, r["name"], r.get("user_id")) for i, r in enumerate(roles)]
+        )
+
+    def _op_update_event_fields(self, cursor, event_id: int, **fields):
+        fields = {k: v for k, v in fields.items() if k in EVENT_FIELDS}
+        if not fields:
+            return
+        if "stopped" in fields:
+            fields["stopped"] = int(bool(fields["stopped"]))
+            fields.setdefault("stopped_at", time.time() if fields["stopped"] else None)
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        cursor.execute(
+            f"UPDATE events SET {assignments} WHERE id = ?",
+            (*fields.values(), event_id)
+        )
+
+    def _op_set_slots(self, cursor, event_id: int, slots: list):
+        if not slots:
+            return
+        cursor.executemany(
+            "UPDATE event_slots SET user_id = ? WHERE event_id = ? AND slot_index = ?",
+            [(user_id, event_id, index) for index, user_id in slots]
+        )
+
+    def _op_set_render_hash(self, cursor, event_id: int, render_hash: Optional[str]):
+        cursor.execute("UPDATE events SET render_hash = ? WHERE id = ?", (render_hash, event_id))
+
+    def _op_add_attendance(self, cursor, user_id: int, event_id: int):
+        cursor.execute(
+            "INSERT OR IGNORE INTO party_attendance (user_id, event_id) VALUES (?, ?)",
+            (user_id, event_id)
+        )
+
+    # ---- Чтение ----
+
+    def load_events(self, guild_id: int = None) -> Dict[int, Dict[str, Any]]:
+        """Загрузить все ивенты со слотами (или только ивенты сервера guild_id)"""
+        where, params = ("WHERE guild_id = ?", (guild_id,)) if guild_id is not None else ("", ())
+        return self._load_events(where, params)
+
+    def load_event(self, event_id: int) -> Optional[Dict[str, Any]]:
+        """Загрузить один (не архивный) ивент со слотами"""
+        return self._load_events("WHERE id = ?", (event_id,)).get(event_id)
+
+    def _load_events(self, where: str, params: tuple) -> Dict[int, Dict[str, Any]]:
+        with self.lock:
+            cursor = self.conn.cursor()
+            rows = cursor.execute(f"""
+                SELECT id, guild_id, channel_id, main_msg_id, thread_id, title, description,
+                       time, creator_id, stopped, last_reminder_time, creator_role_id
+                FROM events {where}
+                ORDER BY id
+            """, params).fetchall()
+            slot_rows = cursor.execute(f"""
+                SELECT event_id, name, user_id FROM event_slots
+                WHERE event_id IN (SELECT id FROM events {where})
+                ORDER BY event_id, slot_index
+            """, params).fetchall()
+
+        slots: Dict[int, list] = {}
+        for event_id, name, user_id in slot_rows:
+            slots.setdefault(event_id, []).append({"name": name, "user_id": user_id})
+
+        events = {}
+        for row in rows:
+            event_id = row[0]
+            events[event_id] = {
+                "guild_id": row[1],
+                "channel_id": row[2],
+                "main_msg_id": row[3],
+                "thread_id": row[4],
+                "title": row[5],
+                "description": row[6],
+                "time": row[7],
+                "party_roles": slots.get(event_id, []),
+                "creator_id": row[8],
+                "stopped": bool(row[9]),
+                "last_reminder_time": row[10] or 0,
+            }
+            if row[11] is not None:
+                events[event_id]["creator_role_id"] = row[11]
+        return events
+
+    def load_attendance(self) -> Dict[int, Set[int]]:
+        """Загрузить посещаемость: user_id -> множество event_id"""
+        with self.lock:
+            rows = self.conn.execute("SELECT user_id, event_id FROM party_attendance").fetchall()
+        stats: Dict[int, Set[int]] = {}
+        for user_id, event_id in rows:
+            stats.setdefault(user_id, set()).add(event_id)
+        return stats
+
+    def load_render_hashes(self) -> Dict[int, str]:
+        """Хэши последних отрисовок: event_id -> hash"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, render_hash FROM events WHERE render_hash IS NOT NULL"
+            ).fetchall()
+        return {event_id: render_hash for event_id, render_hash in rows}
+
+    def has_event(self, event_id: int) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM events WHERE id = ?", (event_id,)).fetchone()
+        return row is not None
+
+    # ---- Архив ----
+
+    def archive_stopped(self, stopped_before: float) -> list:
+        """Перенести в архив ивенты, остановленные раньше stopped_before.
+        Возвращает список перенесённых ID.
+        """
+        with self.lock:
+            cursor = self.conn.cursor()
+            rows = cursor.execute("""
+                SELECT id, guild_id, channel_id, main_msg_id, thread_id, title, description,
+                       time, creator_id, creator_role_id, stopped_at
+                FROM events
+                WHERE stopped = 1 AND stopped_at IS NOT NULL AND stopped_at < ?
+            """, (stopped_before,)).fetchall()
+            if not rows:
+                return []
+            now = time.time()
+            archived = []
+            for row in rows:
+                event_id = row[0]
+                slots = cursor.execute(
+                    "SELECT name, user_id FROM event_slots WHERE event_id = ? ORDER BY slot_index",
+                    (event_id,)
+                ).fetchall()
+                roles = [{"name": name, "user_id": user_id} for name, user_id in slots]
+                cursor.execute("""
+                    INSERT OR REPLACE INTO events_archive (id, guild_id, channel_id, main_msg_id, thread_id,
+                                                           title, description, time, party_roles, creator_id,
+                                                           creator_role_id, stopped_at, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (*row[:8], json.dumps(roles, ensure_ascii=False), *row[8:], now))
+                archived.append(event_id)
+            cursor.executemany("DELETE FROM event_slots WHERE event_id = ?", [(i,) for i in archived])
+            cursor.executemany("DELETE FROM events WHERE id = ?", [(i,) for i in archived])
+            self.conn.commit()
+            return archived
+
+    def _archived_row_to_session(self, row) -> Dict[str, Any]:
+        session = {
+            "guild_id": row[1],
+            "channel_id": row[2],
+            "main_msg_id": row[3],
+            "thread_id": row[4],
+            "title": row[5],
+            "description": row[6],
+            "time": row[7],
+            "party_roles": json.loads(row[8] or "[]"),
+            "creator_id": row[9],
+            "stopped": True,
+            "last_reminder_time": 0,
+            "archived": True,
+        }
+        if row[10] is not None:
+            session["creator_role_id"] = row[10]
+        return session
+
+    _ARCHIVE_COLUMNS = """id, guild_id, channel_id, main_msg_id, thread_id, title, description,
+                          time, party_roles, creator_id, creator_role_id"""
+
+    def load_archived_event(self, event_id: int) -> Optional[Dict[str, Any]]:
+        """Загрузить один архивный ивент"""
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {self._ARCHIVE_COLUMNS} FROM events_archive WHERE id = ?", (event_id,)
+            ).fetchone()
+        return self._archived_row_to_session(row) if row else None
+
+    def load_archived_events(self, guild_id: int, min_id: int = None, limit: int = None) -> Dict[int, Dict[str, Any]]:
+        """Архивные ивенты сервера, новые первыми.
+        min_id — нижняя граница snowflake (фильтр по дате создания).
+        """
+        query = f"SELECT {self._ARCHIVE_COLUMNS} FROM events_archive WHERE guild_id = ?"
+        params: list = [guild_id]
+        if min_id is not None:
+            query += " AND id >= ?"
+            params.append(min_id)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return {row[0]: self._archived_row_to_session(row) for row in rows}
+
+    # ---- Опросы ----
+
+    def add_poll(self, message_id: int, guild_id: int, channel_id: int, options: list, deadline: float):
+        """Сохранить открытый опрос (deadline — unix time)"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO polls (message_id, guild_id, channel_id, options, deadline) VALUES (?, ?, ?, ?, ?)",
+                (message_id, guild_id, channel_id, json.dumps(options, ensure_ascii=False), deadline)
+            )
+            self.conn.commit()
+
+    def remove_poll(self, message_id: int):
+        with self.lock:
+            self.conn.execute("DELETE FROM polls WHERE message_id = ?", (message_id,))
+            self.conn.commit()
+
+    def load_polls(self) -> list:
+        """Все открытые опросы"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT message_id, guild_id, channel_id, options, deadline FROM polls"
+            ).fetchall()
+        return [
+            {
+                "message_id": row[0],
+                "guild_id": row[1],
+                "channel_id": row[2],
+                "options": json.loads(row[3]),
+                "deadline": row[4],
+            }
+            for row in rows
+        ]
+
+    def has_open_poll(self, channel_id: int) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM polls WHERE channel_id = ?", (channel_id,)).fetchone()
+        return row is not None
+
+    # ---- Миграция ----
+
+    def import_legacy_json(self, sessions_file: str, stats_file: str) -> Dict[str, int]:
+        """Одноразовый импорт sessions.json / party_stats.json.
+        Файлы после импорта переименовываются в *.migrated.
+        """
+        imported = {"events": 0, "attendance": 0}
+
+        if os.path.exists(sessions_file):
+            try:
+                with open(sessions_file, "r", encoding="utf-8") as f:
+                    sessions = json.load(f) or {}
+            except Exception:
+                sessions = {}
+            for sid, session in sessions.items():
+                try:
+                    event_id = int(sid)
+                except (TypeError, ValueError):
+                    continue
+                if not isinstance(session, dict):
+                    continue
+                if self.has_event(event_id):
+                    # В events.db уже есть ивент — дозаписываем только время напоминания
+                    self.update_event_fields(event_id, last_reminder_time=session.get("last_reminder_time", 0))
+                    continue
+                try:
+                    self.upsert_event(event_id, session)
+                    imported["events"] += 1
+                except KeyError:
+                    continue
+            _mark_migrated(sessions_file)
+
+        if os.path.exists(stats_file):
+            try:
+                with open(stats_file, "r", encoding="utf-8") as f:
+                    raw_stats = json.load(f) or {}
+            except Exception:
+                raw_stats = {}
+            pairs = []
+            for uid, events in raw_stats.items():
+                try:
+                    pairs.extend((int(uid), int(eid)) for eid in events)
+                except (TypeError, ValueError):
+                    continue
+            with self.lock:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO party_attendance (user_id, event_id) VALUES (?, ?)", pairs
+                )
+                self.conn.commit()
+            imported["attendance"] = len(pairs)
+            _mark_migrated(stats_file)
+
+        return imported
+
+
+def _mark_migrated(path: str):
+    try:
+        os.replace(path, path + ".migrated")
+    except OSError:
+        pass
+
+
+# Глобальный экземпляр для быстрого доступа
+_store_instance: Optional[EventStore] = None
+
+
+def get_event_store(db_path: str = None) -> EventStore:
+    """Получить глобальный экземпляр хранилища ивентов"""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = EventStore(db_path)
+    return _store_instance
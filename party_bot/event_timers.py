@@ -0,0 +1,112 @@
+"""
+Дедлайны напоминаний и автозакрытия ивентов.
+Каждый активный ивент хранит в min-heap ближайший момент проверки;
+цикл спит до самого раннего дедлайна и будит только наступившие ивенты.
+Устаревшие записи кучи отбрасываются лениво по номеру поколения.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+DISCORD_EPOCH_MS = 1420070400000
+
+
+def snowflake_time(snowflake: int) -> float:
+    """Unix time создания объекта Discord по его ID (без запроса к API)"""
+    return ((int(snowflake) >> 22) + DISCORD_EPOCH_MS) / 1000
+
+
+def snowflake_from_time(timestamp: float) -> int:
+    """Наименьший snowflake, созданный не раньше timestamp (для фильтров по дате)"""
+    return max(int(timestamp * 1000) - DISCORD_EPOCH_MS, 0) << 22
+
+
+class DeadlineEngine:
+    """Min-heap дедлайнов с ленивой инвалидацией.
+    on_due(event_id) вызывается по наступлении дедлайна и возвращает
+    следующий дедлайн (unix time) или None, если ивент больше не отслеживается.
+    """
+
+    def __init__(self, on_due: Callable[[int], Awaitable[Optional[float]]]):
+        self._on_due = on_due
+        self._heap: List[Tuple[float, int, int]] = []
+        # Текущее поколение каждого ивента; счётчик общий, чтобы номера не повторялись
+        self._generation: Dict[int, int] = {}
+        self._counter = itertools.count(1)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running = False
+        self.fired = 0
+
+    def schedule(self, event_id: int, deadline: float):
+        """Назначить (или перенести) дедлайн ивента"""
+        event_id = int(event_id)
+        generation = next(self._counter)
+        self._generation[event_id] = generation
+        heapq.heappush(self._heap, (deadline, generation, event_id))
+        # Будим цикл, только если новый дедлайн стал самым ранним
+        if self._wakeup is not None and self._heap[0][2] == event_id and self._heap[0][1] == generation:
+            self._wakeup.set()
+
+    def cancel(self, event_id: int):
+        """Снять ивент с отслеживания (запись в куче станет устаревшей)"""
+        self._generation.pop(int(event_id), None)
+
+    def __len__(self):
+        return len(self._generation)
+
+    def _drop_stale(self):
+        while self._heap:
+            deadline, generation, event_id = self._heap[0]
+            if self._generation.get(event_id) == generation:
+                return
+            heapq.heappop(self._heap)
+
+    async def run(self):
+        """Основной цикл: спим до ближайшего дедлайна"""
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                self._drop_stale()
+                self._wakeup.clear()
+                if not self._heap:
+                    await self._wakeup.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                deadline, generation, event_id = heapq.heappop(self._heap)
+                # Ивент снимается с учёта до обработки; on_due вернёт следующий дедлайн
+                self._generation.pop(event_id, None)
+                self.fired += 1
+                asyncio.get_running_loop().create_task(self._fire(event_id))
+        finally:
+            self._running = False
+            self._wakeup = None
+
+    async def _fire(self, event_id: int):
+        try:
+            next_deadline = await self._on_due(event_id)
+        except Exception as e:
+            print(f"⚠️ Ошибка обработки дедлайна ивента {event_id}: {e}")
+            return
+        # Если за время обработки ивент перепланировали — оставляем новое значение
+        if next_deadline is not None and event_id not in self._generation:
+            self.schedule(event_id, next_deadline)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "timers_tracked": len(self._generation),
+            "timers_heap": len(self._heap),
+            "timers_fired": self.fired,
+        }
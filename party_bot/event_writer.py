@@ -0,0 +1,147 @@
+"""
+Групповая запись ивентов в events.db (group commit).
+Изменения ставятся в очередь, единственная задача-писатель собирает их
+в пачку и выполняет одной транзакцией в отдельном потоке: один commit
+(и один fsync) на пачку, а не на каждый клик. Вызывающий может дождаться
+фиксации, ожидая возвращённый future.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_BATCH_MS = 50
+DEFAULT_BATCH_ROWS = 100
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class GroupCommitWriter:
+    """Очередь операций записи EventStore с пакетной фиксацией"""
+
+    def __init__(self, store, batch_ms: int = None, batch_rows: int = None):
+        self.store = store
+        if batch_ms is None:
+            batch_ms = _env_int("PARTY_WRITE_BATCH_MS", DEFAULT_BATCH_MS)
+        if batch_rows is None:
+            batch_rows = _env_int("PARTY_WRITE_BATCH_ROWS", DEFAULT_BATCH_ROWS)
+        self.batch_seconds = max(batch_ms, 0) / 1000
+        self.batch_rows = max(batch_rows, 1)
+        self._pending: List[Tuple[str, tuple, dict, asyncio.Future]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._has_work: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._closing = False
+        self.stats = {"write_ops": 0, "write_batches": 0, "write_sync": 0, "write_errors": 0}
+
+    def _running_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    def _ensure_task(self, loop: asyncio.AbstractEventLoop):
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._has_work = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    def submit(self, op: str, *args, **kwargs) -> Optional[asyncio.Future]:
+        """Поставить операцию EventStore в очередь.
+        Возвращает future, завершающийся после commit пачки. Вне цикла событий
+        (импорт, миграция, чужой поток) операция выполняется сразу и возвращается None.
+        """
+        loop = self._running_loop()
+        if loop is None or self._closing or (self._loop is not None and loop is not self._loop
+                                             and self._task is not None and not self._task.done()):
+            self.store.apply_batch([(op, args, kwargs)])
+            self.stats["write_sync"] += 1
+            return None
+
+        self._ensure_task(loop)
+        future = loop.create_future()
+        # Ошибку уже выводит писатель — не ругаемся на неполученное исключение
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending.append((op, args, kwargs, future))
+        self._has_work.set()
+        if len(self._pending) >= self.batch_rows:
+            self._batch_full.set()
+        return future
+
+    async def _run(self):
+        while True:
+            await self._has_work.wait()
+            if not self._closing and self.batch_seconds > 0 and len(self._pending) < self.batch_rows:
+                # Ждём окно пачки, но выходим раньше, если набралось batch_rows операций
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.batch_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            await self._commit_pending()
+
+    async def _commit_pending(self):
+        batch, self._pending = self._pending[:self.batch_rows], self._pending[self.batch_rows:]
+        if not self._pending:
+            self._has_work.clear()
+            self._batch_full.clear()
+        elif len(self._pending) < self.batch_rows:
+            self._batch_full.clear()
+        if not batch:
+            return
+
+        ops = [(op, args, kwargs) for op, args, kwargs, _ in batch]
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.store.apply_batch, ops)
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            print(f"⚠️ Ошибка групповой записи в events.db ({len(batch)} операций): {e}")
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["write_ops"] += len(batch)
+        self.stats["write_batches"] += 1
+        for *_, future in batch:
+            if not future.done():
+                future.set_result(True)
+
+    async def flush(self):
+        """Дождаться фиксации всех уже поставленных операций"""
+        if not self._pending:
+            return
+        futures = [future for *_, future in self._pending]
+        self._batch_full.set()
+        await asyncio.gather(*futures, return_exceptions=True)
+
+    async def close(self):
+        """Записать остаток очереди и остановить писателя (при завершении бота)"""
+        self._closing = True
+        try:
+            while self._pending and self._task is not None and not self._task.done():
+                await self.flush()
+            if self._pending:
+                # Писатель уже остановлен — фиксируем остаток напрямую
+                await self._commit_pending()
+        finally:
+            if self._task is not None and not self._task.done():
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+            self._task = None
+            self._loop = None
+            self._closing = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["write_pending"] = len(self._pending)
+        return stats
@@ -0,0 +1,211 @@
+"""
+Метаданные серверов (каналы, роли, участники) для веб-панели.
+Если бот работает в том же процессе (bot_main.py), данные берутся из кэша
+гейтвея (bot.get_guild) без обращения к Discord. Иначе — REST через общий
+HTTP-клиент с TTL-кэшем.
+
+У каждого сервера есть версия метаданных: бот увеличивает её на событиях
+гейтвея (каналы, роли). Снимки в формате REST API хранятся до смены версии,
+поэтому повторные страницы не пересобирают их. Участники берутся из гейтвея
+при каждом запросе. Та же версия публикуется в общие версии кэшей: веб в
+отдельном процессе сбрасывает по ней REST-кэш каналов и ролей, не дожидаясь TTL.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import discord
+except ImportError:
+    discord = None
+
+from party_bot.cache_versions import get_shared_versions
+from party_bot.web_cache import TTLCache
+
+DEFAULT_REST_TTL = 60.0
+DEFAULT_MEMBER_TTL = 30.0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# ---- Версии метаданных (обновляются событиями гейтвея) ----
+
+_versions: Dict[int, int] = {}
+_versions_lock = threading.Lock()
+
+
+def _shared_key(guild_id: int) -> str:
+    return f"guild_metadata:{int(guild_id)}"
+
+
+def bump_guild_metadata(guild_id: int = None):
+    """Метаданные сервера изменились (без guild_id — все серверы, например после переподключения).
+    Пишет общую версию в SQLite — из цикла бота вызывать через STORAGE.run.
+    """
+    with _versions_lock:
+        if guild_id is None:
+            for gid in list(_versions):
+                _versions[gid] += 1
+            _versions[0] = _versions.get(0, 0) + 1
+        else:
+            _versions[int(guild_id)] = _versions.get(int(guild_id), 0) + 1
+    get_shared_versions().bump(_shared_key(guild_id or 0))
+
+
+def get_metadata_version(guild_id: int) -> Tuple[int, int]:
+    """Версия метаданных сервера: (общая эпоха, версия сервера)"""
+    with _versions_lock:
+        return _versions.get(0, 0), _versions.get(int(guild_id), 0)
+
+
+def get_shared_metadata_version(guild_id: int) -> Tuple[int, int]:
+    """Версия метаданных сервера, опубликованная ботом: (общая эпоха, версия сервера)"""
+    shared = get_shared_versions()
+    return shared.get(_shared_key(0)), shared.get(_shared_key(guild_id))
+
+
+# ---- Снимки объектов discord.py в формате REST ----
+
+def _channel_to_dict(channel) -> Dict[str, Any]:
+    overwrites = []
+    for target, overwrite in channel.overwrites.items():
+        allow, deny = overwrite.pair()
+        overwrites.append({
+            "id": str(target.id),
+            "type": 1 if isinstance(target, discord.Member) else 0,
+            "allow": str(allow.value),
+            "deny": str(deny.value),
+        })
+    return {
+        "id": str(channel.id),
+        "name": channel.name,
+        "type": channel.type.value,
+        "position": channel.position,
+        "parent_id": str(channel.category_id) if channel.category_id else None,
+        "permission_overwrites": overwrites,
+    }
+
+
+def _role_to_dict(role) -> Dict[str, Any]:
+    return {
+        "id": str(role.id),
+        "name": role.name,
+        "permissions": str(role.permissions.value),
+        "position": role.position,
+        "color": role.color.value,
+        "managed": role.managed,
+        "hoist": role.hoist,
+        "mentionable": role.mentionable,
+    }
+
+
+def _member_to_dict(member) -> Dict[str, Any]:
+    return {
+        "user": {"id": str(member.id), "username": member.name},
+        "nick": member.nick,
+        "roles": [str(role.id) for role in member.roles if not role.is_default()],
+    }
+
+
+class GuildMetadataProvider:
+    """Каналы, роли и участники сервера: кэш гейтвея бота, иначе REST.
+    Возвращаемые списки общие для всех запросов — их нельзя изменять.
+    """
+
+    def __init__(self, bot_getter: Callable[[], Any], http, bot_token: str):
+        self._bot_getter = bot_getter
+        self._http = http
+        self._headers = {"Authorization": f"Bot {bot_token}"}
+        # (guild_id, kind) -> (версия, снимок) для данных гейтвея
+        self._snapshots: Dict[Tuple[int, str], Tuple[Tuple[int, int], Any]] = {}
+        self._lock = threading.Lock()
+        self.rest_cache = TTLCache("guild_metadata", _env_float("WEB_GUILD_METADATA_TTL", DEFAULT_REST_TTL))
+        self.member_cache = TTLCache("guild_members", _env_float("WEB_GUILD_MEMBER_TTL", DEFAULT_MEMBER_TTL))
+        self.stats = {"gateway": 0, "snapshot_hits": 0, "rest": 0}
+
+    def _gateway_guild(self, guild_id: int):
+        if discord is None:
+            return None
+        bot = self._bot_getter()
+        if bot is None or not bot.is_ready():
+            return None
+        return bot.get_guild(int(guild_id))
+
+    def _snapshot(self, guild, kind: str, build: Callable[[], Any]) -> Any:
+        key = (guild.id, kind)
+        version = get_metadata_version(guild.id)
+        with self._lock:
+            cached = self._snapshots.get(key)
+            if cached is not None and cached[0] == version:
+                self.stats["snapshot_hits"] += 1
+                return cached[1]
+        data = build()
+        with self._lock:
+            self._snapshots[key] = (version, data)
+            self.stats["gateway"] += 1
+        return data
+
+    def _rest(self, guild_id: int, kind: str) -> Optional[List[Dict[str, Any]]]:
+        def load():
+            self.stats["rest"] += 1
+            response = self._http.get(f"/guilds/{guild_id}/{kind}", headers=self._headers)
+            return response.json() if response.status_code == 200 else None
+        key = (int(guild_id), kind)
+        self.rest_cache.check_version(key, get_shared_metadata_version(guild_id))
+        return self.rest_cache.get_or_load(key, load)
+
+    def get_channels(self, guild_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Все каналы сервера (формат REST); None — сервер недоступен"""
+        guild = self._gateway_guild(guild_id)
+        if guild is not None:
+            return self._snapshot(guild, "channels", lambda: [_channel_to_dict(ch) for ch in guild.channels])
+        return self._rest(guild_id, "channels")
+
+    def get_roles(self, guild_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Все роли сервера, включая @everyone (формат REST); None — сервер недоступен"""
+        guild = self._gateway_guild(guild_id)
+        if guild is not None:
+            return self._snapshot(guild, "roles", lambda: [_role_to_dict(role) for role in guild.roles])
+        return self._rest(guild_id, "roles")
+
+    def get_member(self, guild_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """Участник сервера с ролями; None — не найден"""
+        guild = self._gateway_guild(guild_id)
+        if guild is not None:
+            member = guild.get_member(int(user_id))
+            if member is not None:
+                self.stats["gateway"] += 1
+                return _member_to_dict(member)
+
+        def load():
+            self.stats["rest"] += 1
+            response = self._http.get(f"/guilds/{guild_id}/members/{user_id}", headers=self._headers)
+            return response.json() if response.status_code == 200 else None
+        return self.member_cache.get_or_load((int(guild_id), int(user_id)), load)
+
+    def invalidate(self, guild_id: int = None):
+        """Сбросить REST-кэш и снимки сервера (или всех серверов)"""
+        with self._lock:
+            if guild_id is None:
+                self._snapshots.clear()
+            else:
+                for key in [k for k in self._snapshots if k[0] == int(guild_id)]:
+                    del self._snapshots[key]
+        if guild_id is None:
+            self.rest_cache.invalidate()
+            self.member_cache.invalidate()
+        else:
+            self.rest_cache.invalidate((int(guild_id), "channels"))
+            self.rest_cache.invalidate((int(guild_id), "roles"))
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["rest_cache"] = self.rest_cache.get_stats()
+        stats["member_cache"] = self.member_cache.get_stats()
+        return stats
@@ -0,0 +1,77 @@
+"""
+Планировщик фоновых задач по серверам.
+Мониторинг каналов, опросы и напоминания каждого сервера выполняются
+отдельными задачами, а общий семафор ограничивает параллельную работу.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+DEFAULT_CONCURRENCY = 8
+
+
+class GuildScheduler:
+    """Независимые задачи по ключу с ограниченной параллельностью"""
+
+    def __init__(self, max_concurrency: int = None):
+        if max_concurrency is None:
+            try:
+                max_concurrency = int(os.getenv("PARTY_SCHEDULER_CONCURRENCY", DEFAULT_CONCURRENCY))
+            except ValueError:
+                max_concurrency = DEFAULT_CONCURRENCY
+        self.max_concurrency = max(max_concurrency, 1)
+        self._semaphore = None
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def slot(self) -> asyncio.Semaphore:
+        """Семафор для участка активной работы (async with scheduler.slot(): ...)"""
+        # Создаём лениво, чтобы семафор принадлежал циклу бота
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def is_running(self, key: Hashable) -> bool:
+        task = self._tasks.get(key)
+        return task is not None and not task.done()
+
+    def spawn(self, key: Hashable, factory: Callable[[], Awaitable[Any]], bounded: bool = True) -> bool:
+        """Запустить задачу, если задача с таким ключом ещё не выполняется.
+        bounded=False — задача сама решает, когда занимать слот (например, опрос ждёт дедлайн без слота).
+        """
+        if self.is_running(key):
+            return False
+        task = asyncio.get_running_loop().create_task(self._guard(key, factory, bounded))
+        self._tasks[key] = task
+        return True
+
+    async def _guard(self, key: Hashable, factory: Callable[[], Awaitable[Any]], bounded: bool):
+        try:
+            if bounded:
+                async with self.slot():
+                    await factory()
+            else:
+                await factory()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Ошибка фоновой задачи {key}: {e}")
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Количество выполняющихся задач"""
+        return {
+            "scheduler_tasks": sum(1 for t in self._tasks.values() if not t.done()),
+            "scheduler_concurrency": self.max_concurrency,
+        }
+
+    async def shutdown(self):
+        """Отменить все задачи"""
+        tasks = [t for t in self._tasks.values() if not t.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
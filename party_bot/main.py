@@ -1,9 +1,9 @@
 import discord
 from discord.ext import commands
 from discord import app_commands, ui
+import io
 import json
 import os
-import sqlite3
 from datetime import datetime, timedelta, timezone
 import asyncio
 import sys
@@ -19,14 +19,14 @@ try:
     from recruit_bot.ui_components import PersistentEventSubmitView, UnifiedEventView
     from recruit_bot import bot as recruit_bot_module
     from recruit_bot.bot import RecruitCog, init_db as recruit_init_db, PersistentApplyButtonView, PersistentPointsRequestView, ApplyModal
-    from unified_settings import unified_settings as _unified_settings
+    from recruit_bot.database import enable_pool as recruit_enable_pool
     RECRUIT_AVAILABLE = True
 except ImportError as _recruit_err:
     print(f"Recruit modules not available: {_recruit_err}")
     RECRUIT_AVAILABLE = False
 
 """Единый импорт системы настроек.
-Главная логика дефолтов теперь в web.get_complete_guild_settings.
+Главная логика дефолтов теперь в party_bot.settings_service.
 Здесь оставляем тонкие обёртки для совместимости бота.
 """
 try:
@@ -56,6 +56,23 @@ except ImportError as e_simple:
         USING_DATABASE = False
         USING_FAST_DB = False
 
+from party_bot.event_store import get_event_store
+from party_bot.event_registry import EventRegistry
+from party_bot.event_locks import StripedLocks
+from party_bot.event_writer import GroupCommitWriter
+from party_bot.storage_gateway import get_storage_gateway
+from party_bot.settings_service import get_settings_service
+from party_bot.render_coalescer import RenderCoalescer
+from party_bot.message_handles import MessageHandleCache, compute_render_hash
+from party_bot.guild_scheduler import GuildScheduler
+from party_bot.event_timers import DeadlineEngine, snowflake_time, snowflake_from_time
+from party_bot.web_cache import invalidate_bot_guilds
+from party_bot.guild_metadata import bump_guild_metadata
+from party_bot.command_bus import get_command_bus
+from party_bot.templates_store import (
+    get_guild_templates, set_guild_template, delete_guild_template, get_guild_template
+)
+
 # Обёртки (API бота остаётся прежним)
 def get_guild_settings(guild_id: int):
     if USING_DATABASE:
@@ -124,7 +141,7 @@ async def send_setup_message(guild: discord.Guild, channel: Optional[discord.Tex
         if not force and last_sent and (now - last_sent).total_seconds() < 300:  # 5 минут
             return
         
-        state = evaluate_guild_setup(guild.id)
+        state = await STORAGE.run(evaluate_guild_setup, guild.id)
         if not force and state['status'] == 'complete':
             return
         # Выбираем канал: заданный, либо системный, либо первый текстовый
@@ -250,45 +267,23 @@ if not BOT_TOKEN:
 # Настройка URL веб-интерфейса
 WEB_BASE_URL = CONFIG.get('WEB_BASE_URL', 'http://localhost:8082')
 
-# Setup DB
-conn = sqlite3.connect(DB_FILE)
-cursor = conn.cursor()
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS events (
-    id INTEGER PRIMARY KEY,
-    guild_id INTEGER,
-    channel_id INTEGER,
-    main_msg_id INTEGER,
-    thread_id INTEGER,
-    title TEXT,
-    description TEXT,
-    time TEXT,
-    party_roles TEXT,
-    creator_id INTEGER,
-    stopped INTEGER DEFAULT 0
-)
-""")
-conn.commit()
+# Setup DB: ивенты, слоты и статистика хранятся построчно в events.db
+EVENT_STORE = get_event_store(DB_FILE)
 
-ALL_SESSIONS = {}
-raw_stats = {}
 SETTINGS = {"guilds": {}}
 
-# Загружаем только служебные файлы (sessions, stats). settings.json будем мигрировать один раз.
-for file, default in [(SESSIONS_FILE, {}), (STATS_FILE, {})]:
-    if not os.path.exists(file):
-        with open(file, "w", encoding="utf-8") as f:
-            json.dump(default, f)
-try:
-    with open(SESSIONS_FILE, "r", encoding="utf-8") as f:
-        ALL_SESSIONS = json.load(f)
-except Exception:
-    ALL_SESSIONS = {}
-try:
-    with open(STATS_FILE, "r", encoding="utf-8") as f:
-        raw_stats = json.load(f)
-except Exception:
-    raw_stats = {}
+def _migrate_legacy_json_to_db():
+    """Одноразовый импорт sessions.json / party_stats.json в events.db"""
+    if not (os.path.exists(SESSIONS_FILE) or os.path.exists(STATS_FILE)):
+        return
+    try:
+        imported = EVENT_STORE.import_legacy_json(SESSIONS_FILE, STATS_FILE)
+        print(f"🛠️ Миграция sessions.json/party_stats.json -> events.db "
+              f"(ивентов: {imported['events']}, записей статистики: {imported['attendance']})")
+    except Exception as e:
+        print(f"⚠️ Ошибка миграции JSON ивентов: {e}")
+
+_migrate_legacy_json_to_db()
 
 def _migrate_settings_json_to_db():
     """Одноразовая миграция settings.json -> simple_settings_db.
@@ -336,7 +331,7 @@ def _migrate_settings_json_to_db():
 
 _migrate_settings_json_to_db()
 
-PARTY_STATS = {int(uid): set(events) for uid, events in raw_stats.items()}
+PARTY_STATS = EVENT_STORE.load_attendance()
 
 def reload_settings_from_disk():
     # При использовании БД больше не поддерживаем live‑reload JSON настроек
@@ -362,108 +357,251 @@ def _deep_merge_dicts(base: dict, incoming: dict) -> dict:
     return result
 
 def save_all_data():
-    # Настройки сами сохраняются в БД; здесь сохраняем только служебные структуры
-    with open(SESSIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(ALL_SESSIONS, f, indent=2, ensure_ascii=False)
-    with open(STATS_FILE, "w", encoding="utf-8") as f:
-        json.dump({str(uid): list(events) for uid, events in PARTY_STATS.items()}, f, indent=2, ensure_ascii=False)
+    """Заглушка для совместимости - ивенты и статистика пишутся построчно в events.db"""
+    pass
 
 
-def get_guild_templates(guild_id: int) -> dict:
-    """Получить шаблоны для конкретного сервера из отдельного файла"""
-    templates_file = f"templates_data/guild_{guild_id}_templates.json"
-    
-    if not os.path.exists("templates_data"):
-        os.makedirs("templates_data")
-    
-    if os.path.exists(templates_file):
-        try:
-            with open(templates_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Ошибка загрузки шаблонов для гильдии {guild_id}: {e}")
-            return {}
-    return {}
-
-def save_guild_templates(guild_id: int, templates: dict):
-    """Сохранить шаблоны для конкретного сервера"""
-    if not os.path.exists("templates_data"):
-        os.makedirs("templates_data")
-    
-    templates_file = f"templates_data/guild_{guild_id}_templates.json"
-    try:
-        with open(templates_file, "w", encoding="utf-8") as f:
-            json.dump(templates, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"Ошибка сохранения шаблонов для гильдии {guild_id}: {e}")
-
-def set_guild_template(guild_id: int, template_name: str, template_data: dict):
-    """Установить шаблон для конкретного сервера"""
-    templates = get_guild_templates(guild_id)
-    templates[template_name] = template_data
-    save_guild_templates(guild_id, templates)
-
-def delete_guild_template(guild_id: int, template_name: str):
-    """Удалить шаблон для конкретного сервера"""
-    templates = get_guild_templates(guild_id)
-    if template_name in templates:
-        del templates[template_name]
-        save_guild_templates(guild_id, templates)
-        return True
-    return False
+# ===== Асинхронный доступ к хранилищу =====
+# Корутины бота не трогают файлы и SQLite напрямую: блокирующие функции
+# выше выполняются в потоке STORAGE (см. storage_gateway)
+STORAGE = get_storage_gateway()
+# Шина команд веб-интерфейса (выполняются в цикле бота)
+COMMAND_BUS = get_command_bus()
 
-def get_guild_template(guild_id: int, template_name: str):
-    """Получить конкретный шаблон для сервера"""
-    templates = get_guild_templates(guild_id)
-    return templates.get(template_name)
-    return False
+async def get_guild_settings_async(guild_id: int):
+    return await STORAGE.run(get_guild_settings, guild_id)
+
+async def get_guild_setting_async(guild_id: int, key: str, default=None):
+    return await STORAGE.run(get_guild_setting, guild_id, key, default)
 
-def get_guild_template(guild_id: int, template_name: str):
-    """Получить конкретный шаблон для сервера"""
-    guild_templates = get_guild_templates(guild_id)
-    return guild_templates.get(template_name)
+async def set_guild_setting_async(guild_id: int, key: str, value):
+    return await STORAGE.run(set_guild_setting, guild_id, key, value)
+
+async def get_guild_templates_async(guild_id: int) -> dict:
+    return await STORAGE.run(get_guild_templates, guild_id)
+
+async def get_guild_template_async(guild_id: int, template_name: str):
+    return await STORAGE.run(get_guild_template, guild_id, template_name)
+
+async def set_guild_template_async(guild_id: int, template_name: str, template_data: dict):
+    return await STORAGE.run(set_guild_template, guild_id, template_name, template_data)
+
+async def delete_guild_template_async(guild_id: int, template_name: str) -> bool:
+    return await STORAGE.run(delete_guild_template, guild_id, template_name)
+
+# Записи в events.db идут через групповой писатель: save_* возвращают future
+# фиксации (await — дождаться записи на диск) или None, если запись уже выполнена
+EVENT_WRITER = GroupCommitWriter(EVENT_STORE)
 
 def save_event(event_id: int, data: dict):
-    cursor.execute("""
-        INSERT OR REPLACE INTO events (id, guild_id, channel_id, main_msg_id, thread_id, title, description, time, party_roles, creator_id, stopped)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        event_id,
-        data["guild_id"],
-        data["channel_id"],
-        data["main_msg_id"],
-        data["thread_id"],
-        data["title"],
-        data["description"],
-        data.get("time", ""),
-        json.dumps(data["party_roles"], ensure_ascii=False),
-        data["creator_id"],
-        int(data.get("stopped", False))
-    ))
-    conn.commit()
+    """Полная запись ивента со слотами (создание, клонирование, редактирование)"""
+    # Снимок, чтобы последующие правки сессии не попали в уже поставленную запись
+    snapshot = dict(data, party_roles=[dict(r) for r in data.get("party_roles", [])])
+    future = EVENT_WRITER.submit("upsert_event", event_id, snapshot)
+    _touch_event_timer(event_id, data)
+    return future
+
+def save_event_fields(event_id: int, **fields):
+    """Точечное обновление полей ивента (stopped, last_reminder_time, ...)"""
+    future = EVENT_WRITER.submit("update_event_fields", event_id, **fields)
+    _touch_event_timer(event_id)
+    return future
+
+def save_event_slots(event_id: int, session: dict, indices):
+    """Сохранить занятость только изменённых слотов"""
+    roles = session["party_roles"]
+    future = EVENT_WRITER.submit("set_slots", event_id, [(i, roles[i]["user_id"]) for i in indices])
+    _touch_event_timer(event_id, session)
+    return future
+
+async def wait_saved(future):
+    """Дождаться фиксации записи, поставленной save_*"""
+    if future is not None:
+        await future
 
 def load_events_from_db():
-    cursor.execute("SELECT * FROM events")
-    rows = cursor.fetchall()
-    events = {}
-    for row in rows:
-        event_id = row[0]
-        events[event_id] = {
-            "guild_id": row[1],
-            "channel_id": row[2],
-            "main_msg_id": row[3],
-            "thread_id": row[4],
-            "title": row[5],
-            "description": row[6],
-            "time": row[7],
-            "party_roles": json.loads(row[8]),
-            "creator_id": row[9],
-            "stopped": bool(row[10]),
-        }
-    return events
+    """Загрузить «горячие» ивенты: активные и недавно остановленные"""
+    return EVENT_STORE.load_events()
 
+try:
+    ARCHIVE_GRACE_HOURS = float(os.getenv("PARTY_ARCHIVE_GRACE_HOURS", "24"))
+except ValueError:
+    ARCHIVE_GRACE_HOURS = 24.0
+
+def archive_stopped_events() -> list:
+    """Перенести в архив ивенты, остановленные дольше ARCHIVE_GRACE_HOURS назад"""
+    archived = EVENT_STORE.archive_stopped(time.time() - ARCHIVE_GRACE_HOURS * 3600)
+    return _drop_archived(archived)
+
+async def archive_stopped_events_async() -> list:
+    """То же, но запрос к events.db выполняется в потоке хранилища"""
+    archived = await STORAGE.run(EVENT_STORE.archive_stopped, time.time() - ARCHIVE_GRACE_HOURS * 3600)
+    return _drop_archived(archived)
+
+def _drop_archived(archived: list) -> list:
+    registry = globals().get("ALL_SESSIONS")
+    for event_id in archived:
+        if registry is not None and str(event_id) in registry:
+            del registry[str(event_id)]
+    if archived:
+        print(f"🗄️ В архив перенесено ивентов: {len(archived)}")
+    return archived
+
+def get_event(event_id):
+    """Ивент из памяти или (лениво) из архива"""
+    session = ALL_SESSIONS.get(str(event_id))
+    if session is None:
+        try:
+            session = EVENT_STORE.load_archived_event(int(event_id))
+        except (TypeError, ValueError):
+            session = None
+    return session
+
+async def get_event_async(event_id):
+    """get_event для корутин: архив читается в потоке хранилища"""
+    session = ALL_SESSIONS.get(str(event_id))
+    if session is None:
+        try:
+            session = await STORAGE.run(EVENT_STORE.load_archived_event, int(event_id))
+        except (TypeError, ValueError):
+            session = None
+    return session
+
+def get_guild_event_history(guild_id: int, since: float = None) -> list:
+    """Все ивенты сервера (память + архив) с момента since: [(sid, session), ...]"""
+    min_id = snowflake_from_time(since) if since is not None else None
+    archived = EVENT_STORE.load_archived_events(guild_id, min_id=min_id)
+    return _merge_event_history(guild_id, min_id, archived)
+
+async def get_guild_event_history_async(guild_id: int, since: float = None) -> list:
+    """get_guild_event_history для корутин: архив читается в потоке хранилища"""
+    min_id = snowflake_from_time(since) if since is not None else None
+    archived = await STORAGE.run(EVENT_STORE.load_archived_events, guild_id, min_id=min_id)
+    return _merge_event_history(guild_id, min_id, archived)
+
+def _merge_event_history(guild_id: int, min_id, archived: dict) -> list:
+    history = [
+        (sid, session) for sid, session in ALL_SESSIONS.by_guild(guild_id)
+        if min_id is None or int(sid) >= min_id
+    ]
+    history.extend((str(eid), session) for eid, session in sorted(archived.items()))
+    return sorted(history, key=lambda item: int(item[0]))
+
+archive_stopped_events()
 ALL_EVENTS = load_events_from_db()
-ALL_SESSIONS = {str(k): v for k, v in ALL_EVENTS.items()}
+ALL_SESSIONS = EventRegistry(ALL_EVENTS)
+
+# ===== API изменения ивентов =====
+# Все изменения слотов и состояния идут через эти корутины под замком ивента.
+# Веб-панель вызывает их же командами через шину команд (см. process_*_command).
+EVENT_LOCKS = StripedLocks()
+
+async def signup_to_slot(event_id: int, user_id: int, index: int) -> str:
+    """Записать пользователя на слот.
+    Возвращает: ok / not_found / stopped / bad_index / taken / already
+    """
+    async with EVENT_LOCKS.for_event(event_id):
+        session = ALL_SESSIONS.get(str(event_id))
+        if not session:
+            return "not_found"
+        if session.get("stopped"):
+            return "stopped"
+        roles = session["party_roles"]
+        if not 0 <= index < len(roles):
+            return "bad_index"
+        selected_role = roles[index]
+        if selected_role.get("user_id") and selected_role["user_id"] != user_id:
+            return "taken"
+        if selected_role.get("user_id") == user_id:
+            return "already"
+
+        # Снять запись только с других слотов пользователя, если есть
+        changed = [index]
+        for i, r in enumerate(roles):
+            if r.get("user_id") == user_id and i != index:
+                r["user_id"] = None
+                changed.append(i)
+        selected_role["user_id"] = user_id
+
+        register_signup(user_id, int(event_id))
+        saved = save_event_slots(int(event_id), session, changed)
+    await wait_saved(saved)
+    return "ok"
+
+async def unsubscribe_from_event(event_id: int, user_id: int) -> Optional[bool]:
+    """Выписать пользователя. None — ивент не найден, False — пользователь не записан"""
+    async with EVENT_LOCKS.for_event(event_id):
+        session = ALL_SESSIONS.get(str(event_id))
+        if not session:
+            return None
+        for i, role in enumerate(session["party_roles"]):
+            if role.get("user_id") == user_id:
+                role["user_id"] = None
+                saved = save_event_slots(int(event_id), session, [i])
+                break
+        else:
+            return False
+    await wait_saved(saved)
+    return True
+
+async def clear_slot(event_id: int, index: int) -> Optional[bool]:
+    """Освободить слот. None — ивент не найден, False — слот уже свободен"""
+    async with EVENT_LOCKS.for_event(event_id):
+        session = ALL_SESSIONS.get(str(event_id))
+        if not session:
+            return None
+        roles = session["party_roles"]
+        if not 0 <= index < len(roles) or not roles[index].get("user_id"):
+            return False
+        roles[index]["user_id"] = None
+        saved = save_event_slots(int(event_id), session, [index])
+    await wait_saved(saved)
+    return True
+
+async def stop_event(event_id: int) -> Optional[bool]:
+    """Остановить ивент. None — не найден, False — уже остановлен"""
+    async with EVENT_LOCKS.for_event(event_id):
+        session = ALL_SESSIONS.get(str(event_id))
+        if not session:
+            return None
+        if session.get("stopped"):
+            return False
+        ALL_SESSIONS.mark_stopped(str(event_id))
+        saved = save_event_fields(int(event_id), stopped=True)
+    await wait_saved(saved)
+    return True
+
+async def edit_event(event_id: int, title: str, description: str, time_str: str,
+                     role_names: list = None, keep_assignments: str = "name") -> Optional[dict]:
+    """Изменить ивент. keep_assignments: name — сохранить занятость по имени роли,
+    position — по совпадению имени на той же позиции, None — сбросить запись.
+    """
+    async with EVENT_LOCKS.for_event(event_id):
+        session = ALL_SESSIONS.get(str(event_id))
+        if not session:
+            return None
+        session["title"] = title
+        session["description"] = description
+        session["time"] = time_str
+        if role_names:
+            old_roles = session["party_roles"]
+            new_roles = []
+            for idx, role_name in enumerate(role_names):
+                user_id = None
+                if keep_assignments == "name":
+                    # Попытаемся найти прежний user_id по имени роли
+                    for r in old_roles:
+                        if r["name"] == role_name:
+                            user_id = r.get("user_id")
+                            break
+                elif keep_assignments == "position":
+                    if idx < len(old_roles) and old_roles[idx].get("name") == role_name:
+                        user_id = old_roles[idx].get("user_id")
+                new_roles.append({"name": role_name, "user_id": user_id})
+            session["party_roles"] = new_roles
+        saved = save_event(int(event_id), session)
+    await wait_saved(saved)
+    return session
 
 intents = discord.Intents.all()
 bot = commands.Bot(command_prefix="/", intents=intents)
@@ -538,88 +676,75 @@ class PartySelectView(ui.View):
         self.add_item(CloneButton(session_id))
         self.add_item(RefreshButton(session_id))
 
-class PartySignupSelect(ui.Select):
-    def __init__(self, options, session_id, user_id, placeholder="Выберите роль для записи"):
-        super().__init__(
+# Компоненты ивентов — динамические: один шаблон custom_id на класс вместо View на каждый ивент.
+# Формат custom_id сохранён, поэтому старые сообщения продолжают работать.
+
+class PartySignupSelect(ui.DynamicItem[ui.Select], template=r"signup_select_(?P<sid>\d+)_(?P<count>\d+)"):
+    def __init__(self, options, session_id, user_id, placeholder="Выберите роль для записи", custom_id=None):
+        super().__init__(ui.Select(
             placeholder=placeholder, 
             options=options, 
             max_values=1,
-            custom_id=f"signup_select_{session_id}_{len(options)}"  # Добавляем уникальность
-        )
-        self.session_id = session_id
+            custom_id=custom_id or f"signup_select_{session_id}_{len(options)}"  # Добавляем уникальность
+        ))
+        self.session_id = int(session_id)
         self.user_id = user_id
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Select, match):
+        return cls(item.options, int(match["sid"]), interaction.user.id, item.placeholder, custom_id=item.custom_id)
+
+    @property
+    def values(self):
+        return self.item.values
+
     async def callback(self, interaction: discord.Interaction):
-        session = ALL_SESSIONS.get(str(self.session_id))
-        if not session:
-            await interaction.response.send_message("Ошибка: сессия не найдена.", ephemeral=True)
-            return
-        roles = session["party_roles"]
         user_id = interaction.user.id
+        result = await signup_to_slot(self.session_id, user_id, int(self.values[0]))
 
-        if session.get("stopped"):
+        if result in ("not_found", "bad_index"):
+            await interaction.response.send_message("Ошибка: сессия не найдена.", ephemeral=True)
+            return
+        if result == "stopped":
             await interaction.response.send_message("❌ Ивент остановлен, запись закрыта.", ephemeral=True)
             return
-
-        index = int(self.values[0])
-        selected_role = roles[index]
-
-        if selected_role.get("user_id") and selected_role["user_id"] != user_id:
+        if result == "taken":
             await interaction.response.send_message("❌ Этот слот уже занят другим участником.", ephemeral=True)
             return
-
-        if selected_role.get("user_id") == user_id:
+        if result == "already":
             await interaction.response.send_message("❗ Вы уже записаны на этот слот.", ephemeral=True)
             return
 
-        # Снять запись только с других слотов пользователя, если есть
-        for i, r in enumerate(roles):
-            if r.get("user_id") == user_id and i != index:
-                r["user_id"] = None
-
-        selected_role["user_id"] = user_id
-
-        register_signup(user_id, self.session_id)
-        ALL_SESSIONS[str(self.session_id)] = session
-        save_all_data()
-        save_event(int(self.session_id), session)
         await interaction.response.defer()
         await update_party_message(self.session_id, interacting_user_id=user_id)
         await interaction.followup.send("✅ Вы успешно записались!", ephemeral=True)
 
-class PartyUnsubscribeButton(ui.Button):
+class PartyUnsubscribeButton(ui.DynamicItem[ui.Button], template=r"unsubscribe_button_(?P<sid>\d+)"):
     def __init__(self, session_id, user_id):
-        super().__init__(
+        super().__init__(ui.Button(
             label="🚪 Выписаться", 
             style=discord.ButtonStyle.danger,
             custom_id=f"unsubscribe_button_{session_id}"  # Добавляем custom_id
-        )
-        self.session_id = session_id
+        ))
+        self.session_id = int(session_id)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(int(match["sid"]), interaction.user.id)
 
     async def callback(self, interaction: discord.Interaction):
         user_id = interaction.user.id
-        session = ALL_SESSIONS.get(str(self.session_id))
-        if not session:
+        found = await unsubscribe_from_event(self.session_id, user_id)
+        if found is None:
             await interaction.response.defer()
             await update_party_message(self.session_id, interacting_user_id=user_id)
             await interaction.followup.send("❌ Ошибка: сессия не найдена.", ephemeral=True)
             return
 
-        roles = session["party_roles"]
-        found = False
-
-        for role in roles:
-            if role.get("user_id") == user_id:
-                role["user_id"] = None
-                found = True
-                break
-
         if found:
-            ALL_SESSIONS[str(self.session_id)] = session
-            save_all_data()
-            save_event(int(self.session_id), session)
+            await interaction.response.defer(ephemeral=True)
             await update_party_message(self.session_id, interacting_user_id=user_id)
-            await interaction.response.send_message("✅ Вы выписались со своего слота.", ephemeral=True)
+            await interaction.followup.send("✅ Вы выписались со своего слота.", ephemeral=True)
 
         else:
             await interaction.response.send_message("❌ Вы не записаны ни на один слот, ничего не изменено.", ephemeral=True)
@@ -632,39 +757,39 @@ class PartyUnsubscribeSelect(ui.Select):
         self.user_id = user_id
 
     async def callback(self, interaction: discord.Interaction):
-        session = ALL_SESSIONS.get(str(self.session_id))
-        if not session:
+        cleared = await clear_slot(self.session_id, int(self.values[0]))
+        if cleared is None:
             await interaction.response.send_message("Ошибка: сессия не найдена.", ephemeral=True)
             return
-        roles = session["party_roles"]
-        index = int(self.values[0])
-        if roles[index].get("user_id"):
-            roles[index]["user_id"] = None
-            ALL_SESSIONS[str(self.session_id)] = session
-            save_all_data()
-            save_event(int(self.session_id), session)
+        if cleared:
+            await interaction.response.defer(ephemeral=True)
             await update_party_message(self.session_id, interacting_user_id=interaction.user.id)
-            await interaction.response.send_message("✅ Участник выписан.", ephemeral=True)
+            await interaction.followup.send("✅ Участник выписан.", ephemeral=True)
         else:
             await interaction.response.send_message("Этот слот уже свободен.", ephemeral=True)
 
-class CloneButton(ui.Button):
+class CloneButton(ui.DynamicItem[ui.Button], template=r"clone_button_(?P<sid>\d+)"):
     def __init__(self, session_id):
-        super().__init__(
+        super().__init__(ui.Button(
             label="📄 Скопировать", 
             style=discord.ButtonStyle.gray,
             custom_id=f"clone_button_{session_id}"  # Добавляем custom_id
-        )
-        self.session_id = session_id
+        ))
+        self.session_id = int(session_id)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(int(match["sid"]))
 
     async def callback(self, interaction: discord.Interaction):
-        session = ALL_SESSIONS.get(str(self.session_id))
+        # Копировать можно и архивный ивент — он подгрузится из events.db
+        session = await get_event_async(self.session_id)
         if not session:
             await interaction.response.send_message("Ошибка: сессия не найдена.", ephemeral=True)
             return
         
         # Проверка прав (только создатель события или администратор)
-        moderator_role_id = get_guild_setting(interaction.guild.id, "moderator_role")
+        moderator_role_id = await get_guild_setting_async(interaction.guild.id, "moderator_role")
         is_moderator = moderator_role_id and any(r.id == moderator_role_id for r in interaction.user.roles)
         is_creator = interaction.user.id == session["creator_id"]
         is_admin = interaction.user.guild_permissions.administrator
@@ -672,6 +797,9 @@ class CloneButton(ui.Button):
         if not (is_creator or is_moderator or is_admin):
             await interaction.response.send_message("❌ Только создатель события, администратор или модератор может клонировать события.", ephemeral=True)
             return
+
+        # Отправка сообщения, ветка и перерисовка дольше 3 секунд — сразу подтверждаем взаимодействие
+        await interaction.response.defer(ephemeral=True)
         
         role_list = [r["name"] for r in session["party_roles"]]
         embed = discord.Embed(
@@ -688,8 +816,8 @@ class CloneButton(ui.Button):
         new_session_id = msg.id
         
         # Используем настройки конкретного сервера
-        event_creator_role_id = get_guild_setting(interaction.guild.id, "event_creator_role")
-        moderator_role_id = get_guild_setting(interaction.guild.id, "moderator_role")
+        event_creator_role_id = await get_guild_setting_async(interaction.guild.id, "event_creator_role")
+        moderator_role_id = await get_guild_setting_async(interaction.guild.id, "moderator_role")
         creator_id = bot.user.id  # по умолчанию
 
         # Ищем первого пользователя с нужной ролью
@@ -714,19 +842,22 @@ class CloneButton(ui.Button):
             "stopped": False,
             "last_reminder_time": 0
         }
-        save_all_data()
         save_event(new_session_id, ALL_SESSIONS[str(new_session_id)])
         await update_party_message(new_session_id, interacting_user_id=interaction.user.id)
-        await interaction.response.send_message(f"✅ Копия создана: {msg.jump_url}", ephemeral=True)
+        await interaction.followup.send(f"✅ Копия создана: {msg.jump_url}", ephemeral=True)
 
-class StopEventButton(ui.Button):
+class StopEventButton(ui.DynamicItem[ui.Button], template=r"stop_button_(?P<sid>\d+)"):
     def __init__(self, session_id):
-        super().__init__(
+        super().__init__(ui.Button(
             label="⏹ Остановить ивент", 
             style=discord.ButtonStyle.red,
             custom_id=f"stop_button_{session_id}"
-        )
-        self.session_id = session_id
+        ))
+        self.session_id = int(session_id)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(int(match["sid"]))
 
     async def callback(self, interaction: discord.Interaction):
         session = ALL_SESSIONS.get(str(self.session_id))
@@ -734,29 +865,30 @@ class StopEventButton(ui.Button):
             await interaction.response.send_message("Ошибка: сессия не найдена.", ephemeral=True)
             return
         guild = interaction.guild
-        moderator_role_id = get_guild_setting(interaction.guild.id, "moderator_role")
+        moderator_role_id = await get_guild_setting_async(interaction.guild.id, "moderator_role")
         is_moderator = moderator_role_id and any(r.id == moderator_role_id for r in interaction.user.roles)
         if interaction.user.id != session["creator_id"] and not is_moderator:
             await interaction.response.send_message("Только создатель ивента или модератор может редактировать.", ephemeral=True)
             return
-        if session.get("stopped"):
-            await interaction.response.send_message("Ивент уже остановлен.", ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        if not await stop_event(self.session_id):
+            await interaction.followup.send("Ивент уже остановлен.", ephemeral=True)
             return
-        session["stopped"] = True
-        ALL_SESSIONS[str(self.session_id)] = session
-        save_all_data()
-        save_event(int(self.session_id), session)
         await update_party_message(self.session_id, interacting_user_id=interaction.user.id)
-        await interaction.response.send_message("Ивент остановлен, запись закрыта.", ephemeral=True)
+        await interaction.followup.send("Ивент остановлен, запись закрыта.", ephemeral=True)
 
-class RemindButton(ui.Button):
+class RemindButton(ui.DynamicItem[ui.Button], template=r"remind_button_(?P<sid>\d+)"):
     def __init__(self, session_id):
-        super().__init__(
+        super().__init__(ui.Button(
             label="📢 Напомнить", 
             style=discord.ButtonStyle.primary,
             custom_id=f"remind_button_{session_id}"  # Добавляем custom_id
-        )
-        self.session_id = session_id
+        ))
+        self.session_id = int(session_id)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(int(match["sid"]))
 
     async def callback(self, interaction: discord.Interaction):
         session = ALL_SESSIONS.get(str(self.session_id))
@@ -776,14 +908,18 @@ class RemindButton(ui.Button):
         else:
             await interaction.response.send_message("Нет записавшихся участников для напоминания.", ephemeral=True)
 
-class PartyCheckButton(ui.Button):
+class PartyCheckButton(ui.DynamicItem[ui.Button], template=r"check_button_(?P<sid>\d+)"):
     def __init__(self, session_id):
-        super().__init__(
+        super().__init__(ui.Button(
             label="📋 Party Check", 
             style=discord.ButtonStyle.green,
             custom_id=f"check_button_{session_id}"  # Добавляем custom_id
-        )
-        self.session_id = session_id
+        ))
+        self.session_id = int(session_id)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(int(match["sid"]))
 
     async def callback(self, interaction: discord.Interaction):
         session = ALL_SESSIONS.get(str(self.session_id))
@@ -792,7 +928,7 @@ class PartyCheckButton(ui.Button):
             return
         
         # Проверка прав (только создатель события или администратор)
-        moderator_role_id = get_guild_setting(interaction.guild.id, "moderator_role")
+        moderator_role_id = await get_guild_setting_async(interaction.guild.id, "moderator_role")
         is_moderator = moderator_role_id and any(r.id == moderator_role_id for r in interaction.user.roles)
         is_creator = interaction.user.id == session["creator_id"]
         is_admin = interaction.user.guild_permissions.administrator
@@ -832,18 +968,23 @@ class PartyCheckButton(ui.Button):
                 ephemeral=True
             )
 
-class RefreshButton(ui.Button):
+class RefreshButton(ui.DynamicItem[ui.Button], template=r"refresh_button_(?P<sid>\d+)"):
     def __init__(self, session_id):
-        super().__init__(
+        super().__init__(ui.Button(
             label="🔄 Обновить", 
             style=discord.ButtonStyle.secondary,
             custom_id=f"refresh_button_{session_id}"  # Добавляем custom_id
-        )
-        self.session_id = session_id
+        ))
+        self.session_id = int(session_id)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(int(match["sid"]))
 
     async def callback(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
         await update_party_message(self.session_id, interacting_user_id=interaction.user.id)
-        await interaction.response.send_message("Обновлено", ephemeral=True)
+        await interaction.followup.send("Обновлено", ephemeral=True)
 
 class EditModal(ui.Modal, title="Редактирование ивента"):
     def __init__(self, session_id: int):
@@ -875,38 +1016,31 @@ class EditModal(ui.Modal, title="Редактирование ивента"):
             await interaction.response.send_message("❌ Слишком много ролей (максимум 50). Уменьшите количество ролей.", ephemeral=True)
             return
 
-        # Сохраняем новые данные
-        session["title"] = self.name.value.strip()
-        session["description"] = self.desc.value.strip()
-        session["time"] = self.time.value.strip()
-
-        # Если количество ролей изменилось, то обновляем party_roles с сохранением занятости по совпадению имени
-        old_roles = session["party_roles"]
-        new_roles = []
-        for role_name in role_list:
-            # Попытаемся найти прежний user_id по имени роли
-            user_id = None
-            for r in old_roles:
-                if r["name"] == role_name:
-                    user_id = r.get("user_id")
-                    break
-            new_roles.append({"name": role_name, "user_id": user_id})
-        session["party_roles"] = new_roles
-
-        ALL_SESSIONS[str(self.session_id)] = session
-        save_all_data()
-        save_event(self.session_id, session)
+        await interaction.response.defer(ephemeral=True)
+        # Сохраняем новые данные; занятость переносится по совпадению имени роли
+        await edit_event(
+            self.session_id,
+            self.name.value.strip(),
+            self.desc.value.strip(),
+            self.time.value.strip(),
+            role_list,
+            keep_assignments="name",
+        )
         await update_party_message(self.session_id, interacting_user_id=interaction.user.id)
-        await interaction.response.send_message("Ивент обновлён", ephemeral=True)
+        await interaction.followup.send("Ивент обновлён", ephemeral=True)
 
-class EditButton(ui.Button):
+class EditButton(ui.DynamicItem[ui.Button], template=r"edit_button_(?P<sid>\d+)"):
     def __init__(self, session_id):
-        super().__init__(
+        super().__init__(ui.Button(
             label="✏️ Редактировать", 
             style=discord.ButtonStyle.secondary,
             custom_id=f"edit_button_{session_id}"  # Добавляем custom_id
-        )
-        self.session_id = session_id
+        ))
+        self.session_id = int(session_id)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: ui.Button, match):
+        return cls(int(match["sid"]))
 
     async def callback(self, interaction: discord.Interaction):
         session = ALL_SESSIONS.get(str(self.session_id))
@@ -960,9 +1094,9 @@ class SaveButton(discord.ui.Button):
             return
         
         # Сохраняем настройки для конкретного сервера
-        set_guild_setting(interaction.guild.id, "monitored_channels", [self.parent_view.selected_channel])
-        set_guild_setting(interaction.guild.id, "event_creator_role", self.event_creator_role.id)
-        set_guild_setting(interaction.guild.id, "moderator_role", self.moderator_role.id)
+        await set_guild_setting_async(interaction.guild.id, "monitored_channels", [self.parent_view.selected_channel])
+        await set_guild_setting_async(interaction.guild.id, "event_creator_role", self.event_creator_role.id)
+        await set_guild_setting_async(interaction.guild.id, "moderator_role", self.moderator_role.id)
         
         channel = interaction.guild.get_channel(self.parent_view.selected_channel)
         await interaction.response.send_message(
@@ -976,30 +1110,28 @@ class SaveButton(discord.ui.Button):
 # --- Functions ---
 
 async def update_party_message(event_id: int, interacting_user_id=None):
+    """Запросить перерисовку сообщения ивента.
+    Частые изменения объединяются в одно редактирование за окно PARTY_RENDER_WINDOW_MS;
+    корутина завершается, когда последнее состояние видно в Discord.
+    """
+    return await PARTY_RENDERER.request(event_id, interacting_user_id)
+
+async def _render_party_message(event_id: int, interacting_user_id=None) -> bool:
+    """Отредактировать сообщение ивента; False — редактирования не было"""
     session = ALL_SESSIONS.get(str(event_id))
     if not session:
-        return
+        return False
     guild = bot.get_guild(session["guild_id"])
     if not guild:
-        return
+        return False
     channel = guild.get_channel(session["channel_id"])
     if not channel:
-        return
-    try:
-        message = await channel.fetch_message(session["main_msg_id"])
-    except discord.NotFound:
-        # Сообщение удалено - помечаем ивент как остановленный
-        print(f"Сообщение ивента {event_id} не найдено, автоматически останавливаем")
-        session["stopped"] = True
-        ALL_SESSIONS[str(event_id)] = session
-        save_all_data()
-        save_event(event_id, session)
-        return
-    except Exception:
-        return
+        return False
+    # Частичное сообщение: редактируем без предварительного fetch_message
+    message = MESSAGE_HANDLES.get(channel, session["main_msg_id"])
 
     # Получаем кого пингуем
-    ping_val = get_guild_setting(session["guild_id"], "ping_role", "everyone")
+    ping_val = await get_guild_setting_async(session["guild_id"], "ping_role", "everyone")
     if ping_val == "everyone":
         ping_text = "@everyone"
         allowed_mentions = discord.AllowedMentions(everyone=True)
@@ -1043,16 +1175,35 @@ async def update_party_message(event_id: int, interacting_user_id=None):
 
     view = PartySelectView(event_id, interacting_user_id or 0)
     view.timeout = None
+
+    # Ничего видимого не изменилось — не тратим редактирование и лимиты Discord
+    new_hash = compute_render_hash(text, view.to_components())
+    if RENDER_HASHES.get(int(event_id)) == new_hash:
+        return False
+
     try:
         await message.edit(content=text, view=view, embed=None, allowed_mentions=allowed_mentions)
+        RENDER_HASHES[int(event_id)] = new_hash
+        EVENT_WRITER.submit("set_render_hash", int(event_id), new_hash)
+        return True
+    except discord.NotFound:
+        # Сообщение удалено - помечаем ивент как остановленный
+        print(f"Сообщение ивента {event_id} не найдено, автоматически останавливаем")
+        MESSAGE_HANDLES.forget(message.id)
+        await stop_event(event_id)
     except Exception as e:
         print(f"Ошибка при обновлении сообщения: {e}")
+    return False
+
+MESSAGE_HANDLES = MessageHandleCache()
+RENDER_HASHES = EVENT_STORE.load_render_hashes()
+PARTY_RENDERER = RenderCoalescer(_render_party_message)
 
 def register_signup(user_id: int, session_id: int):
     if user_id not in PARTY_STATS:
         PARTY_STATS[user_id] = set()
     PARTY_STATS[user_id].add(session_id)
-    save_all_data()
+    EVENT_WRITER.submit("add_attendance", user_id, int(session_id))
 
 
 # --- Commands ---
@@ -1139,14 +1290,12 @@ async def show_settings_info(interaction: discord.Interaction):
     started = _t.time()
     guild_id = interaction.guild.id
     try:
-        # Централизованная функция с дефолтами (импорт ленивый чтобы избежать циклов)
-        from party_bot.web import get_complete_guild_settings, DEFAULT_SETTINGS  # type: ignore
-        full_settings = get_complete_guild_settings(guild_id)
+        # Настройки с дефолтами из единого сервиса настроек
+        full_settings = await STORAGE.run(lambda: get_settings_service().get_complete(guild_id))
         source = "🗃️ settings.db"
     except Exception as e:
-        # Fallback если веб модуль не прогружен
         print(f"[SETTINGS CMD] fallback direct DB: {e}")
-        full_settings = get_guild_settings(guild_id) or {}
+        full_settings = await get_guild_settings_async(guild_id) or {}
         # Минимальные дефолты
         full_settings.setdefault('reminder_time', [0,15])
         full_settings.setdefault('monitored_channels', [])
@@ -1320,7 +1469,7 @@ async def create_party_modal(interaction: discord.Interaction):
             embed.add_field(name="Роли", value="\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(role_list)]), inline=False)
 
             guild_id = str(interaction.guild_id)
-            ping_val = get_guild_setting(interaction.guild.id, "ping_role", "everyone")
+            ping_val = await get_guild_setting_async(interaction.guild.id, "ping_role", "everyone")
             if ping_val == "everyone":
                 ping_text = "@everyone"
                 allowed_mentions = discord.AllowedMentions(everyone=True)
@@ -1354,7 +1503,6 @@ async def create_party_modal(interaction: discord.Interaction):
                 "stopped": False,
                 "last_reminder_time": 0
             }
-            save_all_data()
             save_event(msg.id, ALL_SESSIONS[str(msg.id)])
             await update_party_message(msg.id, interacting_user_id=interaction.user.id)
             
@@ -1387,12 +1535,12 @@ async def show_stats(interaction: discord.Interaction):
 
 async def use_template_action(interaction: discord.Interaction, template: str):
     # Используем шаблоны конкретного сервера
-    template_data = get_guild_template(interaction.guild.id, template)
+    template_data = await get_guild_template_async(interaction.guild.id, template)
     if not template_data:
         await interaction.response.send_message("❌ Шаблон не найден", ephemeral=True)
         return
     guild_id = str(interaction.guild_id)
-    ping_val = get_guild_setting(interaction.guild.id, "ping_role", "everyone")
+    ping_val = await get_guild_setting_async(interaction.guild.id, "ping_role", "everyone")
     if ping_val == "everyone":
         ping_text = "@everyone"
         allowed_mentions = discord.AllowedMentions(everyone=True)
@@ -1409,6 +1557,8 @@ async def use_template_action(interaction: discord.Interaction, template: str):
         "**Роли:**\n" + "\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(template_data["roles"])])
     )
 
+    # Отправка, ветка и перерисовка дольше 3 секунд — сразу подтверждаем взаимодействие
+    await interaction.response.defer(ephemeral=True)
     msg = await interaction.channel.send(text, allowed_mentions=allowed_mentions)
     thread = await msg.create_thread(name=template_data["title"])
 
@@ -1425,11 +1575,10 @@ async def use_template_action(interaction: discord.Interaction, template: str):
         "stopped": False,
         "last_reminder_time": 0
     }
-    save_all_data()
     save_event(msg.id, ALL_SESSIONS[str(msg.id)])
     await update_party_message(msg.id, interacting_user_id=interaction.user.id)
     
-    await interaction.response.send_message(f"✅ Ивент создан из шаблона '{template}'", ephemeral=True)
+    await interaction.followup.send(f"✅ Ивент создан из шаблона '{template}'", ephemeral=True)
 
 async def export_history_action(interaction: discord.Interaction, days: int = 30):
     if not interaction.user.guild_permissions.administrator:
@@ -1443,14 +1592,11 @@ async def export_history_action(interaction: discord.Interaction, days: int = 30
     current_time = datetime.now()
     cutoff = current_time - timedelta(days=days)
 
-    for session_id, session in ALL_SESSIONS.items():
-        if session["guild_id"] != guild.id:
-            continue
+    for session_id, session in await get_guild_event_history_async(guild.id, since=cutoff.timestamp()):
 
-        # Получаем дату создания из session_id (если это snowflake)
+        # Получаем дату создания из session_id (это snowflake сообщения)
         try:
-            timestamp = int(session_id) / 1000
-            created_at = datetime.fromtimestamp(timestamp)
+            created_at = datetime.fromtimestamp(snowflake_time(session_id))
         except Exception:
             created_at = None
 
@@ -1487,17 +1633,15 @@ async def export_history_action(interaction: discord.Interaction, days: int = 30
         await interaction.followup.send("Ивентов не найдено за указанный период.", ephemeral=True)
         return
         
+    # Файл собираем в памяти — без записи на диск из цикла бота
     filename = f"events_history_{guild.name}_{current_time.strftime('%Y%m%d_%H%M')}.txt"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write("\n\n".join(history))
+    report = io.BytesIO("\n\n".join(history).encode("utf-8"))
         
     await interaction.followup.send(
         f"📄 История ивентов за {days} дней:",
-        file=discord.File(filename),
+        file=discord.File(report, filename=filename),
         ephemeral=True
     )
-    
-    os.remove(filename)
 
 
 async def stats(interaction: discord.Interaction):
@@ -1534,14 +1678,11 @@ async def export_history(interaction: discord.Interaction, days: int = 30):
     current_time = datetime.now()
     cutoff = current_time - timedelta(days=days)
 
-    for session_id, session in ALL_SESSIONS.items():
-        if session["guild_id"] != guild.id:
-            continue
+    for session_id, session in await get_guild_event_history_async(guild.id, since=cutoff.timestamp()):
 
-        # Получаем дату создания из session_id (если это snowflake)
+        # Получаем дату создания из session_id (это snowflake сообщения)
         try:
-            timestamp = int(session_id) / 1000
-            created_at = datetime.fromtimestamp(timestamp)
+            created_at = datetime.fromtimestamp(snowflake_time(session_id))
         except Exception:
             created_at = None
 
@@ -1579,17 +1720,15 @@ async def export_history(interaction: discord.Interaction, days: int = 30):
         await interaction.followup.send("Ивентов не найдено за указанный период.", ephemeral=True)
         return
         
+    # Файл собираем в памяти — без записи на диск из цикла бота
     filename = f"events_history_{guild.name}_{current_time.strftime('%Y%m%d_%H%M')}.txt"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write("\n\n".join(history))
+    report = io.BytesIO("\n\n".join(history).encode("utf-8"))
         
     await interaction.followup.send(
         f"📄 История ивентов за {days} дней:",
-        file=discord.File(filename),
+        file=discord.File(report, filename=filename),
         ephemeral=True
     )
-    
-    os.remove(filename)
 
 @bot.tree.command(name="templates", description="Управление шаблонами")
 @app_commands.describe(
@@ -1743,6 +1882,16 @@ async def links_command(
             print(f"Ошибка при отправке сообщения об ошибке: {followup_error}")
             pass
 
+def _load_event_creator_roles(guild_id: int) -> list:
+    """Роли создателей событий (с учётом старой настройки event_creator_role)"""
+    event_roles = get_guild_setting(guild_id, "event_creator_roles", [])
+    if not event_roles:
+        # Проверяем старую настройку
+        old_role = get_guild_setting(guild_id, "event_creator_role")
+        if old_role:
+            event_roles = [old_role]
+    return event_roles
+
 @bot.tree.command(name="role-links", description="Управление ролевыми ссылками для событий")
 @app_commands.describe(
     action="Выберите действие",
@@ -1808,13 +1957,7 @@ async def role_links_command(
         elif action == "show":
             # Получаем настроенные роли
             try:
-                from unified_settings import get_guild_setting
-                event_roles = get_guild_setting(guild_id, "event_creator_roles", [])
-                if not event_roles:
-                    # Проверяем старую настройку
-                    old_role = get_guild_setting(guild_id, "event_creator_role")
-                    if old_role:
-                        event_roles = [old_role]
+                event_roles = await STORAGE.run(_load_event_creator_roles, guild_id)
             except:
                 event_roles = []
             
@@ -1854,12 +1997,7 @@ async def role_links_command(
             
             # Проверяем, настроена ли эта роль
             try:
-                from unified_settings import get_guild_setting
-                event_roles = get_guild_setting(guild_id, "event_creator_roles", [])
-                if not event_roles:
-                    old_role = get_guild_setting(guild_id, "event_creator_role")
-                    if old_role:
-                        event_roles = [old_role]
+                event_roles = await STORAGE.run(_load_event_creator_roles, guild_id)
             except:
                 event_roles = []
             
@@ -1972,7 +2110,7 @@ async def create_template_modal(interaction: discord.Interaction):
                     return
 
                 # Создаем шаблон для конкретного сервера
-                set_guild_template(interaction.guild.id, name, {
+                await set_guild_template_async(interaction.guild.id, name, {
                     "title": self.template_title.value.strip(),
                     "description": self.template_desc.value.strip(),
                     "roles": roles
@@ -2004,7 +2142,7 @@ async def list_templates_action(interaction: discord.Interaction):
             return
             
         # Используем шаблоны конкретного сервера
-        guild_templates = get_guild_templates(interaction.guild.id)
+        guild_templates = await get_guild_templates_async(interaction.guild.id)
         if not guild_templates:
             if not interaction.response.is_done():
                 await interaction.response.send_message("❌ На этом сервере нет доступных шаблонов", ephemeral=True)
@@ -2032,7 +2170,7 @@ async def list_templates_action(interaction: discord.Interaction):
 
 async def show_template_details(interaction: discord.Interaction, template: str):
     # Используем шаблоны конкретного сервера
-    template_data = get_guild_template(interaction.guild.id, template)
+    template_data = await get_guild_template_async(interaction.guild.id, template)
     if not template_data:
         await interaction.response.send_message("❌ Шаблон не найден на этом сервере", ephemeral=True)
         return
@@ -2052,7 +2190,7 @@ async def edit_template_modal(interaction: discord.Interaction, template: str):
         return
     
     # Используем шаблоны конкретного сервера
-    template_data = get_guild_template(interaction.guild.id, template)
+    template_data = await get_guild_template_async(interaction.guild.id, template)
     if not template_data:
         await interaction.response.send_message("❌ Шаблон не найден на этом сервере", ephemeral=True)
         return
@@ -2091,7 +2229,7 @@ async def edit_template_modal(interaction: discord.Interaction, template: str):
                 return
 
             # Сохраняем в шаблоны сервера
-            set_guild_template(interaction.guild.id, template, {
+            await set_guild_template_async(interaction.guild.id, template, {
                 "title": self.template_title.value.strip(),
                 "description": self.template_desc.value.strip(),
                 "roles": roles
@@ -2117,7 +2255,7 @@ async def delete_template_action(interaction: discord.Interaction, template: str
         return
     
     # Используем шаблоны конкретного сервера
-    if not delete_guild_template(interaction.guild.id, template):
+    if not await delete_guild_template_async(interaction.guild.id, template):
         await interaction.response.send_message("❌ Шаблон не найден на этом сервере", ephemeral=True)
         return
     
@@ -2166,7 +2304,7 @@ async def create_template(interaction: discord.Interaction):
                 return
 
             # Создаем шаблон для конкретного сервера
-            set_guild_template(interaction.guild.id, name, {
+            await set_guild_template_async(interaction.guild.id, name, {
                 "title": self.template_title.value.strip(),
                 "description": self.template_desc.value.strip(),
                 "roles": roles
@@ -2191,12 +2329,12 @@ async def create_template(interaction: discord.Interaction):
 @app_commands.describe(template="Название шаблона", time="Время ивента (необязательно)")
 async def use_template(interaction: discord.Interaction, template: str, time: str = None):
     # Используем шаблоны конкретного сервера
-    template_data = get_guild_template(interaction.guild.id, template)
+    template_data = await get_guild_template_async(interaction.guild.id, template)
     if not template_data:
         await interaction.response.send_message("❌ Шаблон не найден на этом сервере", ephemeral=True)
         return
     guild_id = str(interaction.guild_id)
-    ping_val = get_guild_setting(interaction.guild.id, "ping_role", "everyone")
+    ping_val = await get_guild_setting_async(interaction.guild.id, "ping_role", "everyone")
     if ping_val == "everyone":
         ping_text = "@everyone"
         allowed_mentions = discord.AllowedMentions(everyone=True)
@@ -2216,6 +2354,8 @@ async def use_template(interaction: discord.Interaction, template: str, time: st
     role_list = template_data["roles"]
     text += "**Роли:**\n" + "\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(role_list)])
 
+    # Отправка, ветка и перерисовка дольше 3 секунд — сразу подтверждаем взаимодействие
+    await interaction.response.defer(ephemeral=True)
     msg = await interaction.channel.send(text, allowed_mentions=allowed_mentions)
     thread = await msg.create_thread(name=template_data["title"])
 
@@ -2232,10 +2372,9 @@ async def use_template(interaction: discord.Interaction, template: str, time: st
         "stopped": False,
         "last_reminder_time": 0
     }
-    save_all_data()
     save_event(msg.id, ALL_SESSIONS[str(msg.id)])
     await update_party_message(msg.id, interacting_user_id=interaction.user.id)
-    await interaction.response.send_message(f"✅ Ивент создан из шаблона '{template}'", ephemeral=True)
+    await interaction.followup.send(f"✅ Ивент создан из шаблона '{template}'", ephemeral=True)
 
 
 @bot.event
@@ -2260,6 +2399,9 @@ async def on_ready():
     
     print("=" * 60)
     
+    # STORAGE_DEBUG_BLOCKING: предупреждать о файловом/SQLite вводе-выводе в цикле бота
+    STORAGE.watch_loop()
+
     try:
         await setup_persistent_views()
         print("✅ Persistent views зарегистрированы")
@@ -2267,6 +2409,8 @@ async def on_ready():
         # Подключаем RecruitPot (если доступен) до синхронизации команд
         if RECRUIT_AVAILABLE:
             try:
+                # Постоянные соединения potatos_recruit.db для цикла бота
+                recruit_enable_pool()
                 await recruit_init_db()
                 await bot.add_cog(RecruitCog(bot))
                 print("✅ RecruitCog подключен (ReqrutPot)")
@@ -2287,6 +2431,12 @@ async def on_ready():
         # Запускаем фоновые задачи
         bot.loop.create_task(monitor_channel_activity())
         print("🔍 Задача мониторинга каналов запущена")
+
+        bot.loop.create_task(run_event_timers())
+        print("⏰ Движок напоминаний и автозакрытия запущен")
+
+        bot.loop.create_task(archive_loop())
+        print("🗄️ Архивация остановленных ивентов запущена")
         
         bot.loop.create_task(cleanup_channels())
         print("🧹 Задача очистки каналов запущена")
@@ -2311,30 +2461,29 @@ async def on_ready():
 
     # Онбординг для серверов без настроек (один раз)
     if RECRUIT_AVAILABLE:
-        try:
-            # Доступ к unified_settings, если импортировался
-            from ..unified_settings import unified_settings as _unified_settings_local  # type: ignore
-        except Exception:
-            _unified_settings_local = None
-        if _unified_settings_local is not None:
-            for guild in bot.guilds:
-                try:
-                    rs = _unified_settings_local.get_recruit_settings(guild.id)
-                    onboarding_sent = bool(rs.get("onboarding_sent", False))
-                    forum = rs.get("forum_channel")
-                    recruit_panel = rs.get("recruit_panel_channel")
-                    points_panel = rs.get("points_panel_channel")
-                    if not onboarding_sent and not (forum and (recruit_panel or points_panel)):
-                        await _send_onboarding(guild)
-                        rs["onboarding_sent"] = True
-                        _unified_settings_local.update_recruit_settings(guild.id, rs)
-                except Exception:
-                    continue
+        settings_service = await STORAGE.run(get_settings_service)
+        for guild in bot.guilds:
+            try:
+                rs = await STORAGE.run(settings_service.get_recruit_settings, guild.id)
+                onboarding_sent = bool(rs.get("onboarding_sent", False))
+                forum = rs.get("forum_channel")
+                recruit_panel = rs.get("recruit_panel_channel")
+                points_panel = rs.get("points_panel_channel")
+                if not onboarding_sent and not (forum and (recruit_panel or points_panel)):
+                    await _send_onboarding(guild)
+                    await STORAGE.run(settings_service.update_recruit_settings, guild.id, {"onboarding_sent": True})
+            except Exception:
+                continue
+
+PARTY_DYNAMIC_ITEMS = (
+    PartySignupSelect, PartyUnsubscribeButton, EditButton, StopEventButton,
+    RemindButton, PartyCheckButton, CloneButton, RefreshButton,
+)
 
 async def setup_persistent_views():
-    for session_id in ALL_SESSIONS.keys():
-        view = PartySelectView(int(session_id), 0)
-        bot.add_view(view)
+    # Один маршрутизатор по шаблонам custom_id обслуживает все ивенты,
+    # независимо от их количества
+    bot.add_dynamic_items(*PARTY_DYNAMIC_ITEMS)
     # Регистрируем постоянные UI из ReqrutPot, если доступны
     if RECRUIT_AVAILABLE:
         try:
@@ -2417,199 +2566,294 @@ async def on_interaction(interaction: discord.Interaction):
             await interaction.response.edit_message(view=view)
 
 
+POLL_DURATION = 900  # Опрос длится 15 минут
+POLL_REACTIONS = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣"]
+GUILD_SCHEDULER = GuildScheduler()
+
 async def monitor_channel_activity():
+    """Планировщик: раз в 5 минут запускает независимые задачи каждого сервера.
+    Напоминания и автозакрытие обслуживает EVENT_TIMERS.
+    """
     await bot.wait_until_ready()
+
+    # Возобновляем опросы, открытые до перезапуска
+    for poll in await STORAGE.run(EVENT_STORE.load_polls):
+        GUILD_SCHEDULER.spawn(("poll", poll["message_id"]), lambda p=poll: _run_poll(p), bounded=False)
+
     while not bot.is_closed():
-        now_utc = datetime.now(timezone.utc)
         for guild in bot.guilds:
-            guild_id = str(guild.id)
-            start, end = get_guild_setting(guild.id, "monitoring_time", [10, 20])
-            if start <= now_utc.hour < end:  # Проверяем только в дневное время
-                monitoring_enabled = get_guild_setting(guild.id, "monitoring_enabled", True)
-                if not monitoring_enabled:
-                    continue
-                channels = get_guild_setting(guild.id, "monitored_channels", [])
-                for channel_id in channels:
-                    channel = guild.get_channel(channel_id)
-                    if not channel:
-                        continue
-                    # Получаем последнее сообщение
-                    messages = [msg async for msg in channel.history(limit=1)]
-                    if not messages:
-                        continue
-                    last_message = messages[0]
-                    # Если не было сообщений 1 час
-                    now = datetime.now(last_message.created_at.tzinfo)
-                    if (now - last_message.created_at).total_seconds() > 4800:  # 1 час
-                        # Проверяем, есть ли уже активный опрос
-                        recent = [msg async for msg in channel.history(limit=3)]
-                        poll_exists = any(
-                            msg.author == bot.user and msg.embeds and msg.embeds[0].title == "📊 Чем займемся?"
-                            for msg in recent
-                        )
-                        if poll_exists:
-                            continue
-                        # Получаем варианты опроса из шаблонов сервера
-                        guild_templates = get_guild_templates(guild.id)
-                        options = list(guild_templates.keys())[:8]
-                        text = (
-                            "📊 **Чем займемся?**\n"
-                            "Голосуем за активность! (15 минут)\n\n" +
-                            "\n".join([f"{i+1}. {opt}" for i, opt in enumerate(options)])
-                        )
-                        poll_msg = await channel.send(
-                            f"@everyone\n{text}",
-                            allowed_mentions=discord.AllowedMentions(everyone=True)
-                        )
-                        reactions = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣"]
-                        for i in range(len(options)):
-                            await poll_msg.add_reaction(reactions[i])
-                        # Ждем 15 минут
-                        await asyncio.sleep(900)
-                        poll_msg = await channel.fetch_message(poll_msg.id)
-                        votes = []
-                        for i in range(len(options)):
-                            reaction_obj = discord.utils.get(poll_msg.reactions, emoji=reactions[i])
-                            count = reaction_obj.count - 1 if reaction_obj else 0
-                            template_name = options[i]
-                            # Используем шаблоны конкретного сервера
-                            template_data = get_guild_template(guild.id, template_name)
-                            roles_count = len(template_data["roles"]) if template_data else 0
-                            # "Потенциал сбора" — сколько процентов от полного состава проголосовало
-                            fill_ratio = count / roles_count if roles_count else 0
-                            votes.append((template_name, count, fill_ratio))
-
-                        # Сортируем сначала по fill_ratio, потом по количеству голосов
-                        votes.sort(key=lambda x: (x[2], x[1]), reverse=True)
-                        winner = votes[0][0] if votes and votes[0][1] > 0 else None
-                        template_data = get_guild_template(guild.id, winner) if winner else None
-                        if winner and template_data:
-                            # template_data уже получен выше
-                            guild_id = str(guild.id)
-                            ping_val = get_guild_setting(guild.id, "ping_role", "everyone")
-                            if ping_val == "everyone":
-                                ping_text = "@everyone"
-                                allowed_mentions = discord.AllowedMentions(everyone=True)
-                            else:
-                                role = guild.get_role(int(ping_val))
-                                ping_text = role.mention if role and role.mentionable else "@everyone"
-                                allowed_mentions = discord.AllowedMentions(everyone=True) if ping_text == "@everyone" else discord.AllowedMentions(roles=True)
-
-                            text = (
-                                f"{ping_text}\n"
-                                f"**{template_data['title']}**\n"
-                                f"{template_data['description']}\n\n"
-                                "**Роли:**\n" +
-                                "\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(template_data["roles"])])
-                            )
-                            msg = await channel.send(text, allowed_mentions=allowed_mentions)
-                            thread = await msg.create_thread(name=template_data["title"])
-                            event_creator_role_id = get_guild_setting(guild.id, "event_creator_role")
-                            moderator_role_id = get_guild_setting(guild.id, "moderator_role")
-                            creator_id = bot.user.id  # по умолчанию
-
-                            # Ищем первого пользователя с нужной ролью
-                            for member in guild.members:
-                                if event_creator_role_id and any(r.id == event_creator_role_id for r in member.roles):
-                                    creator_id = member.id
-                                    break
-                                if moderator_role_id and any(r.id == moderator_role_id for r in member.roles):
-                                    creator_id = member.id
-                                    break
-
-                            ALL_SESSIONS[str(msg.id)] = {
-                                "guild_id": guild.id,
-                                "channel_id": channel.id,
-                                "main_msg_id": msg.id,
-                                "thread_id": thread.id,
-                                "title": template_data["title"],
-                                "description": template_data["description"],
-                                "time": "",
-                                "party_roles": [{"name": r, "user_id": None} for r in template_data["roles"]],
-                                "creator_id": creator_id,
-                                "stopped": False,
-                                "last_reminder_time": 0
-                            }
-                            save_all_data()
-                            save_event(msg.id, ALL_SESSIONS[str(msg.id)])
-                            await update_party_message(msg.id)
-                            await poll_msg.delete()
-                        else:
-                            await channel.send("❌ Никто не проголосовал🛌.")
-                            await poll_msg.delete()
+            GUILD_SCHEDULER.spawn(("monitor", guild.id), lambda g=guild: _monitor_guild(g))
         await asyncio.sleep(300)  # Проверять каждые 5 минут
 
-        # Проверяем активные ивенты для напоминаний каждые 15 минут
-        for guild in bot.guilds:
-            monitored_channels = get_guild_setting(guild.id, "monitored_channels", [])
-            for channel_id in monitored_channels:
-                channel = guild.get_channel(channel_id)
-                if not channel:
-                    continue
-                for session_id, session in ALL_SESSIONS.items():
-                    if session["channel_id"] != channel_id or session.get("stopped"):
-                        continue
-                    
-                    empty_roles = [r for r in session["party_roles"] if not r.get("user_id")]
-                    filled_roles = [r for r in session["party_roles"] if r.get("user_id")]
-                    
-                    try:
-                        msg = await channel.fetch_message(session["main_msg_id"])
-                        event_age = (datetime.now(msg.created_at.tzinfo) - msg.created_at).total_seconds()
-                        
-                        # Логика напоминаний каждые 15 минут (900 секунд)
-                        # Напоминаем только если есть записавшиеся, но не все роли заняты
-                        reminders_enabled = get_guild_setting(guild.id, "reminders_enabled", True)
-                        if reminders_enabled and filled_roles and empty_roles and event_age > 900:
-                            # Проверяем, прошло ли 15 минут с последнего напоминания
-                            last_reminder = session.get("last_reminder_time", 0)
-                            time_since_reminder = event_age - last_reminder
-                            
-                            if time_since_reminder >= 900:  # 15 минут = 900 секунд
-                                # Отправляем напоминание записавшимся участникам
-                                mentions = [f"<@{role['user_id']}>" for role in filled_roles]
-                                empty_role_names = [role['name'] for role in empty_roles]
-                                
-                                reminder_text = (
-                                    f"📢 **Напоминание об ивенте:** {session['title']}\n"
-                                    f"@everyone\n"
-                                    f"Свободные роли: {', '.join(empty_role_names)}\n"
-                                    f"ЗАПОЛНИТЕ РОЛИ ЧТОБЫ КОНТЕНТ СОСТОЯЛСЯ 🎮"
-                                )
-                                
-                                await channel.send(
-                                    reminder_text,
-                                    allowed_mentions=discord.AllowedMentions(users=True)
-                                )
-                                
-                                # Обновляем время последнего напоминания
-                                session["last_reminder_time"] = event_age
-                                ALL_SESSIONS[session_id] = session
-                                save_all_data()
-                        
-                        # Автоматическое закрытие если прошло больше часа и есть незаполненные роли
-                        elif event_age > 3600 and empty_roles:
-                            session["stopped"] = True
-                            ALL_SESSIONS[session_id] = session
-                            save_all_data()
-                            save_event(int(session_id), session)
-                            await update_party_message(int(session_id))
-                            await channel.send(f"🔴 Сбор **{session['title']}** завершён из-за нехватки участников.")
-                            
-                    except discord.NotFound:
-                        # Сообщение не найдено (404) - автоматически закрываем ивент
-                        print(f"Сообщение ивента {session_id} не найдено, автоматически закрываем")
-                        session["stopped"] = True
-                        ALL_SESSIONS[session_id] = session
-                        save_all_data()
-                        save_event(int(session_id), session)
-                        try:
-                            await channel.send(f"🔴 Ивент **{session['title']}** автоматически закрыт (сообщение удалено).")
-                        except Exception:
-                            pass  # Если не можем отправить уведомление, просто игнорируем
-                    except Exception as e:
-                        print(f"Ошибка при завершении ивента: {e}")
-                        continue
+async def _monitor_guild(guild):
+    """Проверка неактивных каналов одного сервера и запуск опросов"""
+    now_utc = datetime.now(timezone.utc)
+    start, end = await get_guild_setting_async(guild.id, "monitoring_time", [10, 20])
+    if not (start <= now_utc.hour < end):  # Проверяем только в дневное время
+        return
+    monitoring_enabled = await get_guild_setting_async(guild.id, "monitoring_enabled", True)
+    if not monitoring_enabled:
+        return
+    channels = await get_guild_setting_async(guild.id, "monitored_channels", [])
+    for channel_id in channels:
+        channel = guild.get_channel(channel_id)
+        if not channel:
+            continue
+        # Опрос в этом канале уже идёт
+        if await STORAGE.run(EVENT_STORE.has_open_poll, channel.id):
+            continue
+        # Получаем последнее сообщение
+        messages = [msg async for msg in channel.history(limit=1)]
+        if not messages:
+            continue
+        last_message = messages[0]
+        # Если не было сообщений 1 час
+        now = datetime.now(last_message.created_at.tzinfo)
+        if (now - last_message.created_at).total_seconds() <= 4800:
+            continue
+        # Получаем варианты опроса из шаблонов сервера
+        guild_templates = await get_guild_templates_async(guild.id)
+        options = list(guild_templates.keys())[:8]
+        text = (
+            "📊 **Чем займемся?**\n"
+            "Голосуем за активность! (15 минут)\n\n" +
+            "\n".join([f"{i+1}. {opt}" for i, opt in enumerate(options)])
+        )
+        poll_msg = await channel.send(
+            f"@everyone\n{text}",
+            allowed_mentions=discord.AllowedMentions(everyone=True)
+        )
+        poll = {
+            "message_id": poll_msg.id,
+            "guild_id": guild.id,
+            "channel_id": channel.id,
+            "options": options,
+            "deadline": time.time() + POLL_DURATION,
+        }
+        await STORAGE.run(EVENT_STORE.add_poll, **poll)
+        for i in range(len(options)):
+            await poll_msg.add_reaction(POLL_REACTIONS[i])
+        # Подведение итогов — отдельная задача, мониторинг сервера не ждёт 15 минут
+        GUILD_SCHEDULER.spawn(("poll", poll_msg.id), lambda p=poll: _run_poll(p), bounded=False)
+
+async def _run_poll(poll: dict):
+    """Жизненный цикл опроса: ждём дедлайн без слота планировщика, затем подводим итоги"""
+    delay = poll["deadline"] - time.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    async with GUILD_SCHEDULER.slot():
+        try:
+            await _finish_poll(poll)
+        finally:
+            await STORAGE.run(EVENT_STORE.remove_poll, poll["message_id"])
+
+async def _finish_poll(poll: dict):
+    guild = bot.get_guild(poll["guild_id"])
+    if not guild:
+        return
+    channel = guild.get_channel(poll["channel_id"])
+    if not channel:
+        return
+    options = poll["options"]
+    try:
+        poll_msg = await channel.fetch_message(poll["message_id"])
+    except discord.NotFound:
+        return
+    votes = []
+    for i in range(len(options)):
+        reaction_obj = discord.utils.get(poll_msg.reactions, emoji=POLL_REACTIONS[i])
+        count = reaction_obj.count - 1 if reaction_obj else 0
+        template_name = options[i]
+        # Используем шаблоны конкретного сервера
+        template_data = await get_guild_template_async(guild.id, template_name)
+        roles_count = len(template_data["roles"]) if template_data else 0
+        # "Потенциал сбора" — сколько процентов от полного состава проголосовало
+        fill_ratio = count / roles_count if roles_count else 0
+        votes.append((template_name, count, fill_ratio))
+
+    # Сортируем сначала по fill_ratio, потом по количеству голосов
+    votes.sort(key=lambda x: (x[2], x[1]), reverse=True)
+    winner = votes[0][0] if votes and votes[0][1] > 0 else None
+    template_data = await get_guild_template_async(guild.id, winner) if winner else None
+    if winner and template_data:
+        # template_data уже получен выше
+        guild_id = str(guild.id)
+        ping_val = await get_guild_setting_async(guild.id, "ping_role", "everyone")
+        if ping_val == "everyone":
+            ping_text = "@everyone"
+            allowed_mentions = discord.AllowedMentions(everyone=True)
+        else:
+            role = guild.get_role(int(ping_val))
+            ping_text = role.mention if role and role.mentionable else "@everyone"
+            allowed_mentions = discord.AllowedMentions(everyone=True) if ping_text == "@everyone" else discord.AllowedMentions(roles=True)
+
+        text = (
+            f"{ping_text}\n"
+            f"**{template_data['title']}**\n"
+            f"{template_data['description']}\n\n"
+            "**Роли:**\n" +
+            "\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(template_data["roles"])])
+        )
+        msg = await channel.send(text, allowed_mentions=allowed_mentions)
+        thread = await msg.create_thread(name=template_data["title"])
+        event_creator_role_id = await get_guild_setting_async(guild.id, "event_creator_role")
+        moderator_role_id = await get_guild_setting_async(guild.id, "moderator_role")
+        creator_id = bot.user.id  # по умолчанию
+
+        # Ищем первого пользователя с нужной ролью
+        for member in guild.members:
+            if event_creator_role_id and any(r.id == event_creator_role_id for r in member.roles):
+                creator_id = member.id
+                break
+            if moderator_role_id and any(r.id == moderator_role_id for r in member.roles):
+                creator_id = member.id
+                break
+
+        ALL_SESSIONS[str(msg.id)] = {
+            "guild_id": guild.id,
+            "channel_id": channel.id,
+            "main_msg_id": msg.id,
+            "thread_id": thread.id,
+            "title": template_data["title"],
+            "description": template_data["description"],
+            "time": "",
+            "party_roles": [{"name": r, "user_id": None} for r in template_data["roles"]],
+            "creator_id": creator_id,
+            "stopped": False,
+            "last_reminder_time": 0
+        }
+        save_event(msg.id, ALL_SESSIONS[str(msg.id)])
+        await update_party_message(msg.id)
+        await poll_msg.delete()
+    else:
+        await channel.send("❌ Никто не проголосовал🛌.")
+        await poll_msg.delete()
+
+REMINDER_INTERVAL = 900       # Напоминание не чаще раза в 15 минут
+AUTO_CLOSE_AGE = 3600         # Автозакрытие через час при незаполненных ролях
+EVENT_RECHECK_INTERVAL = 900  # Повторная проверка, если сейчас действовать не нужно
+
+def _next_event_deadline(session: dict, reminder_checked: bool = False) -> float:
+    """Ближайший момент, когда ивенту может понадобиться напоминание или автозакрытие.
+    Время создания берётся из snowflake сообщения, без запроса к API.
+    Уже наступившее напоминание (первая запись после 15 минут, перезапуск бота)
+    планируется сразу; reminder_checked — обработчик его только что рассмотрел.
+    """
+    now = time.time()
+    created = snowflake_time(session["main_msg_id"])
+    reminder_at = created + max(REMINDER_INTERVAL, session.get("last_reminder_time", 0) + REMINDER_INTERVAL)
+    close_at = created + AUTO_CLOSE_AGE
+    roles = session.get("party_roles", [])
+    reminder_applies = any(r.get("user_id") for r in roles) and not all(r.get("user_id") for r in roles)
+    if reminder_applies and reminder_at <= now and not reminder_checked:
+        return max(now, reminder_at)
+    upcoming = [d for d in (reminder_at, close_at) if d > now]
+    return min(upcoming) if upcoming else now + EVENT_RECHECK_INTERVAL
+
+def _touch_event_timer(event_id: int, session: dict = None):
+    """Перепланировать дедлайн ивента после изменения"""
+    session = session or ALL_SESSIONS.get(str(event_id))
+    if not session or session.get("stopped"):
+        EVENT_TIMERS.cancel(event_id)
+    else:
+        EVENT_TIMERS.schedule(event_id, _next_event_deadline(session))
+
+async def _handle_event_due(event_id: int):
+    """Напоминание и автозакрытие одного ивента по наступлении дедлайна"""
+    session_id = str(event_id)
+    session = ALL_SESSIONS.get(session_id)
+    if not session or session.get("stopped"):
+        return None
+    guild = bot.get_guild(session["guild_id"])
+    if not guild:
+        return time.time() + EVENT_RECHECK_INTERVAL
+    # Как и раньше, обслуживаем только ивенты в отслеживаемых каналах
+    monitored_channels = await get_guild_setting_async(guild.id, "monitored_channels", [])
+    channel = guild.get_channel(session["channel_id"])
+    if session["channel_id"] not in monitored_channels or not channel:
+        return time.time() + EVENT_RECHECK_INTERVAL
+
+    empty_roles = [r for r in session["party_roles"] if not r.get("user_id")]
+    filled_roles = [r for r in session["party_roles"] if r.get("user_id")]
+    event_age = time.time() - snowflake_time(session["main_msg_id"])
+
+    try:
+        # Логика напоминаний каждые 15 минут (900 секунд)
+        # Напоминаем только если есть записавшиеся, но не все роли заняты
+        reminders_enabled = await get_guild_setting_async(guild.id, "reminders_enabled", True)
+        if reminders_enabled and filled_roles and empty_roles and event_age > REMINDER_INTERVAL:
+            # Проверяем, прошло ли 15 минут с последнего напоминания
+            last_reminder = session.get("last_reminder_time", 0)
+            time_since_reminder = event_age - last_reminder
+
+            if time_since_reminder >= REMINDER_INTERVAL:
+                # Отправляем напоминание записавшимся участникам
+                empty_role_names = [role['name'] for role in empty_roles]
+
+                reminder_text = (
+                    f"📢 **Напоминание об ивенте:** {session['title']}\n"
+                    f"@everyone\n"
+                    f"Свободные роли: {', '.join(empty_role_names)}\n"
+                    f"ЗАПОЛНИТЕ РОЛИ ЧТОБЫ КОНТЕНТ СОСТОЯЛСЯ 🎮"
+                )
+
+                await channel.send(
+                    reminder_text,
+                    allowed_mentions=discord.AllowedMentions(users=True)
+                )
+
+                # Обновляем время последнего напоминания
+                session["last_reminder_time"] = event_age
+                ALL_SESSIONS[session_id] = session
+                EVENT_WRITER.submit("update_event_fields", int(session_id), last_reminder_time=event_age)
+
+        # Автоматическое закрытие если прошло больше часа и есть незаполненные роли
+        elif event_age > AUTO_CLOSE_AGE and empty_roles:
+            if not await stop_event(int(session_id)):
+                return None
+            await update_party_message(int(session_id))
+            await channel.send(f"🔴 Сбор **{session['title']}** завершён из-за нехватки участников.")
+            return None
+    except Exception as e:
+        print(f"Ошибка при завершении ивента: {e}")
+
+    return _next_event_deadline(session, reminder_checked=True)
+
+EVENT_TIMERS = DeadlineEngine(_handle_event_due)
+
+async def run_event_timers():
+    """Восстановить дедлайны из events.db и запустить движок"""
+    for sid, session in ALL_SESSIONS.active():
+        EVENT_TIMERS.schedule(int(sid), _next_event_deadline(session))
+    print(f"⏰ Дедлайны ивентов восстановлены: {len(EVENT_TIMERS)}")
+    await EVENT_TIMERS.run()
+
+@bot.event
+async def on_raw_message_delete(payload):
+    """Удалённое сообщение ивента закрывает ивент (раньше это обнаруживал fetch в проходе напоминаний)"""
+    session = ALL_SESSIONS.get(str(payload.message_id))
+    if not session or not await stop_event(payload.message_id):
+        return
+    print(f"Сообщение ивента {payload.message_id} не найдено, автоматически закрываем")
+    MESSAGE_HANDLES.forget(payload.message_id)
+    channel = bot.get_channel(payload.channel_id)
+    if channel:
+        try:
+            await channel.send(f"🔴 Ивент **{session['title']}** автоматически закрыт (сообщение удалено).")
+        except Exception:
+            pass  # Если не можем отправить уведомление, просто игнорируем
+
+async def archive_loop():
+    """Раз в час переносит давно остановленные ивенты в архив"""
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        try:
+            # Архивация читает events.db напрямую — сначала дописываем очередь
+            await EVENT_WRITER.flush()
+            await archive_stopped_events_async()
+        except Exception as e:
+            print(f"⚠️ Ошибка архивации ивентов: {e}")
+        await asyncio.sleep(3600)
 
 # Добавьте новую функцию для очистки канала
 async def cleanup_channels():
@@ -2618,12 +2862,12 @@ async def cleanup_channels():
         now = datetime.now(timezone.utc)
         for guild in bot.guilds:
             guild_id = str(guild.id)
-            hour, minute = get_guild_setting(guild.id, "cleanup_time", [0, 0])
-            cleanup_enabled = get_guild_setting(guild.id, "cleanup_enabled", True)
+            hour, minute = await get_guild_setting_async(guild.id, "cleanup_time", [0, 0])
+            cleanup_enabled = await get_guild_setting_async(guild.id, "cleanup_enabled", True)
             if not cleanup_enabled:
                 continue
             if now.hour == hour and now.minute == minute:
-                cleanup_channel_id = get_guild_setting(guild.id, "cleanup_channels")
+                cleanup_channel_id = await get_guild_setting_async(guild.id, "cleanup_channels")
                 if cleanup_channel_id:
                     channel = guild.get_channel(cleanup_channel_id)
                     if channel:
@@ -2734,138 +2978,313 @@ async def on_resumed():
 @bot.event 
 async def on_guild_join(guild):
     print(f"➕ Бот добавлен на сервер: {guild.name} (ID: {guild.id}) - {guild.member_count} участников")
+    # Список серверов бота в веб-панели устарел
+    await STORAGE.run(invalidate_bot_guilds)
     # Отправляем сообщение с инструкцией настройки
     await send_setup_message(guild, force=True)
 
 @bot.event
 async def on_guild_remove(guild):
     print(f"➖ Бот удален с сервера: {guild.name} (ID: {guild.id})")
+    await STORAGE.run(invalidate_bot_guilds)
+    await STORAGE.run(bump_guild_metadata, guild.id)
+
+# ===== Версии метаданных серверов для веб-панели (каналы и роли) =====
+
+@bot.listen('on_ready')
+async def _metadata_on_ready():
+    # После (пере)подключения кэш гейтвея собран заново
+    await STORAGE.run(bump_guild_metadata)
+
+@bot.listen('on_guild_channel_create')
+async def _metadata_channel_create(channel):
+    await STORAGE.run(bump_guild_metadata, channel.guild.id)
+
+@bot.listen('on_guild_channel_delete')
+async def _metadata_channel_delete(channel):
+    await STORAGE.run(bump_guild_metadata, channel.guild.id)
+
+@bot.listen('on_guild_channel_update')
+async def _metadata_channel_update(before, after):
+    await STORAGE.run(bump_guild_metadata, after.guild.id)
+
+@bot.listen('on_guild_role_create')
+async def _metadata_role_create(role):
+    await STORAGE.run(bump_guild_metadata, role.guild.id)
+
+@bot.listen('on_guild_role_delete')
+async def _metadata_role_delete(role):
+    await STORAGE.run(bump_guild_metadata, role.guild.id)
+
+@bot.listen('on_guild_role_update')
+async def _metadata_role_update(before, after):
+    await STORAGE.run(bump_guild_metadata, after.guild.id)
 
 async def process_command_queue():
-    """Обрабатывает очередь команд от веб-интерфейса"""
+    """Принимает команды веб-интерфейса через шину команд (вместо опроса command_queue.json)"""
     await bot.wait_until_ready()
     print("⚡ Обработчик очереди команд активирован")
+    COMMAND_BUS.register("create_event", process_create_event_command)
+    COMMAND_BUS.register("stop_event", process_stop_event_command)
+    COMMAND_BUS.register("remind_event", process_remind_event_command)
+    COMMAND_BUS.register("clone_event", process_clone_event_command)
+    COMMAND_BUS.register("edit_event", process_edit_event_command)
+    COMMAND_BUS.register("deploy_panels", process_deploy_panels_command)
+    await COMMAND_BUS.serve(STORAGE.run)
+
+async def process_create_event_command(command):
+    """Обрабатывает команду создания события.
+    Результат (или исключение) шина команд сохраняет и отдаёт веб-интерфейсу.
+    """
+    guild_id = command['guild_id']
+    channel_id = command['channel_id']
+    title = command['title']
+    description = command['description']
+    time_str = command['time']
+    roles = command['roles']
+    creator_id = command['creator_id']
     
-    queue_file = 'command_queue.json'
+    # Получаем гильдию и канал
+    guild = bot.get_guild(guild_id)
+    if not guild:
+        raise LookupError(f"Сервер {guild_id} не найден")
     
-    while not bot.is_closed():
-        try:
-            # Проверяем наличие файла очереди
-            if not os.path.exists(queue_file):
-                await asyncio.sleep(5)
-                continue
-            
-            # Читаем команды
-            try:
-                with open(queue_file, 'r', encoding='utf-8') as f:
-                    commands = json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                await asyncio.sleep(5)
-                continue
-            
-            if not commands:
-                await asyncio.sleep(5)
-                continue
-            
-            # Обрабатываем команды
-            processed_commands = []
-            
-            for command in commands:
-                try:
-                    if command['type'] == 'create_event':
-                        result = await process_create_event_command(command)
-                        print(f"📝 Обработана команда создания события: {result}")
-                    else:
-                        print(f"⚠️  Неизвестный тип команды: {command['type']}")
-                    
-                    processed_commands.append(command)
-                    
-                except Exception as e:
-                    print(f"❌ Ошибка обработки команды {command.get('type', 'unknown')}: {e}")
-                    # Удаляем команду, которая вызвала ошибку, чтобы избежать бесконечного цикла
-                    processed_commands.append(command)
-            
-            # Удаляем обработанные команды
-            remaining_commands = [cmd for cmd in commands if cmd not in processed_commands]
-            
-            if remaining_commands != commands:
-                with open(queue_file, 'w', encoding='utf-8') as f:
-                    json.dump(remaining_commands, f, ensure_ascii=False, indent=2)
-            
-            await asyncio.sleep(2)  # Проверяем каждые 2 секунды
-            
-        except Exception as e:
-            print(f"❌ Ошибка в обработчике очереди команд: {e}")
-            await asyncio.sleep(10)
+    channel = guild.get_channel(channel_id)
+    if not channel:
+        raise LookupError(f"Канал {channel_id} не найден на сервере {guild.name}")
+    
+    # Получаем настройки пинга
+    ping_val = await get_guild_setting_async(guild_id, "ping_role", "everyone")
+    if ping_val == "everyone":
+        ping_text = "@everyone"
+        allowed_mentions = discord.AllowedMentions(everyone=True)
+    else:
+        role = guild.get_role(int(ping_val))
+        ping_text = role.mention if role and role.mentionable else "@everyone"
+        allowed_mentions = discord.AllowedMentions(everyone=True) if ping_text == "@everyone" else discord.AllowedMentions(roles=True)
+    
+    # Создаем текст сообщения
+    text = (
+        f"{ping_text}\n"
+        f"**{title}**\n"
+        f"{description}\n\n"
+    )
+    
+    if time_str:
+        text += f"**Время:** {time_str}\n\n"
+    
+    text += "**Роли:**\n" + "\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(roles)])
+    
+    # Отправляем сообщение
+    msg = await channel.send(text, allowed_mentions=allowed_mentions)
+    thread = await msg.create_thread(name=title)
+    
+    # Сохраняем в базу
+    ALL_SESSIONS[str(msg.id)] = {
+        "guild_id": guild_id,
+        "channel_id": channel_id,
+        "main_msg_id": msg.id,
+        "thread_id": thread.id,
+        "title": title,
+        "description": description,
+        "time": time_str,
+        "party_roles": [{"name": r, "user_id": None} for r in roles],
+        "creator_id": creator_id,
+        "stopped": False,
+        "last_reminder_time": 0
+    }
+    save_event(msg.id, ALL_SESSIONS[str(msg.id)])
+    await update_party_message(msg.id)
+    
+    return {"message": f"Успешно создано событие '{title}' в канале #{channel.name}", "event_id": str(msg.id)}
 
-async def process_create_event_command(command):
-    """Обрабатывает команду создания события"""
+def _command_event_channels(event_id: int):
+    """(сессия, сервер, канал) ивента для команд веб-интерфейса"""
+    session = ALL_SESSIONS.get(str(event_id))
+    if not session:
+        raise LookupError(f"Событие {event_id} не найдено")
+    guild = bot.get_guild(session['guild_id'])
+    if not guild:
+        raise LookupError(f"Сервер {session['guild_id']} не найден")
+    channel = guild.get_channel(session['channel_id'])
+    if not channel:
+        raise LookupError(f"Канал {session['channel_id']} не найден на сервере {guild.name}")
+    return session, guild, channel
+
+async def process_stop_event_command(command):
+    """Остановка ивента из веб-интерфейса"""
+    event_id = int(command['event_id'])
+    stopped = await stop_event(event_id)
+    if stopped is None:
+        raise LookupError(f"Событие {event_id} не найдено")
+    if not stopped:
+        return {"success": True, "message": "Ивент уже остановлен"}
+    try:
+        await update_party_message(event_id)
+    except Exception as e:
+        print(f"⚠️ Не удалось обновить сообщение ивента {event_id}: {e}")
+    return {"success": True, "message": "Ивент остановлен"}
+
+async def process_remind_event_command(command):
+    """Напоминание записавшимся участникам из веб-интерфейса"""
+    event_id = int(command['event_id'])
+    session, guild, channel = _command_event_channels(event_id)
+    thread = guild.get_thread(session['thread_id']) if session.get('thread_id') else None
+    mentions = [f"<@{r['user_id']}>" for r in session.get('party_roles', []) if r.get('user_id')]
+    if not mentions:
+        return {"success": True, "message": "Нет записавшихся участников для напоминания"}
+    text = "Напоминание: " + ", ".join(mentions)
+    target = thread or channel
+    await target.send(text, allowed_mentions=discord.AllowedMentions(users=True, roles=False, everyone=False))
+    return {"success": True, "message": "Напоминание отправлено"}
+
+async def process_clone_event_command(command):
+    """Копия ивента со свободными слотами из веб-интерфейса"""
+    event_id = int(command['event_id'])
+    session, guild, channel = _command_event_channels(event_id)
+    role_list = [r['name'] for r in session['party_roles']]
+    text = f"**{session['title']} (копия)**\n{session['description']}\n\n"
+    if session.get('time'):
+        text += f"**Время:** {session['time']}\n\n"
+    text += "**Роли:**\n" + "\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(role_list)])
+    msg = await channel.send(text)
+    thread = await msg.create_thread(name=session['title'] + " (копия)")
+    ALL_SESSIONS[str(msg.id)] = {
+        "guild_id": session['guild_id'],
+        "channel_id": session['channel_id'],
+        "main_msg_id": msg.id,
+        "thread_id": thread.id,
+        "title": session['title'] + " (копия)",
+        "description": session['description'],
+        "time": session.get('time', ''),
+        "party_roles": [{"name": r, "user_id": None} for r in role_list],
+        "creator_id": session.get('creator_id'),
+        "stopped": False,
+        "last_reminder_time": 0
+    }
+    save_event(msg.id, ALL_SESSIONS[str(msg.id)])
     try:
-        guild_id = command['guild_id']
-        channel_id = command['channel_id']
-        title = command['title']
-        description = command['description']
-        time_str = command['time']
-        roles = command['roles']
-        creator_id = command['creator_id']
-        
-        # Получаем гильдию и канал
-        guild = bot.get_guild(guild_id)
-        if not guild:
-            return f"Ошибка: Сервер {guild_id} не найден"
-        
-        channel = guild.get_channel(channel_id)
-        if not channel:
-            return f"Ошибка: Канал {channel_id} не найден на сервере {guild.name}"
-        
-        # Получаем настройки пинга
-        ping_val = get_guild_setting(guild_id, "ping_role", "everyone")
-        if ping_val == "everyone":
-            ping_text = "@everyone"
-            allowed_mentions = discord.AllowedMentions(everyone=True)
-        else:
-            role = guild.get_role(int(ping_val))
-            ping_text = role.mention if role and role.mentionable else "@everyone"
-            allowed_mentions = discord.AllowedMentions(everyone=True) if ping_text == "@everyone" else discord.AllowedMentions(roles=True)
-        
-        # Создаем текст сообщения
-        text = (
-            f"{ping_text}\n"
-            f"**{title}**\n"
-            f"{description}\n\n"
-        )
-        
-        if time_str:
-            text += f"**Время:** {time_str}\n\n"
-        
-        text += "**Роли:**\n" + "\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(roles)])
-        
-        # Отправляем сообщение
-        msg = await channel.send(text, allowed_mentions=allowed_mentions)
-        thread = await msg.create_thread(name=title)
-        
-        # Сохраняем в базу
-        ALL_SESSIONS[str(msg.id)] = {
-            "guild_id": guild_id,
-            "channel_id": channel_id,
-            "main_msg_id": msg.id,
-            "thread_id": thread.id,
-            "title": title,
-            "description": description,
-            "time": time_str,
-            "party_roles": [{"name": r, "user_id": None} for r in roles],
-            "creator_id": creator_id,
-            "stopped": False,
-            "last_reminder_time": 0
-        }
-        save_all_data()
-        save_event(msg.id, ALL_SESSIONS[str(msg.id)])
         await update_party_message(msg.id)
-        
-        return f"Успешно создано событие '{title}' в канале #{channel.name}"
-        
     except Exception as e:
-        return f"Ошибка создания события: {str(e)}"
+        print(f"⚠️ Не удалось обновить сообщение ивента {msg.id}: {e}")
+    return {"success": True, "event": {
+        "id": str(msg.id),
+        "channel_id": str(session['channel_id']),
+        "url": f"https://discord.com/channels/{guild.id}/{session['channel_id']}/{msg.id}"
+    }}
+
+async def process_edit_event_command(command):
+    """Изменение ивента из веб-интерфейса"""
+    event_id = int(command['event_id'])
+    # Без сброса сохраняем назначения там, где имена совпали (по порядку)
+    session = await edit_event(
+        event_id, command['title'], command['description'], command['time'], command.get('roles') or None,
+        keep_assignments=None if command.get('reset_roles') else "position",
+    )
+    if not session:
+        raise LookupError(f"Событие {event_id} не найдено")
+    try:
+        await update_party_message(int(session['main_msg_id']))
+    except Exception as e:
+        print(f"⚠️ Не удалось обновить сообщение ивента {event_id}: {e}")
+    return {"success": True, "message": "Событие обновлено"}
+
+def _recruit_panel_embed() -> discord.Embed:
+    return discord.Embed(
+        title="📝 Заявка в гильдию",
+        description=(
+            "Нажмите кнопку ниже, чтобы отправить заявку.\n"
+            "Модераторы рассмотрят вашу заявку и свяжутся с вами."
+        ),
+        color=discord.Color.blue()
+    )
+
+def _points_panel_embed() -> discord.Embed:
+    # Полностью соответствуем панели из команды /events_panel
+    embed = discord.Embed(
+        title="🎯 Система событий и наград",
+        description=(
+            "**🎮 Добро пожаловать в систему событий Albion Online!**\n\n"
+            "Здесь вы можете:\n"
+            "🎯 **Подать заявку** на участие в событии\n"
+            "💰 **Проверить баланс** очков и историю\n"
+            "🛒 **Купить награды** за накопленные очки\n\n"
+            "**Доступные события:**\n"
+            "🕷️ Кристальные жуки (убийство) - 1 очко\n"
+            "🔵 Синие сферы (доставка) - 1.5 очка\n"
+            "🟣 Фиолетовые сферы (доставка) - 3 очка\n"
+            "🟡 Золотые сферы (доставка) - 5 очков\n"
+            "🌪️ Зеленые вихри (доставка) - 2 очка\n"
+            "🌀 Синие вихри (доставка) - 3 очка\n"
+            "🌊 Фиолетовые вихри (доставка) - 6 очков\n"
+            "💫 Золотые вихри (доставка) - 10 очков"
+        ),
+        color=discord.Color.blue()
+    )
+    embed.add_field(
+        name="🛒 Доступные награды",
+        value=(
+            "💰 **200k серебра** - 10 очков\n"
+            "🎲 **Рандомная вещь** - 30 очков\n"
+            "⚔️ **Комплект экипировки** - 50 очков"
+        ),
+        inline=False
+    )
+    embed.add_field(
+        name="ℹ️ Как это работает",
+        value=(
+            "1. Участвуйте в событиях и зарабатывайте очки\n"
+            "2. Модератор проверяет и начисляет очки\n"
+            "3. Обменивайте очки на награды в магазине\n"
+            "4. Получайте награды в игре от модераторов"
+        ),
+        inline=False
+    )
+    embed.set_footer(text="💡 Всегда прикладывайте скриншоты к заявкам!")
+    return embed
+
+async def process_deploy_panels_command(command):
+    """Размещение панелей набора и очков из веб-интерфейса.
+    Каналы берутся из настроек recruit_settings и передаются вебом в команде.
+    """
+    if not RECRUIT_AVAILABLE:
+        raise RuntimeError("Модуль recruit_bot недоступен")
+    guild = bot.get_guild(int(command['guild_id']))
+    if not guild:
+        raise LookupError("Сервер не найден в боте")
+    panel_type = command.get('panel_type', 'both')
+    panels = []
+    if panel_type in ("recruit", "both"):
+        panels.append(("Панель набора", command.get('recruit_channel_id'),
+                       lambda: (_recruit_panel_embed(), PersistentApplyButtonView(bot))))
+    if panel_type in ("points", "both"):
+        panels.append(("Панель очков", command.get('points_channel_id'),
+                       lambda: (_points_panel_embed(), UnifiedEventView())))
+
+    success_panels = []
+    error_panels = []
+    for label, channel_id, build in panels:
+        if not channel_id:
+            error_panels.append(f"{label} (канал не настроен)")
+            continue
+        try:
+            channel = guild.get_channel(int(channel_id))
+            if not channel:
+                error_panels.append(f"{label} (канал не найден)")
+                continue
+            embed, view = build()
+            result = await channel.send(embed=embed, view=view)
+            print(f"{label} размещена: {result.id}")
+            success_panels.append(f"{label} в #{channel.name}")
+        except Exception as e:
+            error_panels.append(f"{label} ({str(e)})")
+            print(f"Ошибка размещения: {label}: {e}")
+
+    if success_panels and not error_panels:
+        return {"success": True, "message": f"✅ Успешно размещены: {', '.join(success_panels)}"}
+    if success_panels:
+        return {"success": True, "message": f"✅ Размещены: {', '.join(success_panels)}. ❌ Ошибки: {', '.join(error_panels)}"}
+    return {"success": False, "message": f"❌ Ошибки размещения: {', '.join(error_panels)}"}
 
 async def update_bot_stats():
     """Обновляет статистику бота для веб-интерфейса"""
@@ -2877,7 +3296,7 @@ async def update_bot_stats():
             total_members = 0
             online_members = 0
             guilds_count = len(bot.guilds)
-            active_events = len([s for s in ALL_SESSIONS.values() if not s.get('stopped', False)])
+            active_events = ALL_SESSIONS.active_count()
             
             # Подсчитываем участников
             for guild in bot.guilds:
@@ -2900,11 +3319,15 @@ async def update_bot_stats():
                 'active_events': active_events,
                 'last_updated': datetime.now().isoformat()
             }
+            stats.update(PARTY_RENDERER.get_stats())
+            stats.update(GUILD_SCHEDULER.get_stats())
+            stats.update(EVENT_TIMERS.get_stats())
+            stats.update(EVENT_WRITER.get_stats())
+            stats.update(STORAGE.get_stats())
             
             # Сохраняем в файл для веб-интерфейса
             try:
-                with open('bot_stats.json', 'w', encoding='utf-8') as f:
-                    json.dump(stats, f, ensure_ascii=False, indent=2)
+                await STORAGE.write_json('bot_stats.json', stats)
             except Exception as e:
                 print(f"❌ Ошибка сохранения статистики: {e}")
             
@@ -2941,43 +3364,57 @@ async def start_bot_with_reconnect():
     retry_count = 0
     max_retries = 5
     
-    while retry_count < max_retries:
-        try:
-            print("=" * 60)
-            print(f"🚀 Попытка запуска бота #{retry_count + 1}")
-            print("=" * 60)
+    try:
+        while retry_count < max_retries:
+            try:
+                print("=" * 60)
+                print(f"🚀 Попытка запуска бота #{retry_count + 1}")
+                print("=" * 60)
             
-            await bot.start(BOT_TOKEN)
+                await bot.start(BOT_TOKEN)
             
-        except discord.LoginFailure:
-            print("❌ КРИТИЧЕСКАЯ ОШИБКА: Неверный токен бота!")
-            print("🔧 Проверьте config.json и убедитесь, что токен корректный")
-            break
+            except discord.LoginFailure:
+                print("❌ КРИТИЧЕСКАЯ ОШИБКА: Неверный токен бота!")
+                print("🔧 Проверьте config.json и убедитесь, что токен корректный")
+                break
             
-        except discord.HTTPException as e:
-            print(f"❌ Ошибка HTTP: {e}")
-            if e.status == 429:  # Rate limit
-                print("⏳ Превышен лимит запросов, ждем...")
-                await asyncio.sleep(60)
-            retry_count += 1
+            except discord.HTTPException as e:
+                print(f"❌ Ошибка HTTP: {e}")
+                if e.status == 429:  # Rate limit
+                    print("⏳ Превышен лимит запросов, ждем...")
+                    await asyncio.sleep(60)
+                retry_count += 1
             
-        except discord.ConnectionClosed as e:
-            print(f"🔌 Соединение закрыто: {e}")
-            retry_count += 1
+            except discord.ConnectionClosed as e:
+                print(f"🔌 Соединение закрыто: {e}")
+                retry_count += 1
             
-        except Exception as e:
-            print(f"❌ Неожиданная ошибка: {e}")
-            import traceback
-            traceback.print_exc()
-            retry_count += 1
-        
-        if retry_count < max_retries:
-            wait_time = min(2 ** retry_count, 60)  # Экспоненциальная задержка, максимум 60 секунд
-            print(f"⏳ Ожидание {wait_time} секунд перед повторной попыткой...")
-            await asyncio.sleep(wait_time)
-        else:
-            print("❌ Превышено максимальное количество попыток подключения")
-            break
+            except Exception as e:
+                print(f"❌ Неожиданная ошибка: {e}")
+                import traceback
+                traceback.print_exc()
+                retry_count += 1
+        
+            if retry_count < max_retries:
+                wait_time = min(2 ** retry_count, 60)  # Экспоненциальная задержка, максимум 60 секунд
+                print(f"⏳ Ожидание {wait_time} секунд перед повторной попыткой...")
+                await asyncio.sleep(wait_time)
+            else:
+                print("❌ Превышено максимальное количество попыток подключения")
+                break
+    finally:
+        # Дописываем очередь групповой записи перед выходом
+        await flush_event_writes()
+
+async def flush_event_writes():
+    """Зафиксировать все незаписанные изменения ивентов"""
+    try:
+        pending = EVENT_WRITER.get_stats()["write_pending"]
+        await EVENT_WRITER.close()
+        if pending:
+            print(f"💾 Записано изменений ивентов при завершении: {pending}")
+    except Exception as e:
+        print(f"⚠️ Ошибка записи очереди ивентов при завершении: {e}")
 
 def start_web_server():
     """Запуск веб-сервера в отдельном потоке"""
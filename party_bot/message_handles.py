@@ -0,0 +1,50 @@
+"""
+Кэш дескрипторов сообщений ивентов.
+Редактирование идёт через channel.get_partial_message(id) без fetch_message;
+дескрипторы хранятся в небольшом LRU. Хэш последней отрисовки хранится
+отдельно (RENDER_HASHES в main.py, сохраняется в хранилище ивентов).
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any
+
+DEFAULT_MAX_SIZE = 512
+
+
+def compute_render_hash(content: str, components: Any) -> str:
+    """Хэш видимого состояния сообщения: текст + раскладка компонентов"""
+    payload = json.dumps(
+        {"content": content, "components": components},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MessageHandleCache:
+    """LRU частичных сообщений"""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._handles: "OrderedDict[int, Any]" = OrderedDict()
+
+    def get(self, channel, message_id: int):
+        """PartialMessage для редактирования без REST-запроса"""
+        message_id = int(message_id)
+        handle = self._handles.get(message_id)
+        if handle is not None and handle.channel.id == channel.id:
+            self._handles.move_to_end(message_id)
+            return handle
+        handle = channel.get_partial_message(message_id)
+        self._handles[message_id] = handle
+        self._trim()
+        return handle
+
+    def forget(self, message_id: int):
+        """Убрать сообщение из кэша (например, после удаления)"""
+        self._handles.pop(int(message_id), None)
+
+    def _trim(self):
+        while len(self._handles) > self.max_size:
+            self._handles.popitem(last=False)
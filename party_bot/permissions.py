@@ -0,0 +1,160 @@
+"""
+Права участника в каналах сервера для веб-панели.
+Для каждого сервера один раз строится индекс: маски ролей, @everyone и
+оверрайды каналов, разложенные по id цели. Список доступных каналов
+кэшируется по (сервер, пользователь, набор ролей).
+
+Индекс привязан к снимкам каналов и ролей из guild_metadata: снимок
+меняется на событиях гейтвея (или по TTL REST-кэша), и вместе с ним
+перестраивается индекс — отдельная инвалидация не нужна.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
+
+PERM_ADMIN = 0x8
+PERM_VIEW_CHANNEL = 0x400
+PERM_SEND_MESSAGES = 0x800
+
+TEXT_CHANNEL_TYPES = (0,)
+MAX_CACHED_RESULTS = 4096
+
+
+def _bits(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class GuildPermissionIndex:
+    """Предрасчитанные маски ролей и оверрайды каналов одного сервера"""
+
+    def __init__(self, guild_id: str, channels: List[Dict[str, Any]], roles: List[Dict[str, Any]],
+                 channel_types: Tuple[int, ...] = TEXT_CHANNEL_TYPES):
+        # Исходные снимки держим, чтобы проверять актуальность индекса по identity
+        self.channels_src = channels
+        self.roles_src = roles
+        self.role_masks: Dict[str, int] = {str(r["id"]): _bits(r.get("permissions")) for r in roles}
+        self.everyone_mask = self.role_masks.get(str(guild_id), 0)  # @everyone id == guild_id
+        # (канал, everyone allow/deny, {role_id: (allow, deny)}, {user_id: (allow, deny)})
+        self.entries = []
+        for ch in channels:
+            if ch.get("type") not in channel_types:
+                continue
+            everyone = (0, 0)
+            by_role: Dict[str, Tuple[int, int]] = {}
+            by_member: Dict[str, Tuple[int, int]] = {}
+            for ow in ch.get("permission_overwrites") or []:
+                target = str(ow.get("id"))
+                pair = (_bits(ow.get("allow")), _bits(ow.get("deny")))
+                if target == str(guild_id):
+                    everyone = pair
+                elif ow.get("type") == 1:
+                    by_member[target] = pair
+                else:
+                    by_role[target] = pair
+            self.entries.append((ch, everyone, by_role, by_member))
+
+    def base_permissions(self, role_ids: FrozenSet[str]) -> int:
+        perms = self.everyone_mask
+        for rid in role_ids:
+            perms |= self.role_masks.get(rid, 0)
+        return perms
+
+    def allowed_channels(self, user_id: str, role_ids: FrozenSet[str], required: int) -> List[Dict[str, Any]]:
+        """Каналы, где у участника есть все биты required (порядок Discord:
+        @everyone, затем суммарно роли, затем участник)"""
+        base = self.base_permissions(role_ids)
+        if base & PERM_ADMIN:
+            return [entry[0] for entry in self.entries]
+        allowed = []
+        for ch, (e_allow, e_deny), by_role, by_member in self.entries:
+            perms = (base & ~e_deny) | e_allow
+            if by_role:
+                allow = deny = 0
+                # Перебираем меньшее из множеств: роли участника или оверрайды канала
+                if len(role_ids) <= len(by_role):
+                    for rid in role_ids:
+                        pair = by_role.get(rid)
+                        if pair:
+                            allow |= pair[0]
+                            deny |= pair[1]
+                else:
+                    for rid, pair in by_role.items():
+                        if rid in role_ids:
+                            allow |= pair[0]
+                            deny |= pair[1]
+                perms = (perms & ~deny) | allow
+            pair = by_member.get(user_id)
+            if pair:
+                perms = (perms & ~pair[1]) | pair[0]
+            if perms & required == required:
+                allowed.append(ch)
+        return allowed
+
+
+class PermissionEngine:
+    """Кэш индексов по серверам и результатов по (сервер, пользователь, роли)"""
+
+    def __init__(self, max_results: int = MAX_CACHED_RESULTS):
+        self.max_results = max_results
+        self._indexes: Dict[str, GuildPermissionIndex] = {}
+        # (guild_id, user_id, роли, required) -> (индекс, каналы)
+        self._results: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"index_builds": 0, "hits": 0, "misses": 0, "invalidations": 0}
+
+    def get_index(self, guild_id, channels: List[Dict[str, Any]], roles: List[Dict[str, Any]]) -> GuildPermissionIndex:
+        guild_id = str(guild_id)
+        with self._lock:
+            index = self._indexes.get(guild_id)
+            if index is not None and index.channels_src is channels and index.roles_src is roles:
+                return index
+        index = GuildPermissionIndex(guild_id, channels, roles)
+        with self._lock:
+            self._indexes[guild_id] = index
+            self.stats["index_builds"] += 1
+        return index
+
+    def allowed_channels(self, guild_id, channels: List[Dict[str, Any]], roles: List[Dict[str, Any]],
+                         user_id, role_ids: Iterable, required: int = PERM_VIEW_CHANNEL | PERM_SEND_MESSAGES) -> List[Dict[str, Any]]:
+        """Текстовые каналы, где у участника есть права required"""
+        index = self.get_index(guild_id, channels, roles)
+        roles_key = frozenset(str(rid) for rid in role_ids)
+        key = (str(guild_id), str(user_id), roles_key, required)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] is index:
+                self._results.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached[1]
+            self.stats["misses"] += 1
+        allowed = index.allowed_channels(str(user_id), roles_key, required)
+        with self._lock:
+            self._results[key] = (index, allowed)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return allowed
+
+    def invalidate(self, guild_id=None):
+        """Сбросить индекс и результаты сервера (или всех серверов)"""
+        with self._lock:
+            if guild_id is None:
+                self._indexes.clear()
+                self._results.clear()
+            else:
+                guild_id = str(guild_id)
+                self._indexes.pop(guild_id, None)
+                for key in [k for k in self._results if k[0] == guild_id]:
+                    del self._results[key]
+            self.stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["guilds"] = len(self._indexes)
+            stats["cached_results"] = len(self._results)
+        return stats
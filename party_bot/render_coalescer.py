@@ -0,0 +1,119 @@
+"""
+Объединение перерисовок сообщений ивентов.
+Изменения помечают ивент «грязным», а само редактирование сообщения
+выполняется не чаще одного раза за окно и несёт последнее состояние.
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+DEFAULT_WINDOW_MS = 750
+
+
+class _EventRenderState:
+    """Состояние перерисовки одного ивента"""
+    __slots__ = ("waiters", "user_id", "task", "last_edit")
+
+    def __init__(self):
+        self.waiters: List[asyncio.Future] = []
+        self.user_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.last_edit: float = float("-inf")
+
+
+class RenderCoalescer:
+    """Не больше одного редактирования сообщения ивента за окно.
+    render(event_id, user_id) возвращает False, если редактирования не было
+    (содержимое не изменилось, ивент или канал не найден, ошибка Discord).
+    """
+
+    def __init__(self, render: Callable[[int, Optional[int]], Awaitable], window_ms: int = None):
+        if window_ms is None:
+            try:
+                window_ms = int(os.getenv("PARTY_RENDER_WINDOW_MS", DEFAULT_WINDOW_MS))
+            except ValueError:
+                window_ms = DEFAULT_WINDOW_MS
+        self._render = render
+        self.window = max(window_ms, 0) / 1000
+        self._states: Dict[int, _EventRenderState] = {}
+        # Счётчики: сколько перерисовок запросили и сколько реально отредактировали
+        self.requested = 0
+        self.edits = 0
+        self.skipped = 0
+
+    def request(self, event_id: int, interacting_user_id: int = None) -> asyncio.Future:
+        """Пометить ивент на перерисовку.
+        Возвращает future, который завершится, когда изменение станет видно.
+        """
+        loop = asyncio.get_running_loop()
+        event_id = int(event_id)
+        state = self._states.get(event_id)
+        if state is None:
+            state = self._states[event_id] = _EventRenderState()
+
+        future = loop.create_future()
+        state.waiters.append(future)
+        if interacting_user_id is not None:
+            state.user_id = interacting_user_id
+        self.requested += 1
+
+        if state.task is None:
+            state.task = loop.create_task(self._run(event_id, state))
+        return future
+
+    async def _run(self, event_id: int, state: _EventRenderState):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if not state.waiters:
+                    # Держим окно после последнего редактирования, затем освобождаем состояние
+                    await asyncio.sleep(self.window)
+                    if not state.waiters:
+                        break
+                    continue
+
+                delay = state.last_edit + self.window - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                waiters, state.waiters = state.waiters, []
+                user_id, state.user_id = state.user_id, None
+                try:
+                    result = await self._render(event_id, user_id)
+                    error = None
+                except Exception as e:
+                    result, error = None, e
+                if result is False:
+                    # Редактирования не было — окно не расходуем
+                    self.skipped += 1
+                else:
+                    state.last_edit = loop.time()
+                    self.edits += 1
+
+                for waiter in waiters:
+                    if waiter.done():
+                        continue
+                    if error is not None:
+                        waiter.set_exception(error)
+                    else:
+                        waiter.set_result(result)
+        finally:
+            state.task = None
+            # Остались ожидающие только если задачу отменили (остановка бота)
+            for waiter in state.waiters:
+                if not waiter.done():
+                    waiter.cancel()
+            state.waiters = []
+            if self._states.get(event_id) is state:
+                del self._states[event_id]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика объединения перерисовок"""
+        return {
+            "render_requested": self.requested,
+            "render_edits": self.edits,
+            "render_skipped": self.skipped,
+            "render_saved": max(self.requested - self.edits, 0),
+            "render_pending": sum(len(s.waiters) for s in self._states.values()),
+        }
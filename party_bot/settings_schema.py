@@ -0,0 +1,191 @@
+"""
+Схема настроек серверов.
+Для каждого известного ключа объявлен тип; значение хранится в settings.db
+вместе с тегом типа (value_type) и декодируется напрямую, без угадывания.
+Неизвестные ключи кодируются по типу самого значения.
+"""
+
+import json
+from typing import Any, Callable, Dict, Tuple
+
+# ---- Кодеки по тегу типа ----
+# Тег -> (encode(value) -> str, decode(str) -> value)
+
+CODECS: Dict[str, Tuple[Callable[[Any], str], Callable[[str], Any]]] = {
+    "null": (lambda v: "", lambda s: None),
+    "bool": (lambda v: "true" if v else "false", lambda s: s == "true"),
+    "int": (lambda v: str(int(v)), int),
+    "float": (lambda v: repr(float(v)), float),
+    "str": (str, str),
+    "json": (lambda v: json.dumps(v, ensure_ascii=False), json.loads),
+}
+
+
+def tag_for_value(value: Any) -> str:
+    """Тег по типу Python-значения (для ключей вне схемы)"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, (dict, list, tuple)):
+        return "json"
+    return "str"
+
+
+# ---- Типы ключей схемы ----
+# id       — ID роли/канала Discord: int или None ("" тоже None)
+# id_list  — список ID
+# mention  — "everyone"/"here" или ID роли
+# bool, int, str, json — как есть; number — int или float
+
+def _to_id(value: Any):
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError("bool вместо ID")
+    return int(value)
+
+
+def _to_id_list(value: Any) -> list:
+    if value in (None, ""):
+        return []
+    if isinstance(value, str):
+        value = json.loads(value) if value.startswith("[") else value.split(",")
+    return [int(v) for v in value if str(v).strip()]
+
+
+def _to_mention(value: Any):
+    if isinstance(value, str) and not value.strip().isdigit():
+        return value
+    return _to_id(value)
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes", "on")
+    return bool(value)
+
+
+def _to_number(value: Any):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    text = str(value)
+    return float(text) if "." in text else int(text)
+
+
+def _to_json(value: Any):
+    if isinstance(value, str):
+        return json.loads(value)
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+COERCERS: Dict[str, Callable[[Any], Any]] = {
+    "id": _to_id,
+    "id_list": _to_id_list,
+    "mention": _to_mention,
+    "bool": _to_bool,
+    "int": lambda v: int(v),
+    "number": _to_number,
+    "str": lambda v: "" if v is None else str(v),
+    "json": _to_json,
+}
+
+# Ключи party (unified_settings.DEFAULT_GUILD_SETTINGS["party"], web.DEFAULT_SETTINGS,
+# main.REQUIRED_BASE_KEYS)
+PARTY_SCHEMA = {
+    "event_creator_role": "id",
+    "event_creator_roles": "id_list",
+    "moderator_role": "id",
+    "ping_role": "mention",
+    "monitored_channels": "id_list",
+    "monitoring_enabled": "bool",
+    "cleanup_enabled": "bool",
+    "reminders_enabled": "bool",
+    "monitoring_time": "json",
+    "cleanup_time": "json",
+    "reminder_time": "json",
+    "cleanup_channels": "id",
+    "onboarding_sent": "bool",
+    "recruit_settings": "json",
+}
+
+# Ключи recruit (DEFAULT_GUILD_SETTINGS["recruit"], блок recruit_settings в web.DEFAULT_SETTINGS,
+# main.REQUIRED_RECRUIT_KEYS)
+RECRUIT_SCHEMA = {
+    "admin_role": "id",
+    "points_moderator_roles": "str",
+    "recruiter_roles": "str",
+    "events_channel": "id",
+    "shop_channel": "id",
+    "events_data": "json",
+    "points_start_date": "str",
+    "points_end_date": "str",
+    "default_role": "id",
+    "recruit_role": "id",
+    "guild_name": "str",
+    "cooldown_hours": "number",
+    "forum_channel": "id",
+    "points_panel_channel": "id",
+    "recruit_panel_channel": "id",
+}
+
+SETTINGS_SCHEMA: Dict[str, str] = {**RECRUIT_SCHEMA, **PARTY_SCHEMA}
+
+
+def coerce_setting(key: str, value: Any) -> Any:
+    """Привести значение к типу ключа из схемы (строки из веб-форм -> ID и т.п.).
+    Если привести нельзя — значение остаётся как есть.
+    """
+    kind = SETTINGS_SCHEMA.get(key)
+    if kind is None:
+        return value
+    try:
+        return COERCERS[kind](value)
+    except (TypeError, ValueError, json.JSONDecodeError):
+        return value
+
+
+def encode_setting(key: str, value: Any) -> Tuple[str, str]:
+    """Значение -> (value_type, setting_value)"""
+    value = coerce_setting(key, value)
+    tag = tag_for_value(value)
+    return tag, CODECS[tag][0](value)
+
+
+def decode_setting(value_type: str, value_str: str) -> Any:
+    """(value_type, setting_value) -> значение; один вызов кодека"""
+    return CODECS[value_type][1](value_str)
+
+
+def legacy_decode(value_str: str) -> Any:
+    """Старое угадывание типа для строк без value_type (только для миграции)"""
+    try:
+        return json.loads(value_str)
+    except (json.JSONDecodeError, TypeError):
+        if value_str.lower() in ("true", "false"):
+            return value_str.lower() == "true"
+        try:
+            if "." in value_str:
+                return float(value_str)
+            return int(value_str)
+        except ValueError:
+            return value_str
+
+
+def migrate_legacy_value(key: str, value_str: str) -> Tuple[str, str]:
+    """Строка старого формата -> (value_type, setting_value) по схеме.
+    Для строковых ключей исходный текст сохраняется без угадывания.
+    """
+    if SETTINGS_SCHEMA.get(key) == "str":
+        return "str", value_str
+    value = legacy_decode(value_str)
+    # Старый str(None) записывал "None"
+    if value == "None" and SETTINGS_SCHEMA.get(key) in ("id", "id_list", "mention", "json"):
+        value = None
+    return encode_setting(key, value)
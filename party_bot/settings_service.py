@@ -0,0 +1,289 @@
+"""
+Единый сервис настроек серверов.
+Источник истины — settings.db (SimpleSettingsDB): бот, recruit-модуль и веб
+читают и пишут настройки только через этот сервис. У каждого сервера есть
+версия настроек, которая растёт при каждом изменении.
+
+Старые хранилища (таблица guild_settings из settings_db.py, unified_settings.json,
+guild_config в potatos_recruit.db) переносятся сюда один раз — факт переноса
+записан в settings.db — и дальше остаются только для чтения.
+"""
+
+import json
+import os
+import sqlite3
+from copy import deepcopy
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from party_bot.simple_settings_db import SimpleSettingsDB, get_settings_db
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEGACY_UNIFIED_FILE = os.path.join(BASE_DIR, "unified_settings.json")
+LEGACY_RECRUIT_DB = os.path.join(BASE_DIR, "potatos_recruit.db")
+
+# Ключ, под которым лежит блок настроек рекрутинга
+RECRUIT_KEY = "recruit_settings"
+
+# Значения по умолчанию party (для бота)
+PARTY_DEFAULTS = {
+    "event_creator_role": None,
+    "moderator_role": None,
+    "ping_role": "everyone",
+    "monitored_channels": [],
+    "monitoring_enabled": True,
+    "cleanup_enabled": True,
+    "reminders_enabled": False,
+    "monitoring_time": [10, 20],
+    "cleanup_time": [0, 0],
+    "reminder_time": [0, 15],
+    "cleanup_channels": None,
+    "event_creator_roles": [],
+}
+
+# Значения по умолчанию блока recruit_settings
+RECRUIT_DEFAULTS = {
+    "admin_role": None,
+    "moderator_role": None,
+    "points_moderator_roles": "",
+    "recruiter_roles": "",
+    "events_channel": None,
+    "shop_channel": None,
+    "events_data": None,
+    "points_start_date": "",
+    "points_end_date": "",
+    "default_role": None,
+    "recruit_role": None,
+    "guild_name": "",
+    "cooldown_hours": 1,
+    "forum_channel": None,
+    "points_panel_channel": None,
+    "recruit_panel_channel": None,
+    "onboarding_sent": False,
+}
+
+# Полный набор ключей для веб-шаблонов: любой отсутствующий ключ подставляется,
+# чтобы шаблон не падал KeyError / AttributeError
+COMPLETE_DEFAULTS = {
+    'monitoring_enabled': False,
+    'cleanup_enabled': False,
+    'reminders_enabled': False,
+    'reminder_time': [0, 15],  # [hours, minutes]
+    'event_creator_role': None,
+    'moderator_role': None,
+    'ping_role': 'everyone',
+    'monitored_channels': [],
+    # Вложенный блок рекрутинга (соответствует обращениям в шаблоне)
+    RECRUIT_KEY: {
+        'default_role': None,
+        'recruit_role': None,
+        'guild_name': '',
+        'cooldown_hours': 1,
+        'points_moderator_roles': '',  # строка через запятую
+        'recruiter_roles': '',         # строка через запятую
+        'events_channel': None,
+        'shop_channel': None,
+        'forum_channel': None,
+        'points_panel_channel': None,
+        'recruit_panel_channel': None,
+        'points_start_date': '',
+        'points_end_date': ''
+    }
+}
+
+# Колонки guild_config recruit-бота, названные иначе, чем ключи recruit_settings
+LEGACY_RECRUIT_COLUMNS = {
+    "forum_id": "forum_channel",
+    "apply_channel_id": "recruit_panel_channel",
+}
+
+_MISSING = object()
+
+
+def deep_merge(defaults: dict, actual: dict) -> dict:
+    """Глубокое объединение: значения из actual перекрывают defaults, но структуры сохраняются.
+    Оба словаря не модифицируются (copy)."""
+    result = deepcopy(defaults)
+    if not isinstance(actual, dict):
+        return result
+    for k, v in actual.items():
+        if k in result and isinstance(result[k], dict) and isinstance(v, dict):
+            result[k] = deep_merge(result[k], v)
+        else:
+            result[k] = v
+    return result
+
+
+def _as_dict(value: Any) -> dict:
+    """Блок настроек как dict (старые записи могли хранить JSON-строку или None)"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == []
+
+
+def _non_default(values: dict, defaults: dict) -> dict:
+    """Только значения, отличные от дефолтов (старые хранилища записывали дефолты целиком)"""
+    return {k: v for k, v in values.items() if defaults.get(k, _MISSING) != v}
+
+
+class SettingsService:
+    """Настройки серверов поверх settings.db с версией на сервер"""
+
+    # Однократные миграции старых хранилищ (порядок важен: более новые источники позже)
+    MIGRATIONS = ("legacy_guild_settings", "unified_settings_json", "recruit_guild_config")
+
+    def __init__(self, db: SimpleSettingsDB = None, base_dir: str = None):
+        self.db = db or get_settings_db()
+        base_dir = base_dir or BASE_DIR
+        self.unified_file = os.path.join(base_dir, os.path.basename(LEGACY_UNIFIED_FILE))
+        self.recruit_db = os.path.join(base_dir, os.path.basename(LEGACY_RECRUIT_DB))
+        self.migrate_legacy_stores()
+
+    # ---- Чтение ----
+
+    def version(self, guild_id: int) -> int:
+        """Версия настроек сервера (растёт при каждом изменении)"""
+        return self.db.get_guild_version(guild_id)
+
+    def get_settings(self, guild_id: int) -> Dict[str, Any]:
+        """Все сохранённые настройки сервера (без дефолтов)"""
+        return self.db.get_guild_settings(guild_id)
+
+    def get(self, guild_id: int, key: str, default: Any = None) -> Any:
+        return self.db.get_guild_setting(guild_id, key, default)
+
+    def get_recruit_settings(self, guild_id: int) -> Dict[str, Any]:
+        """Сохранённый блок recruit_settings (без дефолтов)"""
+        return _as_dict(self.db.get_guild_setting(guild_id, RECRUIT_KEY))
+
+    def get_complete(self, guild_id: int) -> Dict[str, Any]:
+        """Настройки с дефолтами для веба. Никогда не возвращает None."""
+        raw = self.get_settings(guild_id)
+        raw[RECRUIT_KEY] = _as_dict(raw.get(RECRUIT_KEY))
+        return deep_merge(COMPLETE_DEFAULTS, raw)
+
+    # ---- Запись (возвращают новую версию сервера) ----
+
+    def set(self, guild_id: int, key: str, value: Any) -> int:
+        return self.db.set_guild_setting(guild_id, key, value)
+
+    def update(self, guild_id: int, updates: Dict[str, Any]) -> int:
+        """Несколько настроек одной транзакцией"""
+        return self.db.batch_set_settings(guild_id, updates)
+
+    def delete(self, guild_id: int, key: str) -> int:
+        self.db.delete_guild_setting(guild_id, key)
+        return self.version(guild_id)
+
+    def update_recruit_settings(self, guild_id: int, updates: Dict[str, Any]) -> int:
+        """Слить updates в блок recruit_settings (read-modify-write под блокировкой)"""
+        return self.db.update_guild_setting(
+            guild_id, RECRUIT_KEY, lambda current: {**_as_dict(current), **updates}
+        )
+
+    # ---- Однократный перенос старых хранилищ ----
+
+    def migrate_legacy_stores(self):
+        """Перенести ещё не перенесённые хранилища.
+        Заполняются только отсутствующие ключи: то, что уже есть в settings.db, новее.
+        Если источник не прочитался, миграция не отмечается и повторится при следующем запуске.
+        """
+        loaders: Dict[str, Callable[[], Dict[str, Tuple[dict, dict]]]] = {
+            "legacy_guild_settings": self._load_legacy_guild_settings,
+            "unified_settings_json": self._load_unified_settings_json,
+            "recruit_guild_config": self._load_recruit_guild_config,
+        }
+        for name in self.MIGRATIONS:
+            if self.db.is_migration_applied(name):
+                continue
+            try:
+                legacy = loaders[name]()
+            except Exception as e:
+                print(f"⚠️ Миграция настроек {name} не выполнена: {e}")
+                continue
+            guilds = {guild_id: self._missing_items(guild_id, party, recruit)
+                      for guild_id, (party, recruit) in legacy.items()}
+            guilds = {guild_id: items for guild_id, items in guilds.items() if items}
+            if self.db.apply_migration(name, guilds) and guilds:
+                print(f"🛠️ Миграция настроек {name}: обновлено серверов {len(guilds)}")
+
+    def _missing_items(self, guild_id: str, party: dict, recruit: dict) -> Dict[str, Any]:
+        current = self.db.get_guild_settings(guild_id)
+        items = {k: v for k, v in party.items() if k != RECRUIT_KEY and k not in current}
+        current_rs = _as_dict(current.get(RECRUIT_KEY))
+        new_rs = {k: v for k, v in recruit.items() if not _is_empty(v) and _is_empty(current_rs.get(k))}
+        if new_rs:
+            items[RECRUIT_KEY] = {**current_rs, **new_rs}
+        return items
+
+    def _load_legacy_guild_settings(self) -> Dict[str, Tuple[dict, dict]]:
+        """Таблица guild_settings (JSON целиком) в том же settings.db"""
+        conn = sqlite3.connect(self.db.db_path)
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='guild_settings'"
+            ).fetchone()
+            if not exists:
+                return {}
+            rows = conn.execute("SELECT guild_id, settings_json FROM guild_settings").fetchall()
+        finally:
+            conn.close()
+        result = {}
+        for guild_id, settings_json in rows:
+            settings = _as_dict(settings_json)
+            result[str(guild_id)] = (_non_default(settings, PARTY_DEFAULTS), _as_dict(settings.get(RECRUIT_KEY)))
+        return result
+
+    def _load_unified_settings_json(self) -> Dict[str, Tuple[dict, dict]]:
+        """unified_settings.json: блоки party и recruit каждого сервера"""
+        if not os.path.exists(self.unified_file):
+            return {}
+        with open(self.unified_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        result = {}
+        for guild_id, guild_data in (data.get("guilds") or {}).items():
+            party = _as_dict(guild_data.get("party"))
+            # Сначала recruit_settings, случайно записанные в party, затем основной блок
+            recruit = {**_as_dict(party.get(RECRUIT_KEY)), **_as_dict(guild_data.get("recruit"))}
+            result[str(guild_id)] = (_non_default(party, PARTY_DEFAULTS), _non_default(recruit, RECRUIT_DEFAULTS))
+        return result
+
+    def _load_recruit_guild_config(self) -> Dict[str, Tuple[dict, dict]]:
+        """guild_config в potatos_recruit.db (recruit-бот и EventDatabase)"""
+        if not os.path.exists(self.recruit_db):
+            return {}
+        conn = sqlite3.connect(self.recruit_db)
+        conn.row_factory = sqlite3.Row
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='guild_config'"
+            ).fetchone()
+            if not exists:
+                return {}
+            rows = conn.execute("SELECT * FROM guild_config").fetchall()
+        finally:
+            conn.close()
+        result = {}
+        for row in rows:
+            recruit = {LEGACY_RECRUIT_COLUMNS.get(col, col): row[col]
+                       for col in row.keys() if col != "guild_id"}
+            result[str(row["guild_id"])] = ({}, recruit)
+        return result
+
+
+# Глобальный экземпляр для быстрого доступа
+_service_instance: Optional[SettingsService] = None
+
+
+def get_settings_service() -> SettingsService:
+    """Получить глобальный сервис настроек"""
+    global _service_instance
+    if _service_instance is None:
+        _service_instance = SettingsService()
+    return _service_instance
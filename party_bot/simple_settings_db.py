@@ -4,14 +4,39 @@
 """
 
 import sqlite3
-import json
+import copy
 import threading
 import os
-from typing import Any, Dict, Optional
+import sys
+from typing import Any, Callable, Dict, Optional
 from datetime import datetime
 
+try:
+    from party_bot.settings_schema import encode_setting, decode_setting, legacy_decode, migrate_legacy_value
+except ImportError:
+    # Запуск файла напрямую (python simple_settings_db.py --bench)
+    from settings_schema import encode_setting, decode_setting, legacy_decode, migrate_legacy_value
+
+# Сколько ждать снятия блокировки БД другим процессом, мс
+BUSY_TIMEOUT_MS = 5000
+
+def _copy_value(value: Any) -> Any:
+    # Списки и словари отдаём копией, чтобы правки вызывающего не портили кэш
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+
 class SimpleSettingsDB:
-    """Простая и быстрая база данных настроек"""
+    """Простая и быстрая база данных настроек.
+    Каждый поток держит своё постоянное соединение (WAL, synchronous=NORMAL),
+    блокировка нужна только писателям. Настройки сервера читаются из БД один
+    раз и дальше отдаются из памяти; изменения через другие соединения
+    (веб-воркеры, бот) обнаруживаются по PRAGMA data_version — кэш сбрасывается.
+    Кэш общий для всех потоков, поэтому и data_version читается с одного
+    общего соединения-наблюдателя, а не с соединения потока: новое соединение
+    потока не видит коммиты, сделанные до его открытия.
+    У каждого сервера есть версия настроек: растёт на единицу в той же транзакции,
+    что и любая запись или удаление.
+    """
     
     def __init__(self, db_path: str = None):
         if db_path is None:
@@ -19,15 +44,42 @@ class SimpleSettingsDB:
             db_path = os.path.join(os.path.dirname(__file__), "..", "settings.db")
         
         self.db_path = os.path.abspath(db_path)
+        # Только для записи: читатели блокировку не берут
         self.lock = threading.Lock()
+        self._local = threading.local()
+        # Кэш: guild_id -> словарь настроек. Словари не меняются на месте,
+        # запись подменяет их целиком (copy-on-write), поэтому читать можно без блокировки
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        # guild_id -> версия настроек (тоже copy-on-write)
+        self._versions: Dict[str, int] = {}
+        # Поколение кэша: растёт при каждой записи/сбросе, чтобы загрузка,
+        # начатая до записи, не положила в кэш устаревшие данные
+        self._generation = 0
+        self.cache_stats = {"cache_hits": 0, "cache_misses": 0, "cache_invalidations": 0}
         self._init_database()
+        # Наблюдатель за изменениями БД: одно соединение на процесс, живёт вместе с кэшем
+        self._watch_lock = threading.Lock()
+        self._watch_conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        self._data_version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
         print(f"✅ Простая база данных настроек готова: {self.db_path}")
     
+    def _connection(self) -> sqlite3.Connection:
+        """Постоянное соединение текущего потока"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+            conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            self._local.conn = conn
+        return conn
+    
     def _init_database(self):
         """Создание простой структуры базы данных"""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connection()
             cursor = conn.cursor()
+            # WAL сохраняется в файле БД: читатели не ждут писателя
+            cursor.execute('PRAGMA journal_mode = WAL')
             
             # Одна простая таблица для всех настроек
             cursor.execute('''
@@ -56,221 +108,315 @@ class SimpleSettingsDB:
                 END
             ''')
             
-            conn.commit()
-            conn.close()
-    
-    def set_guild_setting(self, guild_id: int, key: str, value: Any):
-        """Быстрая установка одной настройки"""
-        guild_id_str = str(guild_id)
-        
-        # Сериализуем значение в JSON
-        if isinstance(value, (dict, list)):
-            value_str = json.dumps(value, ensure_ascii=False)
-        elif isinstance(value, bool):
-            value_str = "true" if value else "false"
-        else:
-            value_str = str(value)
-        
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
             
-            # Используем REPLACE для быстрой вставки/обновления
+            # Тег типа значения (см. settings_schema); NULL — строка старого формата
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(settings)')}
+            if 'value_type' not in columns:
+                cursor.execute('ALTER TABLE settings ADD COLUMN value_type TEXT')
+            self._migrate_untyped_rows(cursor)
+            
+            # Версия настроек сервера (см. _bump_version)
             cursor.execute('''
-                REPLACE INTO settings (guild_id, setting_key, setting_value, updated_at)
-                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (guild_id_str, key, value_str))
+                CREATE TABLE IF NOT EXISTS guild_versions (
+                    guild_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            # Применённые однократные миграции (см. apply_migration)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS settings_migrations (
+                    name TEXT PRIMARY KEY,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
             
             conn.commit()
-            conn.close()
     
-    def get_guild_setting(self, guild_id: int, key: str, default: Any = None) -> Any:
-        """Быстрое получение одной настройки"""
-        guild_id_str = str(guild_id)
-        
+    def _migrate_untyped_rows(self, cursor):
+        """Один раз проставить value_type строкам, записанным без него"""
+        rows = cursor.execute(
+            'SELECT guild_id, setting_key, setting_value FROM settings WHERE value_type IS NULL'
+        ).fetchall()
+        if not rows:
+            return
+        updates = []
+        for guild_id, key, value_str in rows:
+            value_type, typed_str = migrate_legacy_value(key, value_str)
+            updates.append((typed_str, value_type, guild_id, key))
+        cursor.executemany(
+            'UPDATE settings SET setting_value = ?, value_type = ? WHERE guild_id = ? AND setting_key = ?',
+            updates
+        )
+        print(f"🛠️ settings.db: типизировано старых настроек: {len(updates)}")
+    
+    # ---- Кэш ----
+    
+    def _check_external_changes(self):
+        """Сбросить кэш, если другое соединение (другой процесс или поток) зафиксировало изменения.
+        Сверяемся с общим для процесса data_version наблюдателя — той же отметкой, что и кэш.
+        """
+        with self._watch_lock:
+            version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+        self._drop_cache()
+    
+    def _drop_cache(self):
+        self._generation += 1
+        self._versions = {}
+        if self._cache:
+            self._cache = {}
+            self.cache_stats["cache_invalidations"] += 1
+    
+    def _guild_cache(self, guild_id_str: str) -> Dict[str, Any]:
+        """Настройки сервера из кэша (загружаются целиком при первом обращении)"""
+        conn = self._connection()
+        self._check_external_changes()
+        cached = self._cache.get(guild_id_str)
+        if cached is not None:
+            self.cache_stats["cache_hits"] += 1
+            return cached
+        self.cache_stats["cache_misses"] += 1
+        generation = self._generation
+        rows = conn.execute('''
+            SELECT setting_key, setting_value, value_type FROM settings 
+            WHERE guild_id = ?
+        ''', (guild_id_str,)).fetchall()
+        cached = {key: self._decode_row(value_str, value_type) for key, value_str, value_type in rows}
+        if generation == self._generation:
+            self._cache[guild_id_str] = cached
+        return cached
+    
+    @staticmethod
+    def _decode_row(value_str: str, value_type: Optional[str]) -> Any:
+        # Строка без тега могла прийти от старой версии в другом процессе
+        if value_type is None:
+            return legacy_decode(value_str)
+        return decode_setting(value_type, value_str)
+    
+    def invalidate_cache(self, guild_id: int = None):
+        """Сбросить кэш сервера (или весь)"""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT setting_value FROM settings 
-                WHERE guild_id = ? AND setting_key = ?
-            ''', (guild_id_str, key))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                value_str = result[0]
-                # Десериализуем значение
-                try:
-                    # Пробуем JSON
-                    return json.loads(value_str)
-                except (json.JSONDecodeError, TypeError):
-                    # Если не JSON, проверяем bool
-                    if value_str.lower() in ('true', 'false'):
-                        return value_str.lower() == 'true'
-                    # Пробуем число
-                    try:
-                        if '.' in value_str:
-                            return float(value_str)
-                        else:
-                            return int(value_str)
-                    except ValueError:
-                        # Возвращаем как строку
-                        return value_str
+            if guild_id is None:
+                self._drop_cache()
             else:
-                return default
+                self._generation += 1
+                self._cache.pop(str(guild_id), None)
+                self._versions.pop(str(guild_id), None)
     
-    def get_guild_settings(self, guild_id: int) -> Dict[str, Any]:
-        """Получение всех настроек сервера одним запросом"""
+    # ---- Версии ----
+    
+    def _bump_version(self, cursor, guild_id_str: str) -> int:
+        """Увеличить версию сервера внутри текущей транзакции"""
+        cursor.execute('''
+            INSERT INTO guild_versions (guild_id, version) VALUES (?, 1)
+            ON CONFLICT(guild_id) DO UPDATE SET version = version + 1
+        ''', (guild_id_str,))
+        return cursor.execute(
+            'SELECT version FROM guild_versions WHERE guild_id = ?', (guild_id_str,)
+        ).fetchone()[0]
+    
+    def _set_cached_version(self, guild_id_str: str, version: int):
+        versions = dict(self._versions)
+        versions[guild_id_str] = version
+        self._versions = versions
+    
+    def get_guild_version(self, guild_id: int) -> int:
+        """Версия настроек сервера (0 — настроек ещё не было)"""
         guild_id_str = str(guild_id)
-        
+        conn = self._connection()
+        self._check_external_changes()
+        version = self._versions.get(guild_id_str)
+        if version is not None:
+            return version
+        generation = self._generation
+        row = conn.execute(
+            'SELECT version FROM guild_versions WHERE guild_id = ?', (guild_id_str,)
+        ).fetchone()
+        version = row[0] if row else 0
+        if generation == self._generation:
+            self._set_cached_version(guild_id_str, version)
+        return version
+    
+    # ---- Запись (write-through) ----
+    
+    def _write(self, guild_id_str: str, items: Dict[str, tuple]) -> int:
+        """REPLACE настроек одной транзакцией и обновление кэша.
+        items: key -> (value_type, setting_value). Возвращает новую версию сервера.
+        """
+        conn = self._connection()
+        self._check_external_changes()
+        cursor = conn.cursor()
+        try:
+            for key, (value_type, value_str) in items.items():
+                # Используем REPLACE для быстрой вставки/обновления
+                cursor.execute('''
+                    REPLACE INTO settings (guild_id, setting_key, setting_value, value_type, updated_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (guild_id_str, key, value_str, value_type))
+            version = self._bump_version(cursor, guild_id_str)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self._generation += 1
+        self._set_cached_version(guild_id_str, version)
+        cached = self._cache.get(guild_id_str)
+        if cached is not None:
+            # В кэш кладём то же, что вернёт чтение из БД
+            updated = dict(cached)
+            for key, (value_type, value_str) in items.items():
+                updated[key] = decode_setting(value_type, value_str)
+            self._cache[guild_id_str] = updated
+        return version
+    
+    def set_guild_setting(self, guild_id: int, key: str, value: Any) -> int:
+        """Быстрая установка одной настройки"""
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT setting_key, setting_value FROM settings 
-                WHERE guild_id = ?
-            ''', (guild_id_str,))
-            
-            results = cursor.fetchall()
-            conn.close()
-            
-            settings = {}
-            for key, value_str in results:
-                # Десериализуем значение
-                try:
-                    # Пробуем JSON
-                    settings[key] = json.loads(value_str)
-                except (json.JSONDecodeError, TypeError):
-                    # Если не JSON, проверяем bool
-                    if value_str.lower() in ('true', 'false'):
-                        settings[key] = value_str.lower() == 'true'
-                    else:
-                        # Пробуем число
-                        try:
-                            if '.' in value_str:
-                                settings[key] = float(value_str)
-                            else:
-                                settings[key] = int(value_str)
-                        except ValueError:
-                            # Оставляем как строку
-                            settings[key] = value_str
-            
-            return settings
+            return self._write(str(guild_id), {key: encode_setting(key, value)})
     
-    def batch_set_settings(self, guild_id: int, settings: Dict[str, Any]):
+    def get_guild_setting(self, guild_id: int, key: str, default: Any = None) -> Any:
+        """Быстрое получение одной настройки"""
+        settings = self._guild_cache(str(guild_id))
+        if key not in settings:
+            return default
+        return _copy_value(settings[key])
+    
+    def get_guild_settings(self, guild_id: int) -> Dict[str, Any]:
+        """Получение всех настроек сервера"""
+        settings = self._guild_cache(str(guild_id))
+        return {key: _copy_value(value) for key, value in settings.items()}
+    
+    def batch_set_settings(self, guild_id: int, settings: Dict[str, Any]) -> int:
         """Быстрая установка множественных настроек одной транзакцией"""
-        guild_id_str = str(guild_id)
-        
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Начинаем транзакцию
-            cursor.execute('BEGIN TRANSACTION')
-            
-            try:
-                for key, value in settings.items():
-                    # Сериализуем значение
-                    if isinstance(value, (dict, list)):
-                        value_str = json.dumps(value, ensure_ascii=False)
-                    elif isinstance(value, bool):
-                        value_str = "true" if value else "false"
-                    else:
-                        value_str = str(value)
-                    
-                    cursor.execute('''
-                        REPLACE INTO settings (guild_id, setting_key, setting_value, updated_at)
-                        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-                    ''', (guild_id_str, key, value_str))
-                
-                cursor.execute('COMMIT')
-                
-            except Exception as e:
-                cursor.execute('ROLLBACK')
-                raise e
-            finally:
-                conn.close()
+            return self._write(str(guild_id), {key: encode_setting(key, value) for key, value in settings.items()})
     
+    def update_guild_setting(self, guild_id: int, key: str, update: Callable[[Any], Any]) -> int:
+        """Read-modify-write одной настройки под блокировкой писателя.
+        update получает копию текущего значения (или None) и возвращает новое.
+        """
+        guild_id_str = str(guild_id)
+        with self.lock:
+            current = self._guild_cache(guild_id_str).get(key)
+            value = update(_copy_value(current))
+            return self._write(guild_id_str, {key: encode_setting(key, value)})
+
     def delete_guild_setting(self, guild_id: int, key: str):
         """Удаление настройки"""
         guild_id_str = str(guild_id)
         
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connection()
+            self._check_external_changes()
             cursor = conn.cursor()
-            
             cursor.execute('''
                 DELETE FROM settings 
                 WHERE guild_id = ? AND setting_key = ?
             ''', (guild_id_str, key))
-            
+            version = self._bump_version(cursor, guild_id_str)
             conn.commit()
-            conn.close()
+            self._generation += 1
+            self._set_cached_version(guild_id_str, version)
+            cached = self._cache.get(guild_id_str)
+            if cached is not None:
+                self._cache[guild_id_str] = {k: v for k, v in cached.items() if k != key}
     
     def delete_guild_settings(self, guild_id: int):
         """Удаление всех настроек сервера"""
         guild_id_str = str(guild_id)
         
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connection()
+            self._check_external_changes()
             cursor = conn.cursor()
-            
             cursor.execute('''
                 DELETE FROM settings WHERE guild_id = ?
             ''', (guild_id_str,))
-            
+            version = self._bump_version(cursor, guild_id_str)
             conn.commit()
-            conn.close()
+            self._generation += 1
+            self._cache.pop(guild_id_str, None)
+            self._set_cached_version(guild_id_str, version)
     
-    def get_all_guilds(self) -> list:
-        """Получение списка всех серверов с настройками"""
+    def apply_migration(self, name: str, guilds: Dict[str, Dict[str, Any]]) -> bool:
+        """Однократная миграция: записать настройки серверов и отметить name применённой.
+        Всё одной транзакцией; если миграция уже отмечена (в т.ч. другим процессом),
+        ничего не пишет и возвращает False.
+        """
         with self.lock:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connection()
+            self._check_external_changes()
             cursor = conn.cursor()
-            
-            cursor.execute('SELECT DISTINCT guild_id FROM settings ORDER BY guild_id')
-            results = cursor.fetchall()
-            conn.close()
-            
-            return [row[0] for row in results]
+            try:
+                if cursor.execute('SELECT 1 FROM settings_migrations WHERE name = ?', (name,)).fetchone():
+                    conn.rollback()
+                    return False
+                for guild_id_str, items in guilds.items():
+                    if not items:
+                        continue
+                    for key, value in items.items():
+                        value_type, value_str = encode_setting(key, value)
+                        cursor.execute('''
+                            REPLACE INTO settings (guild_id, setting_key, setting_value, value_type, updated_at)
+                            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                        ''', (str(guild_id_str), key, value_str, value_type))
+                    self._bump_version(cursor, str(guild_id_str))
+                cursor.execute('INSERT INTO settings_migrations (name) VALUES (?)', (name,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            self._drop_cache()
+            return True
+    
+    def is_migration_applied(self, name: str) -> bool:
+        """Применялась ли однократная миграция name"""
+        row = self._connection().execute(
+            'SELECT 1 FROM settings_migrations WHERE name = ?', (name,)
+        ).fetchone()
+        return row is not None
+    
+    def get_all_guilds(self) -> list:
+        """Получение списка всех серверов с настройками"""
+        cursor = self._connection().cursor()
+        cursor.execute('SELECT DISTINCT guild_id FROM settings ORDER BY guild_id')
+        results = cursor.fetchall()
+        return [row[0] for row in results]
     
     def get_stats(self) -> Dict[str, Any]:
         """Получение статистики базы данных"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Количество серверов
-            cursor.execute('SELECT COUNT(DISTINCT guild_id) FROM settings')
-            guilds_count = cursor.fetchone()[0]
-            
-            # Общее количество настроек
-            cursor.execute('SELECT COUNT(*) FROM settings')
-            settings_count = cursor.fetchone()[0]
-            
-            # Размер базы данных
-            cursor.execute('SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()')
-            size_result = cursor.fetchone()
-            db_size = size_result[0] if size_result else 0
-            
-            # Последние обновления
-            cursor.execute('SELECT guild_id, setting_key, updated_at FROM settings ORDER BY updated_at DESC LIMIT 5')
-            recent_updates = cursor.fetchall()
-            
-            conn.close()
-            
-            return {
-                'guilds_count': guilds_count,
-                'settings_count': settings_count,
-                'db_size_bytes': db_size,
-                'db_size_kb': db_size / 1024 if db_size else 0,
-                'avg_settings_per_guild': settings_count / max(guilds_count, 1),
-                'recent_updates': recent_updates
-            }
+        cursor = self._connection().cursor()
+        
+        # Количество серверов
+        cursor.execute('SELECT COUNT(DISTINCT guild_id) FROM settings')
+        guilds_count = cursor.fetchone()[0]
+        
+        # Общее количество настроек
+        cursor.execute('SELECT COUNT(*) FROM settings')
+        settings_count = cursor.fetchone()[0]
+        
+        # Размер базы данных
+        cursor.execute('SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()')
+        size_result = cursor.fetchone()
+        db_size = size_result[0] if size_result else 0
+        
+        # Последние обновления
+        cursor.execute('SELECT guild_id, setting_key, updated_at FROM settings ORDER BY updated_at DESC LIMIT 5')
+        recent_updates = cursor.fetchall()
+        
+        return {
+            'guilds_count': guilds_count,
+            'settings_count': settings_count,
+            'db_size_bytes': db_size,
+            'db_size_kb': db_size / 1024 if db_size else 0,
+            'avg_settings_per_guild': settings_count / max(guilds_count, 1),
+            'recent_updates': recent_updates,
+            'cached_guilds': len(self._cache),
+            **self.cache_stats
+        }
 
 # Глобальный экземпляр для быстрого доступа
 _db_instance = None
@@ -300,8 +446,87 @@ def save_all_data():
     pass
 
 def reload_settings_from_disk():
-    """Заглушка для совместимости - данные всегда актуальные"""
-    pass
+    """Сбросить кэш настроек (изменения других процессов и так видны по data_version)"""
+    get_settings_db().invalidate_cache()
+
+def run_read_benchmark(threads: int = 8, seconds: float = 3.0, db_path: str = None) -> Dict[str, float]:
+    """Замер QPS чтения настроек из нескольких потоков (как у threaded Flask).
+    legacy — прежняя схема: глобальная блокировка + connect/close на каждый запрос;
+    pooled — постоянные соединения потоков без блокировки, без кэша;
+    cached — SimpleSettingsDB.get_guild_setting (кэш в памяти).
+    По умолчанию работает на временной копии, settings.db не трогает.
+    """
+    import tempfile
+    import time as _time
+    
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="settings_bench_"), "settings.db")
+    db = SimpleSettingsDB(db_path)
+    guild_ids = [100000000000000000 + i for i in range(50)]
+    for gid in guild_ids:
+        db.batch_set_settings(gid, {
+            "ping_role": "everyone",
+            "monitored_channels": [1, 2, 3],
+            "monitoring_enabled": True,
+            "monitoring_time": [10, 20],
+        })
+    
+    legacy_lock = threading.Lock()
+    
+    def legacy_read(gid):
+        with legacy_lock:
+            conn = sqlite3.connect(db.db_path)
+            row = conn.execute(
+                'SELECT setting_value FROM settings WHERE guild_id = ? AND setting_key = ?',
+                (str(gid), "monitored_channels")
+            ).fetchone()
+            conn.close()
+        return legacy_decode(row[0])
+    
+    def pooled_read(gid):
+        row = db._connection().execute(
+            'SELECT setting_value, value_type FROM settings WHERE guild_id = ? AND setting_key = ?',
+            (str(gid), "monitored_channels")
+        ).fetchone()
+        return decode_setting(row[1], row[0])
+    
+    def cached_read(gid):
+        return db.get_guild_setting(gid, "monitored_channels")
+    
+    def measure(read) -> float:
+        counts = [0] * threads
+        deadline = _time.perf_counter() + seconds
+        
+        def worker(n):
+            i = n
+            while _time.perf_counter() < deadline:
+                read(guild_ids[i % len(guild_ids)])
+                i += 1
+                counts[n] += 1
+        
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return sum(counts) / seconds
+    
+    return {
+        "legacy": measure(legacy_read),
+        "pooled": measure(pooled_read),
+        "cached": measure(cached_read),
+    }
+
+if __name__ == "__main__" and "--bench" in sys.argv:
+    # python simple_settings_db.py --bench [потоки] [секунды]
+    args = [a for a in sys.argv[1:] if a != "--bench"]
+    bench_threads = int(args[0]) if args else 8
+    bench_seconds = float(args[1]) if len(args) > 1 else 3.0
+    print(f"⏱️ Чтение настроек: {bench_threads} потоков, {bench_seconds:g} с на режим")
+    results = run_read_benchmark(bench_threads, bench_seconds)
+    for mode, qps in results.items():
+        print(f"  {mode:>7}: {qps:>12,.0f} чтений/с ({qps / results['legacy']:.1f}x)")
+    sys.exit(0)
 
 if __name__ == "__main__":
     # Быстрый тест
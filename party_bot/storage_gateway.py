@@ -0,0 +1,164 @@
+"""
+Шлюз файлового и SQLite ввода-вывода для корутин бота.
+Блокирующие вызовы (настройки, шаблоны, JSON-файлы, events.db) выполняются
+в выделенном потоке, а цикл событий бота только ожидает результат.
+
+Режим отладки STORAGE_DEBUG_BLOCKING=1 ставит audit hook, который
+сообщает об открытии файлов и SQLite-соединений прямо в потоке цикла.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+
+DEFAULT_THREADS = 1
+
+# События аудита, которые означают блокирующий ввод-вывод
+BLOCKING_AUDIT_EVENTS = {
+    "open", "sqlite3.connect", "os.remove", "os.rename", "os.mkdir",
+    "os.listdir", "os.scandir", "shutil.copyfile",
+}
+
+
+class StorageGateway:
+    """Асинхронные обёртки над блокирующим вводом-выводом"""
+
+    def __init__(self, threads: int = None, debug_blocking: bool = None):
+        if threads is None:
+            try:
+                threads = int(os.getenv("PARTY_STORAGE_THREADS", DEFAULT_THREADS))
+            except ValueError:
+                threads = DEFAULT_THREADS
+        # По умолчанию один поток: операции read-modify-write (шаблоны, очередь) не пересекаются
+        self.threads = max(threads, 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="party-storage")
+        self._loop_threads: Set[int] = set()
+        self._reported: Set[tuple] = set()
+        self._in_hook = threading.local()
+        self._hook_installed = False
+        self.stats = {"storage_calls": 0, "storage_errors": 0, "storage_blocking_warnings": 0}
+
+        if debug_blocking is None:
+            debug_blocking = os.getenv("STORAGE_DEBUG_BLOCKING", "").lower() in ("1", "true", "yes")
+        self.debug_blocking = debug_blocking
+
+    # ---- Выполнение ----
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполнить блокирующую функцию в потоке ввода-вывода"""
+        loop = asyncio.get_running_loop()
+        self.stats["storage_calls"] += 1
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        except Exception:
+            self.stats["storage_errors"] += 1
+            raise
+
+    async def read_json(self, path: str, default: Any = None) -> Any:
+        """Прочитать JSON-файл; default — если файла нет или он повреждён"""
+        return await self.run(_read_json, path, default)
+
+    async def write_json(self, path: str, data: Any, indent: int = 2):
+        """Атомарно записать JSON (временный файл + rename)"""
+        # Сериализуем на цикле: данные могут меняться, пока задача ждёт поток
+        payload = json.dumps(data, ensure_ascii=False, indent=indent)
+        await self.run(write_text_atomic, path, payload)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    # ---- Отладка блокирующих вызовов ----
+
+    def watch_loop(self, loop: asyncio.AbstractEventLoop = None):
+        """Отмечать блокирующий ввод-вывод в потоке этого цикла (при STORAGE_DEBUG_BLOCKING)"""
+        if not self.debug_blocking:
+            return
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        if loop.is_running():
+            self._loop_threads.add(threading.get_ident())
+        else:
+            loop.call_soon(lambda: self._loop_threads.add(threading.get_ident()))
+        if not self._hook_installed:
+            sys.addaudithook(self._audit_hook)
+            self._hook_installed = True
+            print("🔍 STORAGE_DEBUG_BLOCKING: отслеживаем блокирующий ввод-вывод в цикле бота")
+
+    def _audit_hook(self, event: str, args: tuple):
+        if event not in BLOCKING_AUDIT_EVENTS or threading.get_ident() not in self._loop_threads:
+            return
+        if getattr(self._in_hook, "active", False):
+            return
+        self._in_hook.active = True
+        try:
+            # Место вызова ищем по фреймам без linecache, чтобы не открывать файлы из хука
+            frame = sys._getframe(1)
+            location = None
+            while frame is not None:
+                filename = frame.f_code.co_filename
+                if filename != __file__ and not filename.startswith(_STDLIB_PREFIXES):
+                    location = (filename, frame.f_lineno, frame.f_code.co_name)
+                    break
+                frame = frame.f_back
+            key = (event, location)
+            if key in self._reported:
+                return
+            self._reported.add(key)
+            self.stats["storage_blocking_warnings"] += 1
+            where = f"{location[0]}:{location[1]} ({location[2]})" if location else "неизвестно"
+            target = args[0] if args else ""
+            print(f"⚠️ Блокирующий вызов {event} в цикле бота: {target!r} — {where}")
+        finally:
+            self._in_hook.active = False
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+# Стандартная библиотека и site-packages: место вызова ищем выше по стеку
+_STDLIB_PREFIXES = (os.path.dirname(os.__file__),)
+
+
+def _read_json(path: str, default: Any) -> Any:
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return default
+
+
+def write_text_atomic(path: str, payload: str):
+    """Записать текст атомарно: временный файл в той же папке + os.replace"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# Глобальный экземпляр для быстрого доступа
+_gateway_instance: Optional[StorageGateway] = None
+
+
+def get_storage_gateway() -> StorageGateway:
+    """Получить глобальный шлюз ввода-вывода"""
+    global _gateway_instance
+    if _gateway_instance is None:
+        _gateway_instance = StorageGateway()
+    return _gateway_instance
@@ -0,0 +1,93 @@
+"""
+Шаблоны ивентов серверов (templates_data/guild_<id>_templates.json).
+Общий модуль для бота и веб-панели: веб читает и пишет шаблоны сам,
+не импортируя модуль бота. Файл заменяется атомарно, поэтому читатель
+в другом процессе не увидит недописанный JSON. Чтение-изменение-запись
+шаблонов сериализуется между процессами (бот и воркеры gunicorn) блокировкой
+flock на файле-спутнике guild_<id>_templates.lock.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: только блокировка внутри процесса
+    fcntl = None
+
+TEMPLATES_DATA_DIR = "templates_data"
+
+_write_lock = threading.Lock()
+
+
+def _templates_file(guild_id: int) -> str:
+    return os.path.join(TEMPLATES_DATA_DIR, f"guild_{guild_id}_templates.json")
+
+
+@contextmanager
+def _templates_lock(guild_id: int):
+    """Эксклюзивная блокировка шаблонов сервера: между потоками и между процессами"""
+    with _write_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(TEMPLATES_DATA_DIR, exist_ok=True)
+        lock_path = os.path.join(TEMPLATES_DATA_DIR, f"guild_{guild_id}_templates.lock")
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def get_guild_templates(guild_id: int) -> dict:
+    """Получить шаблоны для конкретного сервера из отдельного файла"""
+    templates_file = _templates_file(guild_id)
+    if os.path.exists(templates_file):
+        try:
+            with open(templates_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Ошибка загрузки шаблонов для гильдии {guild_id}: {e}")
+            return {}
+    return {}
+
+
+def save_guild_templates(guild_id: int, templates: dict):
+    """Сохранить шаблоны для конкретного сервера"""
+    os.makedirs(TEMPLATES_DATA_DIR, exist_ok=True)
+    templates_file = _templates_file(guild_id)
+    tmp_file = f"{templates_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(templates, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, templates_file)
+    except Exception as e:
+        print(f"Ошибка сохранения шаблонов для гильдии {guild_id}: {e}")
+
+
+def set_guild_template(guild_id: int, template_name: str, template_data: dict):
+    """Установить шаблон для конкретного сервера"""
+    with _templates_lock(guild_id):
+        templates = get_guild_templates(guild_id)
+        templates[template_name] = template_data
+        save_guild_templates(guild_id, templates)
+
+
+def delete_guild_template(guild_id: int, template_name: str) -> bool:
+    """Удалить шаблон для конкретного сервера"""
+    with _templates_lock(guild_id):
+        templates = get_guild_templates(guild_id)
+        if template_name in templates:
+            del templates[template_name]
+            save_guild_templates(guild_id, templates)
+            return True
+    return False
+
+
+def get_guild_template(guild_id: int, template_name: str):
+    """Получить конкретный шаблон для сервера"""
+    return get_guild_templates(guild_id).get(template_name)
@@ -1,17 +1,15 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
 from flask_session import Session
-import requests
 import json
 import os
 import time
-import discord
 from datetime import datetime, timedelta
 import asyncio
 import threading
 import sys
 import traceback
+import uuid
 import logging
-from copy import deepcopy
 
 # Load environment variables
 try:
@@ -27,13 +25,6 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if BASE_DIR not in sys.path:
     sys.path.append(BASE_DIR)
 
-# Импорт unified_settings с резервным вариантом
-try:
-    from unified_settings import UnifiedSettings
-except ImportError as e:
-    print(f"Ошибка импорта unified_settings: {e}")
-    UnifiedSettings = None
-
 # Глобальная переменная для экземпляра бота
 bot_instance = None
 
@@ -46,19 +37,16 @@ def set_bot_instance(bot):
     bot_instance = bot
 
 def get_bot_instance():
-    """Получает экземпляр бота"""
-    global bot_instance
-    if bot_instance is not None:
-        return bot_instance
-    
-    # Попробуем получить из импорта
-    try:
-        from party_bot.main import bot
-        bot_instance = bot
-        return bot_instance
-    except Exception as e:
-        print(f"Ошибка получения бота: {e}")
+    """Экземпляр бота, если он работает в этом процессе (bot_main.py).
+    Веб сам модуль бота не импортирует: под gunicorn бота в процессе нет.
+    """
+    return bot_instance
+
+def get_bot_module():
+    """Модуль бота (ALL_SESSIONS, get_event, ...), если бот работает в этом процессе"""
+    if bot_instance is None:
         return None
+    return sys.modules.get('party_bot.main')
 
 def queue_async_task(coro):
     """Добавляет асинхронную задачу в очередь"""
@@ -86,23 +74,25 @@ try:
     import os
     # Добавляем путь к корню проекта
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-    from recruit_bot.database import EventDatabase
+    from recruit_bot.database import EventDatabase, connect as recruit_connect, enable_pool, get_pool_stats
     RECRUIT_DB_AVAILABLE = True
 except Exception as e:
     print(f"Ошибка импорта EventDatabase: {e}")
     RECRUIT_DB_AVAILABLE = False
 
-# Импортируем единую систему настроек
-try:
-    from unified_settings import unified_settings, get_recruit_config, update_recruit_config
-    # Принудительно отключаем unified_settings для синхронизации с Discord ботом
-    USE_UNIFIED_SETTINGS = False  # Принудительно используем main.py функции
-except ImportError as e:
-    print(f"Ошибка импорта unified_settings: {e}")
-    USE_UNIFIED_SETTINGS = False
-    unified_settings = None
-    def get_recruit_config(guild_id): return {}
-    def update_recruit_config(guild_id, **kwargs): return False
+# TTL-кэш списков серверов (пользователя и бота) вместо запроса к Discord на каждой странице
+from party_bot.web_cache import (
+    get_bot_guilds as cached_bot_guilds, get_cache_stats, invalidate_user_guilds, token_key, user_guilds_cache
+)
+
+# Постоянный фоновый цикл для корутин из маршрутов (вместо asyncio.run на каждый запрос)
+from party_bot.async_bridge import get_async_bridge, run_sync
+if RECRUIT_DB_AVAILABLE:
+    # Пул соединений potatos_recruit.db живёт в цикле моста
+    get_async_bridge().add_startup_hook(enable_pool)
+
+# Единый сервис настроек (settings.db) — общий для бота, recruit-модуля и веба
+from party_bot.settings_service import get_settings_service, COMPLETE_DEFAULTS as DEFAULT_SETTINGS, deep_merge
 
 # Импорт новой простой системы настроек (абсолютный пакетный)
 try:
@@ -113,70 +103,57 @@ try:
 except ImportError as e:
     print(f"⚠️ Простая система недоступна (abs): {e}")
     USING_FAST_DB = False
-    # Fallback: пробуем через main (который уже настраивает импорты)
+    # Fallback: старая settings_db (как и у бота)
     try:
-        import party_bot.main as main_module
-        get_guild_settings = main_module.get_guild_settings
-        set_guild_setting = main_module.set_guild_setting
-        get_guild_setting = main_module.get_guild_setting
-        save_all_data = main_module.save_all_data
-        reload_settings_from_disk = main_module.reload_settings_from_disk
-        print("✅ Fallback через main_module успешен")
-        USING_DATABASE = getattr(main_module, 'USING_DATABASE', False)
+        from party_bot.settings_db import get_guild_settings, set_guild_setting, get_guild_setting
+        print("✅ Fallback на settings_db")
+        USING_DATABASE = True
     except Exception as e2:
-        print(f"❌ Fallback через main_module провалился: {e2}")
+        print(f"❌ Fallback на settings_db провалился: {e2}")
         def get_guild_settings(guild_id): return {}
         def set_guild_setting(guild_id, key, value): pass
         def get_guild_setting(guild_id, key, default=None): return default
-        def save_all_data(): pass
-        def reload_settings_from_disk(): pass
         USING_DATABASE = False
-
-# Импортируем остальные функции из main.py (пакет party_bot)
-try:
-    from party_bot import main as main_module
-except ImportError:
-    try:
-        from . import main as main_module  # относительный fallback
-    except ImportError as e:
-        print(f"❌ Ошибка импорта дополнительных функций из main.py: {e}")
-        main_module = None
-
-if main_module:
-    get_guild_templates = main_module.get_guild_templates
-    set_guild_template = main_module.set_guild_template
-    delete_guild_template = main_module.delete_guild_template
-    get_guild_template = main_module.get_guild_template
-    save_guild_templates = main_module.save_guild_templates
-    ALL_SESSIONS = main_module.ALL_SESSIONS
-    save_event = main_module.save_event
-    bot = main_module.bot
-else:
-    # Создаем заглушки
-    def get_guild_templates(guild_id): return {}
-    def set_guild_template(guild_id, name, data): pass
-    def delete_guild_template(guild_id, name): return False
-    def get_guild_template(guild_id, name): return None
-    def save_guild_templates(guild_id, templates): pass
-    ALL_SESSIONS = {}
-    def save_event(event_id, data): pass
-    bot = None
-    # Заглушка оставляем, но ниже добавим ленивый прокси
-    async def update_party_message(event_id, interacting_user_id=None):
-        pass
-
-# Ленивый прокси для избежания циклического импорта и использования реальной функции после старта бота
-async def update_party_message_web(event_id, interacting_user_id=None):
+    def save_all_data(): pass
+    def reload_settings_from_disk(): pass
+
+# Шаблоны ивентов — общий с ботом модуль (веб не импортирует party_bot.main)
+from party_bot.templates_store import (
+    get_guild_templates, set_guild_template, delete_guild_template
+)
+
+# Ивенты: из памяти бота, если он в этом процессе, иначе из events.db (WAL, бот пишет туда же)
+from party_bot.event_store import get_event_store
+
+def _event_store():
+    # В общем с ботом процессе это тот же экземпляр, что и EVENT_STORE бота
+    return get_event_store(os.path.join(BASE_DIR, "events.db"))
+
+def get_guild_sessions(guild_id):
+    """Ивенты сервера (без архива): [(sid, session), ...]"""
+    bot_module = get_bot_module()
+    if bot_module is not None:
+        return bot_module.ALL_SESSIONS.by_guild(int(guild_id))
+    return [(str(eid), ev) for eid, ev in _event_store().load_events(guild_id=int(guild_id)).items()]
+
+def get_session(event_id, include_archived=True):
+    """Ивент по id (None — не найден); архив подгружается по запросу"""
+    bot_module = get_bot_module()
+    if bot_module is not None:
+        if include_archived:
+            return bot_module.get_event(event_id)
+        return bot_module.ALL_SESSIONS.get(str(event_id))
     try:
-        # Импортируем при вызове, когда main уже инициализирован
-        import main
-        return await main.update_party_message(event_id, interacting_user_id=interacting_user_id)
-    except Exception as e:
-        print(f"update_party_message_web fallback: {e}")
-        # Мягкий фоллбек: не роняем веб, просто логируем
+        event_id = int(event_id)
+    except (TypeError, ValueError):
         return None
+    store = _event_store()
+    ev = store.load_event(event_id)
+    if ev is None and include_archived:
+        ev = store.load_archived_event(event_id)
+    return ev
 
-# Функции-обёртки больше не нужны, используем прямые импорты из БД или main.py
+# Функции-обёртки больше не нужны, используем прямые импорты из БД
 # get_guild_settings, set_guild_setting, get_guild_setting уже импортированы выше
 
 # Настройка путей для Flask
@@ -227,107 +204,42 @@ def inject_globals():
 
 DISCORD_API_BASE_URL = "https://discord.com/api/v10"
 
+# Общий keep-alive клиент Discord API: таймауты, повторы, лимиты по корзинам, статистика маршрутов
+from party_bot.discord_http import get_discord_http
+discord_http = get_discord_http()
+
+# Каналы/роли/участники: из кэша гейтвея бота в этом процессе, иначе REST с TTL-кэшем
+from party_bot.guild_metadata import GuildMetadataProvider
+guild_metadata = GuildMetadataProvider(lambda: bot_instance, discord_http, BOT_TOKEN)
+
+# Права в каналах: индекс масок ролей и оверрайдов на сервер + кэш по (сервер, пользователь, роли)
+from party_bot.permissions import PermissionEngine
+permission_engine = PermissionEngine()
+
+# Шина команд к боту: напрямую в цикл бота в общем процессе, иначе через command_bus.db
+from party_bot.command_bus import get_command_bus
+command_bus = get_command_bus()
+try:
+    COMMAND_WAIT_SECONDS = float(os.getenv("WEB_COMMAND_WAIT", "3"))
+except ValueError:
+    COMMAND_WAIT_SECONDS = 3.0
+
+# Фоновые задания (команды боту через шину): маршрут сразу отвечает id задания, клиент опрашивает /api/jobs/<id>
+from party_bot.web_jobs import get_job_manager
+web_jobs = get_job_manager()
+
 # ===================== DEFAULT SETTINGS LAYER =====================
-# Базовые дефолты для всех серверов. Любой отсутствующий ключ будет подставлен
-# чтобы шаблон не падал KeyError / AttributeError. Для вложенных структур используем merge.
-DEFAULT_SETTINGS = {
-    'monitoring_enabled': False,
-    'cleanup_enabled': False,
-    'reminders_enabled': False,
-    'reminder_time': [0, 15],  # [hours, minutes]
-    'event_creator_role': None,
-    'moderator_role': None,
-    'ping_role': 'everyone',
-    'monitored_channels': [],
-    # Вложенный блок рекрутинга (соответствует обращениям в шаблоне)
-    'recruit_settings': {
-        'default_role': None,
-        'recruit_role': None,
-        'guild_name': '',
-        'cooldown_hours': 1,
-        'points_moderator_roles': '',  # строка через запятую
-        'recruiter_roles': '',         # строка через запятую
-        'events_channel': None,
-        'shop_channel': None,
-        'forum_channel': None,
-        'points_panel_channel': None,
-        'recruit_panel_channel': None,
-        'points_start_date': '',
-        'points_end_date': ''
-    }
-}
-
-def deep_merge(defaults: dict, actual: dict) -> dict:
-    """Глубокое объединение: значения из actual перекрывают defaults, но структуры сохраняются.
-    Оба словаря не модифицируются (copy)."""
-    result = deepcopy(defaults)
-    if not isinstance(actual, dict):
-        return result
-    for k, v in actual.items():
-        if k in result and isinstance(result[k], dict) and isinstance(v, dict):
-            result[k] = deep_merge(result[k], v)
-        else:
-            result[k] = v
-    return result
+# Дефолты (DEFAULT_SETTINGS) и слияние живут в party_bot.settings_service
 
 def get_complete_guild_settings(guild_id: int) -> dict:
     """Возвращает полные настройки с применением дефолтов и безопасным блоком recruit_settings.
     Никогда не возвращает None. Гарантирует наличие всех ключей, ожидаемых шаблоном.
     """
     try:
-        raw = get_guild_settings(guild_id) or {}
+        return get_settings_service().get_complete(guild_id)
     except Exception as e:
         print(f"[SETTINGS] Ошибка загрузки настроек guild {guild_id}: {e}")
-        raw = {}
-
-    # Миграция: если в settings.db нет recruit_settings, но можно получить из legacy источников
-    if 'recruit_settings' not in raw or not raw.get('recruit_settings'):
-        migrated = None
-        # unified_settings как источник
-        if USE_UNIFIED_SETTINGS:
-            try:
-                unified = get_recruit_config(guild_id)
-                if isinstance(unified, dict) and unified:
-                    migrated = unified
-            except Exception:
-                pass
-        # EventDatabase fallback
-        if migrated is None and RECRUIT_DB_AVAILABLE:
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                migrated = loop.run_until_complete(get_recruit_settings(guild_id))
-                loop.close()
-            except Exception as e:
-                print(f"[Recruit Migration] fallback load failed: {e}")
-                migrated = None
-        if isinstance(migrated, dict) and migrated:
-            try:
-                set_guild_setting(guild_id, 'recruit_settings', migrated)
-                raw['recruit_settings'] = migrated
-                print(f"[Recruit Migration] guild {guild_id}: migrated legacy recruit settings into settings.db")
-            except Exception as e:
-                print(f"[Recruit Migration] save failed guild {guild_id}: {e}")
-
-    # recruit_settings может прийти как None / строка / др. Приводим к dict перед merge.
-    rs = raw.get('recruit_settings')
-    if not isinstance(rs, dict):
-        # Попытка распарсить если строка JSON
-        if isinstance(rs, str):
-            try:
-                parsed = json.loads(rs)
-                if isinstance(parsed, dict):
-                    rs = parsed
-                else:
-                    rs = {}
-            except Exception:
-                rs = {}
-        else:
-            rs = {}
-    raw['recruit_settings'] = rs
-
-    complete = deep_merge(DEFAULT_SETTINGS, raw)
-    return complete
+        return deep_merge(DEFAULT_SETTINGS, {})
 
 # ===================== ERROR HANDLERS =====================
 @app.errorhandler(500)
@@ -368,81 +280,18 @@ def handle_exception(e):
     return render_template('500.html'), 500
 
 # Функции для работы с настройками recruitment
-async def get_recruit_settings(guild_id):
+def get_recruit_settings(guild_id):
     """Получить настройки recruitment для гильдии"""
-    # 1. Основной источник теперь settings.db (ключ 'recruit_settings')
-    try:
-        base = get_guild_settings(int(guild_id)) or {}
-        rs = base.get('recruit_settings')
-        if isinstance(rs, str):
-            try:
-                import json as _json
-                parsed = _json.loads(rs)
-                if isinstance(parsed, dict):
-                    rs = parsed
-            except Exception:
-                rs = None
-        if isinstance(rs, dict):
-            return rs
-    except Exception as e:
-        print(f"[Recruit] read from settings.db failed: {e}")
-
-    # 2. Unified settings (если включено)
-    if USE_UNIFIED_SETTINGS:
-        try:
-            return get_recruit_config(guild_id) or {}
-        except Exception:
-            pass
+    return get_settings_service().get_recruit_settings(int(guild_id))
 
-    # 3. Старый EventDatabase как последний fallback
-    if RECRUIT_DB_AVAILABLE:
-        try:
-            config = await EventDatabase.get_guild_config(guild_id)
-            return config or {}
-        except Exception as e:
-            print(f"Ошибка получения настроек recruitment (fallback DB) {guild_id}: {e}")
-    return {}
-
-async def update_recruit_settings(guild_id, settings):
+def update_recruit_settings(guild_id, settings):
     """Обновить настройки recruitment для гильдии"""
-    guild_id_int = int(guild_id)
-    # 1. Пишем в settings.db под ключом 'recruit_settings'
     try:
-        current = get_guild_settings(guild_id_int) or {}
-        existing = current.get('recruit_settings')
-        if isinstance(existing, str):
-            try:
-                import json as _json
-                parsed = _json.loads(existing)
-                if isinstance(parsed, dict):
-                    existing = parsed
-            except Exception:
-                existing = {}
-        if not isinstance(existing, dict):
-            existing = {}
-        merged = {**existing, **settings}
-        set_guild_setting(guild_id_int, 'recruit_settings', merged)
-        success_primary = True
+        get_settings_service().update_recruit_settings(int(guild_id), settings)
+        return True
     except Exception as e:
-        print(f"[Recruit] primary save to settings.db failed: {e}")
-        success_primary = False
-
-    # 2. Синхронно обновляем unified_settings если включено (не критично)
-    if USE_UNIFIED_SETTINGS:
-        try:
-            update_recruit_config(guild_id_int, **settings)
-        except Exception as e:
-            print(f"[Recruit] unified_settings update failed: {e}")
-
-    # 3. Обновляем старую EventDatabase для обратной совместимости (best effort)
-    if RECRUIT_DB_AVAILABLE:
-        try:
-            # Асинхронная операция — выполняем реально
-            await EventDatabase.update_guild_config(guild_id_int, **settings)
-        except Exception as e:
-            print(f"[Recruit] legacy EventDatabase update failed: {e}")
-
-    return success_primary
+        print(f"[Recruit] save to settings.db failed: {e}")
+        return False
 
 async def get_event_submissions(guild_id, limit=50):
     """Получить заявки на события для гильдии"""
@@ -450,9 +299,7 @@ async def get_event_submissions(guild_id, limit=50):
         return []
     
     try:
-        import aiosqlite
-        db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "potatos_recruit.db")
-        async with aiosqlite.connect(db_path) as db:
+        async with recruit_connect() as db:
             cursor = await db.execute("""
                 SELECT id, submitter_id, event_type, action, group_size, base_points, 
                        status, created_at, description
@@ -488,9 +335,7 @@ async def get_shop_purchases(guild_id, limit=50):
         return []
     
     try:
-        import aiosqlite
-        db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "potatos_recruit.db")
-        async with aiosqlite.connect(db_path) as db:
+        async with recruit_connect() as db:
             cursor = await db.execute("""
                 SELECT id, user_id, item_name, points_cost, status, created_at
                 FROM shop_purchases 
@@ -522,9 +367,7 @@ async def get_user_points_leaderboard(guild_id, limit=20):
         return []
     
     try:
-        import aiosqlite
-        db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "potatos_recruit.db")
-        async with aiosqlite.connect(db_path) as db:
+        async with recruit_connect() as db:
             cursor = await db.execute("""
                 SELECT user_id, total_points, events_participated, last_updated
                 FROM user_points 
@@ -548,6 +391,17 @@ async def get_user_points_leaderboard(guild_id, limit=20):
         print(f"Ошибка получения таблицы лидеров для гильдии {guild_id}: {e}")
         return []
 
+async def _load_recruit_overview(guild_id, limit=None):
+    """Лидерборд, заявки и покупки гильдии одним вызовом (запросы идут параллельно)"""
+    if not RECRUIT_DB_AVAILABLE:
+        return [], [], []
+    kwargs = {'limit': limit} if limit else {}
+    return await asyncio.gather(
+        get_user_points_leaderboard(guild_id, **kwargs),
+        get_event_submissions(guild_id, **kwargs),
+        get_shop_purchases(guild_id, **kwargs),
+    )
+
 def user_has_permissions_session(user_guilds, bot_guilds, guild_id):
     """Проверить права с учетом сессии пользователя"""
     user_id = session.get('user', {}).get('id')
@@ -555,18 +409,22 @@ def user_has_permissions_session(user_guilds, bot_guilds, guild_id):
         return True
     return user_has_permissions(user_guilds, bot_guilds, guild_id, user_id)
 
-def get_user_guilds(access_token):
-    """Получить список серверов пользователя"""
+def _fetch_user_guilds(access_token):
     headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds", headers=headers)
+    response = discord_http.get("/users/@me/guilds", headers=headers)
     if response.status_code == 200:
         return response.json()
-    return []
+    return None
+
+def get_user_guilds(access_token):
+    """Получить список серверов пользователя (кэш по хэшу токена)"""
+    guilds = user_guilds_cache.get_or_load(token_key(access_token), lambda: _fetch_user_guilds(access_token))
+    return guilds if guilds is not None else []
 
 def get_user_guild_member(guild_id, access_token):
     """Получить информацию о участнике сервера с ролями"""
     headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds/{guild_id}/member", headers=headers)
+    response = discord_http.get(f"/users/@me/guilds/{guild_id}/member", headers=headers)
     if response.status_code == 200:
         return response.json()
     return None
@@ -593,6 +451,11 @@ def user_has_role(guild_id, user_id, role_id, access_token):
         print(f"Error checking role {role_id} for user {user_id} in guild {guild_id}: {e}")
         return False
 
+def get_role_name(guild_id, role_id, default="Роль"):
+    """Название роли сервера (кэш гейтвея бота или REST)"""
+    roles = guild_metadata.get_roles(guild_id) or []
+    return next((r.get('name') for r in roles if str(r.get('id')) == str(role_id)), default)
+
 def get_guild_event_creator_roles(guild_id):
     """Получить роли, которые могут создавать события"""
     try:
@@ -663,15 +526,11 @@ def guild_stats(guild_id):
 
     guild_info = next((g for g in user_guilds if g['id'] == guild_id), None)
     # Лидерборд, покупки, заявки
-    leaderboard = asyncio.run(get_user_points_leaderboard(int(guild_id), limit=20)) if RECRUIT_DB_AVAILABLE else []
-    submissions = asyncio.run(get_event_submissions(int(guild_id), limit=20)) if RECRUIT_DB_AVAILABLE else []
-    purchases = asyncio.run(get_shop_purchases(int(guild_id), limit=20)) if RECRUIT_DB_AVAILABLE else []
+    leaderboard, submissions, purchases = run_sync(_load_recruit_overview(int(guild_id), limit=20))
 
     # Активные события
     try:
-        import main
-        _SESS = main.ALL_SESSIONS
-        active_cnt = sum(1 for ev in _SESS.values() if ev.get('guild_id') == int(guild_id) and not ev.get('stopped'))
+        active_cnt = sum(1 for _, ev in get_guild_sessions(guild_id) if not ev.get('stopped'))
     except Exception:
         active_cnt = 0
 
@@ -684,8 +543,7 @@ def api_leaderboard(guild_id):
         return jsonify({'error': 'Recruit module unavailable'}), 501
     try:
         limit = int(request.args.get('limit', 10))
-        import asyncio
-        data = asyncio.run(EventDatabase.get_leaderboard(int(guild_id), limit))
+        data = run_sync(EventDatabase.get_leaderboard(int(guild_id), limit))
         items = [
             {
                 'user_id': user_id,
@@ -702,8 +560,7 @@ def api_user_balance(guild_id, user_id):
     if not RECRUIT_DB_AVAILABLE:
         return jsonify({'error': 'Recruit module unavailable'}), 501
     try:
-        import asyncio
-        points, events = asyncio.run(EventDatabase.get_user_points(int(guild_id), int(user_id)))
+        points, events = run_sync(EventDatabase.get_user_points(int(guild_id), int(user_id)))
         return jsonify({'user_id': int(user_id), 'points': points, 'events': events})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -713,8 +570,7 @@ def api_pending_submissions(guild_id):
     if not RECRUIT_DB_AVAILABLE:
         return jsonify({'error': 'Recruit module unavailable'}), 501
     try:
-        import asyncio
-        items = asyncio.run(EventDatabase.get_pending_submissions(int(guild_id)))
+        items = run_sync(EventDatabase.get_pending_submissions(int(guild_id)))
         return jsonify({'pending': items})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -729,8 +585,7 @@ def api_approve_submission(guild_id):
         multiplier = float(payload.get('multiplier', 1.0))
         reviewer_id = int(session.get('user', {}).get('id', 0) or 0)
 
-        import asyncio
-        ok = asyncio.run(EventDatabase.approve_event_submission(
+        ok = run_sync(EventDatabase.approve_event_submission(
             submission_id=submission_id,
             reviewer_id=reviewer_id,
             final_multiplier=multiplier
@@ -751,8 +606,7 @@ def api_reject_submission(guild_id):
         reason = payload.get('reason')
         reviewer_id = int(session.get('user', {}).get('id', 0) or 0)
 
-        import asyncio
-        ok = asyncio.run(EventDatabase.reject_event_submission(
+        ok = run_sync(EventDatabase.reject_event_submission(
             submission_id=submission_id,
             reviewer_id=reviewer_id,
             reason=reason
@@ -768,8 +622,7 @@ def api_get_submission_details(guild_id, submission_id):
     if not RECRUIT_DB_AVAILABLE:
         return jsonify({'error': 'Recruit module unavailable'}), 501
     try:
-        import asyncio
-        submission = asyncio.run(EventDatabase.get_submission_details(submission_id))
+        submission = run_sync(EventDatabase.get_submission_details(submission_id))
         if not submission:
             return jsonify({'error': 'Submission not found'}), 404
         return jsonify({'success': True, 'submission': submission})
@@ -786,9 +639,21 @@ def api_get_user_names(guild_id):
         if not user_ids:
             return jsonify({'success': True, 'users': []})
         
-        # Получаем бота из импорта
+        bot = get_bot_instance()
         if not bot:
-            return jsonify({'error': 'Bot not available'}), 503
+            # Бот не в этом процессе: участники через REST (кэш guild_metadata)
+            users = []
+            for user_id in user_ids:
+                member = guild_metadata.get_member(guild_id, user_id) or {}
+                user = member.get('user') or {}
+                username = user.get('username') or f'Пользователь {user_id}'
+                users.append({
+                    'id': user_id,
+                    'username': username,
+                    'display_name': member.get('nick') or user.get('global_name') or username,
+                    'avatar_url': f"https://cdn.discordapp.com/avatars/{user_id}/{user['avatar']}.png" if user.get('avatar') else None
+                })
+            return jsonify({'success': True, 'users': users})
         
         guild = bot.get_guild(int(guild_id))
         if not guild:
@@ -847,8 +712,7 @@ def api_pending_shop(guild_id):
     if not RECRUIT_DB_AVAILABLE:
         return jsonify({'error': 'Recruit module unavailable'}), 501
     try:
-        import asyncio
-        items = asyncio.run(EventDatabase.get_pending_purchases(int(guild_id)))
+        items = run_sync(EventDatabase.get_pending_purchases(int(guild_id)))
         return jsonify({'pending': items})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -862,8 +726,7 @@ def api_all_submissions(guild_id):
         status = request.args.get('status')  # pending, approved, rejected
         limit = int(request.args.get('limit', 50))
         
-        import asyncio
-        items = asyncio.run(EventDatabase.get_all_submissions(int(guild_id), status, limit))
+        items = run_sync(EventDatabase.get_all_submissions(int(guild_id), status, limit))
         return jsonify({'submissions': items, 'total': len(items)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -880,8 +743,7 @@ def api_process_shop(guild_id):
         completed = action.lower() in ('give', 'выдать', 'complete', 'ok', 'approve')
         admin_id = int(session.get('user', {}).get('id', 0) or 0)
 
-        import asyncio
-        ok = asyncio.run(EventDatabase.process_shop_purchase(
+        ok = run_sync(EventDatabase.process_shop_purchase(
             purchase_id=purchase_id,
             admin_id=admin_id,
             completed=completed,
@@ -917,21 +779,23 @@ def api_process_shop(guild_id):
             'last_updated': None
         }
 
-def get_bot_guilds():
-    """Получить список серверов бота"""
+def _fetch_bot_guilds():
     headers = {"Authorization": f"Bot {BOT_TOKEN}"}
-    response = requests.get(f"{DISCORD_API_BASE_URL}/users/@me/guilds", headers=headers)
+    response = discord_http.get("/users/@me/guilds", headers=headers)
     if response.status_code == 200:
         return response.json()
-    return []
+    return None
+
+def get_bot_guilds():
+    """Получить список серверов бота (кэш на процесс, сбрасывается при входе/выходе бота)"""
+    guilds = cached_bot_guilds(_fetch_bot_guilds)
+    return guilds if guilds is not None else []
 
 @app.route('/api/guild/<guild_id>/recruit-config')
 def api_guild_recruit_config(guild_id):
     """Диагностика: вернуть текущую конфигурацию рекрутинга из БД"""
-    if not RECRUIT_DB_AVAILABLE:
-        return jsonify({'error': 'Recruit module unavailable'}), 501
     try:
-        cfg = asyncio.run(EventDatabase.get_guild_config(int(guild_id)))
+        cfg = get_recruit_settings(guild_id)
         return jsonify({'guild_id': int(guild_id), 'config': cfg or {}})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1099,12 +963,10 @@ def get_guild_channels(guild_id, access_token):
     is_admin = (user_perms & PERM_ADMIN) != 0
     can_manage_guild = (user_perms & PERM_MANAGE_GUILD) != 0
 
-    headers = {"Authorization": f"Bot {BOT_TOKEN}"}
     # Список каналов
-    resp_ch = requests.get(f"{DISCORD_API_BASE_URL}/guilds/{guild_id}/channels", headers=headers)
-    if resp_ch.status_code != 200:
+    channels = guild_metadata.get_channels(guild_id)
+    if channels is None:
         return []
-    channels = resp_ch.json()
     text_channels = [ch for ch in channels if ch.get("type") == 0]
 
     # Если владелец/админ/управление сервером → все текстовые каналы
@@ -1120,70 +982,20 @@ def get_guild_channels(guild_id, access_token):
             return text_channels
 
         # Роли сервера
-        roles_resp = requests.get(f"{DISCORD_API_BASE_URL}/guilds/{guild_id}/roles", headers=headers)
-        if roles_resp.status_code != 200:
+        roles = guild_metadata.get_roles(guild_id)
+        if roles is None:
             return text_channels
-        roles = roles_resp.json()
-        roles_map = {str(r['id']): int(r.get('permissions', 0)) for r in roles}
 
         # Участник сервера
-        mem_resp = requests.get(f"{DISCORD_API_BASE_URL}/guilds/{guild_id}/members/{user_id}", headers=headers)
-        if mem_resp.status_code != 200:
+        member = guild_metadata.get_member(guild_id, user_id)
+        if member is None:
             return text_channels
-        member = mem_resp.json()
-        member_role_ids = [str(rid) for rid in member.get('roles', [])]
-
-        guild_id_str = str(guild_id)
-        everyone_perms = int(roles_map.get(guild_id_str, 0))  # @everyone id == guild_id
-
-        def compute_base_perms():
-            perms = everyone_perms
-            for rid in member_role_ids:
-                perms |= int(roles_map.get(rid, 0))
-            return perms
-
-        def apply_overwrites(perms: int, overwrites: list):
-            # Применяем по правилам Discord:
-            # 1) @everyone overwrite
-            # 2) role overwrites (суммарные deny, затем allow)
-            # 3) member overwrite
-            def _parse(bitstr):
-                try:
-                    return int(bitstr)
-                except Exception:
-                    return 0
-
-            # @everyone
-            for ow in overwrites:
-                if str(ow.get('id')) == guild_id_str:
-                    deny = _parse(ow.get('deny', '0'))
-                    allow = _parse(ow.get('allow', '0'))
-                    perms = (perms & ~deny) | allow
-
-            # roles
-            deny_sum = 0
-            allow_sum = 0
-            for ow in overwrites:
-                if ow.get('type') == 0 and str(ow.get('id')) in member_role_ids:
-                    deny_sum |= _parse(ow.get('deny', '0'))
-                    allow_sum |= _parse(ow.get('allow', '0'))
-            perms = (perms & ~deny_sum) | allow_sum
-
-            # member
-            for ow in overwrites:
-                if ow.get('type') == 1 and str(ow.get('id')) == str(user_id):
-                    deny = _parse(ow.get('deny', '0'))
-                    allow = _parse(ow.get('allow', '0'))
-                    perms = (perms & ~deny) | allow
-            return perms
-
-        allowed = []
-        for ch in text_channels:
-            perms = compute_base_perms()
-            perms = apply_overwrites(perms, ch.get('permission_overwrites', []) or [])
-            if (perms & PERM_VIEW_CHANNEL) and (perms & PERM_SEND_MESSAGES):
-                allowed.append(ch)
-        return allowed
+
+        # Маски ролей и оверрайды предрасчитаны на сервер, результат кэшируется по набору ролей
+        return permission_engine.allowed_channels(
+            guild_id, channels, roles, user_id, member.get('roles', []),
+            required=PERM_VIEW_CHANNEL | PERM_SEND_MESSAGES
+        )
     except Exception as e:
         # На случай отсутствия интентов/прав — возвращаем все текстовые каналы
         print(f"Permission calc fallback for guild {guild_id}: {e}")
@@ -1191,20 +1003,16 @@ def get_guild_channels(guild_id, access_token):
 
 def get_guild_forum_channels(guild_id, access_token):
     """Получить форум-каналы сервера"""
-    headers = {"Authorization": f"Bot {BOT_TOKEN}"}
-    response = requests.get(f"{DISCORD_API_BASE_URL}/guilds/{guild_id}/channels", headers=headers)
-    if response.status_code == 200:
-        channels = response.json()
+    channels = guild_metadata.get_channels(guild_id)
+    if channels is not None:
         # Фильтруем только форум-каналы (type == 15)
         return [ch for ch in channels if ch["type"] == 15]
     return []
 
 def get_guild_roles(guild_id, access_token=None):
     """Получить роли сервера"""
-    headers = {"Authorization": f"Bot {BOT_TOKEN}"}
-    response = requests.get(f"{DISCORD_API_BASE_URL}/guilds/{guild_id}/roles", headers=headers)
-    if response.status_code == 200:
-        roles = response.json()
+    roles = guild_metadata.get_roles(guild_id)
+    if roles is not None:
         # Фильтруем системные роли (@everyone и боты)
         return [role for role in roles if not role.get('managed') and role['name'] != '@everyone']
     return []
@@ -1293,7 +1101,7 @@ def callback():
     }
     
     try:
-        response = requests.post(f"{DISCORD_API_BASE_URL}/oauth2/token", data=data)
+        response = discord_http.post("/oauth2/token", data=data)
         if response.status_code != 200:
             error_data = response.json() if response.headers.get('content-type') == 'application/json' else {}
             error_msg = error_data.get('error_description', f'HTTP {response.status_code}')
@@ -1309,7 +1117,7 @@ def callback():
     # Получение информации о пользователе
     headers = {"Authorization": f"Bearer {access_token}"}
     try:
-        user_response = requests.get(f"{DISCORD_API_BASE_URL}/users/@me", headers=headers)
+        user_response = discord_http.get("/users/@me", headers=headers)
         if user_response.status_code != 200:
             flash('Ошибка получения данных пользователя', 'error')
             return redirect(url_for('index'))
@@ -1343,6 +1151,8 @@ def callback():
 
 @app.route('/logout')
 def logout():
+    if session.get('access_token'):
+        invalidate_user_guilds(session['access_token'])
     session.clear()
     flash('Вы вышли из системы', 'info')
     return redirect(url_for('index'))
@@ -1412,6 +1222,48 @@ def api_guilds():
         'bot_invite_url': bot_invite_url
     })
 
+@app.route('/api/commands/<command_id>')
+def api_command_status(command_id):
+    """Состояние команды, отправленной боту (pending/running/done/failed и результат)"""
+    if 'user' not in session:
+        return jsonify({'error': 'Не авторизован'}), 401
+    record = command_bus.get(command_id)
+    if record is None:
+        return jsonify({'error': 'Команда не найдена'}), 404
+    if str(record['payload'].get('creator_id')) != str(session['user'].get('id')):
+        return jsonify({'error': 'Нет прав доступа'}), 403
+    return jsonify({k: record[k] for k in ('id', 'type', 'status', 'result', 'error', 'attempts', 'created_at', 'finished_at')})
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Состояние фонового задания веб-панели (queued/running/done/failed/timeout и результат)"""
+    if 'user' not in session:
+        return jsonify({'error': 'Не авторизован'}), 401
+    job = web_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Задание не найдено'}), 404
+    if job['owner_id'] != str(session['user'].get('id')):
+        return jsonify({'error': 'Нет прав доступа'}), 403
+    return jsonify({k: job[k] for k in ('id', 'kind', 'status', 'result', 'error', 'attempts', 'created_at', 'finished_at')})
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Диагностика фонового цикла веба: число созданных циклов, задержки вызовов, пул БД.
+    Требует авторизации через сессию.
+    """
+    if 'user' not in session:
+        return jsonify({'error': 'Не авторизован'}), 401
+    return jsonify({
+        'async_bridge': get_async_bridge().get_stats(),
+        'recruit_db_pool': get_pool_stats() if RECRUIT_DB_AVAILABLE else {},
+        'guild_list_cache': get_cache_stats(),
+        'discord_http': discord_http.get_stats(),
+        'guild_metadata': guild_metadata.get_stats(),
+        'permissions': permission_engine.get_stats(),
+        'command_bus': command_bus.get_stats(),
+        'web_jobs': web_jobs.get_stats(),
+    })
+
 @app.route('/api/guilds_debug')
 def api_guilds_debug():
     """Диагностика категорий серверов и прав пользователя для отладки фильтрации.
@@ -1713,13 +1565,8 @@ def update_guild_settings(guild_id):
 
         # Принудительно сохраняем на диск изменения party-настроек
         try:
-            if USE_UNIFIED_SETTINGS:
-                # Настройки уже сохранены через unified_settings
-                print(f"[WEB] Party settings saved via unified_settings for guild {guild_id_int}")
-            else:
-                # Fallback - сохраняем через старую систему
-                save_all_data()
-                print(f"[WEB] Party settings saved via legacy system for guild {guild_id_int}")
+            save_all_data()
+            print(f"[WEB] Party settings saved via legacy system for guild {guild_id_int}")
         except Exception as e:
             print(f"[WEB] Error saving party settings for guild {guild_id_int}: {e}")
     
@@ -1786,10 +1633,7 @@ def update_guild_settings(guild_id):
     # Сохраняем настройки recruitment через settings.db
     if recruit_updates:
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            success = loop.run_until_complete(update_recruit_settings(guild_id_int, recruit_updates))
-            loop.close()
+            success = update_recruit_settings(guild_id_int, recruit_updates)
             print(f"[WEB] Recruit settings saved in settings.db for guild {guild_id_int}: {success}")
             if not success:
                 flash('Ошибка сохранения настроек рекрутинга!', 'error')
@@ -1832,19 +1676,13 @@ def api_party_settings(guild_id):
 def api_unified_settings(guild_id):
     """Диагностика: вернуть все настройки из единой системы"""
     try:
-        if USE_UNIFIED_SETTINGS:
-            guild_settings = unified_settings.get_guild_settings(int(guild_id))
-            return jsonify({
-                'guild_id': int(guild_id), 
-                'settings': guild_settings,
-                'source': 'unified_settings'
-            })
-        else:
-            return jsonify({
-                'guild_id': int(guild_id),
-                'error': 'Unified settings not available',
-                'source': 'legacy'
-            })
+        service = get_settings_service()
+        return jsonify({
+            'guild_id': int(guild_id),
+            'settings': service.get_settings(int(guild_id)),
+            'version': service.version(int(guild_id)),
+            'source': 'settings_service'
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1876,12 +1714,7 @@ def guild_recruit_management(guild_id):
     
     if RECRUIT_DB_AVAILABLE:
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            submissions = loop.run_until_complete(get_event_submissions(int(guild_id)))
-            purchases = loop.run_until_complete(get_shop_purchases(int(guild_id)))
-            user_points = loop.run_until_complete(get_user_points_leaderboard(int(guild_id)))
-            loop.close()
+            user_points, submissions, purchases = run_sync(_load_recruit_overview(int(guild_id)))
         except Exception as e:
             print(f"Ошибка загрузки данных recruitment: {e}")
     
@@ -2039,15 +1872,12 @@ def guild_events(guild_id):
     guild_info = next((g for g in user_guilds if g['id'] == guild_id), None)
     channels = get_guild_channels(guild_id, session['access_token'])
     templates = get_guild_templates(int(guild_id))
-    # Собираем активные и недавние события из ALL_SESSIONS
+    # Собираем активные и недавние события (память бота или events.db)
     try:
         active_events = []
         recent_events = []
-        import main; _SESS = main.ALL_SESSIONS
         now_ts = time.time()
-        for sid, ev in _SESS.items():
-            if ev.get('guild_id') != int(guild_id):
-                continue
+        for sid, ev in get_guild_sessions(guild_id):
             item = {
                 'id': sid,
                 'title': ev.get('title'),
@@ -2060,8 +1890,18 @@ def guild_events(guild_id):
                 active_events.append(item)
             else:
                 recent_events.append(item)
-        # ограничим историю
+        # ограничим историю, дополняя её из архива
         recent_events = recent_events[-10:]
+        if len(recent_events) < 10:
+            archived = _event_store().load_archived_events(int(guild_id), limit=10 - len(recent_events))
+            recent_events = [{
+                'id': str(eid),
+                'title': ev.get('title'),
+                'channel_id': ev.get('channel_id'),
+                'thread_id': ev.get('thread_id'),
+                'stopped': True,
+                'time': ev.get('time', ''),
+            } for eid, ev in sorted(archived.items())] + recent_events
     except Exception:
         active_events, recent_events = [], []
 
@@ -2072,6 +1912,53 @@ def guild_events(guild_id):
                          active_events=active_events,
                          recent_events=recent_events)
 
+def submit_bot_command(command_data):
+    """Отправить команду боту через шину команд и подождать результат (не дольше WEB_COMMAND_WAIT секунд).
+    Ключ идемпотентности берётся из заголовка Idempotency-Key или поля idempotency_key формы
+    (формы получают новый ключ при каждой отрисовке): повторная отправка той же формы
+    не создаст второе событие.
+    """
+    command_data = dict(command_data)
+    command_type = command_data.pop('type')
+    idempotency_key = (
+        request.headers.get('Idempotency-Key')
+        or request.form.get('idempotency_key')
+        or (request.get_json(silent=True) or {}).get('idempotency_key')
+    )
+    record = command_bus.submit(command_type, command_data, idempotency_key)
+    return command_bus.wait(record['id'], COMMAND_WAIT_SECONDS) or record
+
+def command_outcome(record, queued_message):
+    """(успех, сообщение) для пользователя по состоянию команды"""
+    if record['status'] == 'done':
+        result = record.get('result')
+        return True, result.get('message', queued_message) if isinstance(result, dict) else queued_message
+    if record['status'] == 'failed':
+        return False, f"Ошибка создания события: {record.get('error')}"
+    if record['status'] == 'timeout':
+        # Событие могло быть создано — не предлагаем повторить вслепую
+        return True, 'Бот не подтвердил создание вовремя. Проверьте канал, прежде чем создавать событие заново.'
+    return True, queued_message
+
+def wants_html():
+    """Запрос пришёл из обычной формы (ответ — редирект), а не из fetch"""
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return best == 'text/html' and not request.is_json
+
+def start_job(kind, payload, redirect_to=None, pending_message='Операция выполняется…'):
+    """Отправить боту команду kind фоновым заданием и сразу ответить.
+    fetch получает 202 с job_id (результат — через /api/jobs/<id>), форма — редирект на redirect_to?job=<id>.
+    """
+    job = web_jobs.submit(kind, payload, owner_id=session['user'].get('id'))
+    if redirect_to and wants_html():
+        flash(pending_message, 'info')
+        return redirect(f"{redirect_to}?job={job['id']}")
+    return jsonify({
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': url_for('api_job_status', job_id=job['id']),
+    }), 202
+
 @app.route('/guild/<guild_id>/events/create', methods=['POST'])
 def create_event_web(guild_id):
     if 'user' not in session:
@@ -2126,7 +2013,7 @@ def create_event_web(guild_id):
                 flash(error_msg, 'error')
                 return redirect(url_for('guild_events', guild_id=guild_id))
         
-        # Создаем команду для бота через файл очереди
+        # Создаем команду для бота (шина команд)
         command_data = {
             'type': 'create_event',
             'guild_id': int(guild_id),
@@ -2139,26 +2026,15 @@ def create_event_web(guild_id):
             'timestamp': time.time()
         }
         
-        # Сохраняем команду в файл очереди
-        queue_file = 'command_queue.json'
-        commands = []
-        if os.path.exists(queue_file):
-            try:
-                with open(queue_file, 'r', encoding='utf-8') as f:
-                    commands = json.load(f)
-            except:
-                commands = []
-        
-        commands.append(command_data)
-        
-        with open(queue_file, 'w', encoding='utf-8') as f:
-            json.dump(commands, f, ensure_ascii=False, indent=2)
-        
-        success_msg = f'Событие "{title}" поставлено в очередь на создание'
+        record = submit_bot_command(command_data)
+        ok, message = command_outcome(record, f'Событие "{title}" поставлено в очередь на создание')
         if request.is_json:
-            return jsonify({'success': True, 'message': success_msg})
+            payload = {'success': ok, 'message': message, 'command_id': record['id'], 'status': record['status']}
+            if not ok:
+                payload['error'] = message
+            return jsonify(payload), (200 if ok else 500)
         else:
-            flash(success_msg, 'success')
+            flash(message, 'success' if ok else 'error')
             return redirect(url_for('guild_events', guild_id=guild_id))
         
     except Exception as e:
@@ -2179,33 +2055,10 @@ def stop_event_web(guild_id, event_id):
         return jsonify({'error': 'No permissions'}), 403
     try:
         ev_id = int(event_id)
-        import main; _SESS = main.ALL_SESSIONS
-        if str(ev_id) not in _SESS:
+        if get_session(ev_id, include_archived=False) is None:
             return jsonify({'error': 'Event not found'}), 404
-        bot = get_bot_instance()
-        loop = bot.loop if bot else None
-        async def do_stop():
-            import main; ALL_SESSIONS = main.ALL_SESSIONS; save_all_data = main.save_all_data; save_event = main.save_event; update_party_message = main.update_party_message
-            session = ALL_SESSIONS.get(str(ev_id))
-            if not session:
-                return False
-            if session.get('stopped'):
-                return True
-            session['stopped'] = True
-            ALL_SESSIONS[str(ev_id)] = session
-            save_all_data()
-            save_event(ev_id, session)
-            try:
-                await update_party_message_web(ev_id)
-            except Exception:
-                pass
-            return True
-        if loop:
-            fut = asyncio.run_coroutine_threadsafe(do_stop(), loop)
-            ok = fut.result(timeout=10)
-        else:
-            ok = False
-        return jsonify({'success': bool(ok)})
+        return start_job('stop_event', {'event_id': ev_id},
+                         redirect_to=url_for('event_details', guild_id=guild_id, event_id=event_id))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2219,44 +2072,9 @@ def remind_event_web(guild_id, event_id):
         return jsonify({'error': 'No permissions'}), 403
     try:
         ev_id = int(event_id)
-        import main; _SESS = main.ALL_SESSIONS
-        if str(ev_id) not in _SESS:
+        if get_session(ev_id, include_archived=False) is None:
             return jsonify({'error': 'Event not found'}), 404
-        bot = get_bot_instance()
-        loop = bot.loop if bot else None
-        async def do_remind():
-            import main; ALL_SESSIONS = main.ALL_SESSIONS; _bot = main.bot
-            session = ALL_SESSIONS.get(str(ev_id))
-            if not session:
-                return False
-            guild = _bot.get_guild(session['guild_id'])
-            if not guild:
-                return False
-            channel = guild.get_channel(session['channel_id'])
-            if not channel:
-                return False
-            thread = None
-            if session.get('thread_id'):
-                thread = guild.get_thread(session['thread_id'])
-            mentions = []
-            for role in session.get('party_roles', []):
-                uid = role.get('user_id')
-                if uid:
-                    mentions.append(f"<@{uid}>")
-            if not mentions:
-                return 'no_participants'
-            text = "Напоминание: " + ", ".join(mentions)
-            target = thread or channel
-            await target.send(text, allowed_mentions=discord.AllowedMentions(users=True, roles=False, everyone=False))
-            return True
-        if loop:
-            fut = asyncio.run_coroutine_threadsafe(do_remind(), loop)
-            res = fut.result(timeout=10)
-        else:
-            res = False
-        if res == 'no_participants':
-            return jsonify({'success': True, 'message': 'Нет записавшихся участников для напоминания'})
-        return jsonify({'success': bool(res)})
+        return start_job('remind_event', {'event_id': ev_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2270,67 +2088,9 @@ def clone_event_web(guild_id, event_id):
         return jsonify({'error': 'No permissions'}), 403
     try:
         ev_id = int(event_id)
-        import main; _SESS = main.ALL_SESSIONS
-        if str(ev_id) not in _SESS:
+        if get_session(ev_id, include_archived=False) is None:
             return jsonify({'error': 'Event not found'}), 404
-        bot = get_bot_instance()
-        loop = bot.loop if bot else None
-        async def do_clone():
-            import main
-            ALL_SESSIONS = main.ALL_SESSIONS
-            _bot = main.bot
-            save_all_data = main.save_all_data
-            save_event = main.save_event
-            update_party_message = main.update_party_message
-            session = ALL_SESSIONS.get(str(ev_id))
-            if not session:
-                return None
-            guild = _bot.get_guild(session['guild_id'])
-            if not guild:
-                return None
-            channel = guild.get_channel(session['channel_id'])
-            if not channel:
-                return None
-            role_list = [r['name'] for r in session['party_roles']]
-            text = f"**{session['title']} (копия)**\n{session['description']}\n\n"
-            if session.get('time'):
-                text += f"**Время:** {session['time']}\n\n"
-            text += "**Роли:**\n" + "\n".join([f"{i+1}. {r} — Свободно" for i, r in enumerate(role_list)])
-            msg = await channel.send(text)
-            thread = await msg.create_thread(name=session['title'] + " (копия)")
-            new_session_id = msg.id
-            ALL_SESSIONS[str(new_session_id)] = {
-                'guild_id': session['guild_id'],
-                'channel_id': session['channel_id'],
-                'main_msg_id': msg.id,
-                'thread_id': thread.id,
-                'title': session['title'] + ' (копия)',
-                'description': session['description'],
-                'time': session.get('time', ''),
-                'party_roles': [{'name': r, 'user_id': None} for r in role_list],
-                'creator_id': session.get('creator_id'),
-                'stopped': False,
-                'last_reminder_time': 0
-            }
-            save_all_data()
-            save_event(new_session_id, ALL_SESSIONS[str(new_session_id)])
-            try:
-                await update_party_message_web(new_session_id)
-            except Exception:
-                pass
-            return {
-                'id': new_session_id,
-                'channel_id': session['channel_id'],
-                'url': f"https://discord.com/channels/{guild.id}/{session['channel_id']}/{new_session_id}"
-            }
-        if loop:
-            fut = asyncio.run_coroutine_threadsafe(do_clone(), loop)
-            res = fut.result(timeout=15)
-        else:
-            res = None
-        if not res:
-            return jsonify({'error': 'Clone failed'}), 500
-        return jsonify({'success': True, 'event': res})
+        return start_job('clone_event', {'event_id': ev_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2344,8 +2104,8 @@ def event_details(guild_id, event_id):
         flash('Нет прав доступа', 'error')
         return redirect(url_for('dashboard'))
     guild_info = next((g for g in user_guilds if g['id'] == guild_id), None)
-    import main; _SESS = main.ALL_SESSIONS
-    ev = _SESS.get(str(event_id)) or _SESS.get(str(int(event_id)))
+    # Остановленные давно ивенты лежат в архиве и подгружаются по запросу
+    ev = get_session(event_id)
     if not ev:
         return render_template('event_details.html', guild=guild_info, event=None, not_found=True), 404
     # Соберем ссылку на сообщение
@@ -2361,8 +2121,7 @@ def event_edit(guild_id, event_id):
     if not user_has_permissions_session(user_guilds, bot_guilds, guild_id):
         flash('Нет прав доступа', 'error')
         return redirect(url_for('dashboard'))
-    import main; _SESS = main.ALL_SESSIONS
-    ev = _SESS.get(str(event_id)) or _SESS.get(str(int(event_id)))
+    ev = get_session(event_id, include_archived=False)
     if not ev:
         flash('Событие не найдено', 'error')
         return redirect(url_for('guild_events', guild_id=guild_id))
@@ -2383,54 +2142,16 @@ def event_edit(guild_id, event_id):
         flash('Название обязательно', 'error')
         return redirect(url_for('event_edit', guild_id=guild_id, event_id=event_id))
 
-    # Применяем изменения внутри event loop бота
-    bot = get_bot_instance()
-    loop = bot.loop if bot else None
-    async def apply_edit():
-        import main; ALL_SESSIONS = main.ALL_SESSIONS; save_all_data = main.save_all_data; save_event = main.save_event; update_party_message = main.update_party_message
-        s = ALL_SESSIONS.get(str(event_id)) or ALL_SESSIONS.get(str(int(event_id)))
-        if not s:
-            return False
-        s['title'] = title
-        s['description'] = description
-        s['time'] = time_str
-        if roles_raw:
-            roles_list = [r.strip() for r in roles_raw.split('\n') if r.strip()]
-            if reset_roles:
-                s['party_roles'] = [{'name': r, 'user_id': None} for r in roles_list]
-            else:
-                # Попробуем сохранить назначения там, где имена совпали (по порядку)
-                old = s.get('party_roles', [])
-                new_list = []
-                for idx, name in enumerate(roles_list):
-                    uid = None
-                    if idx < len(old) and old[idx].get('name') == name:
-                        uid = old[idx].get('user_id')
-                    new_list.append({'name': name, 'user_id': uid})
-                s['party_roles'] = new_list
-        ALL_SESSIONS[str(s['main_msg_id'])] = s
-        save_all_data()
-        save_event(int(s['main_msg_id']), s)
-        try:
-            await update_party_message_web(int(s['main_msg_id']))
-        except Exception:
-            pass
-        return True
-
-    ok = False
-    try:
-        if loop:
-            fut = asyncio.run_coroutine_threadsafe(apply_edit(), loop)
-            ok = fut.result(timeout=10)
-    except Exception as e:
-        print(f"edit event error: {e}")
-        ok = False
-    if ok:
-        flash('Событие обновлено', 'success')
-        return redirect(url_for('event_details', guild_id=guild_id, event_id=event_id))
-    else:
-        flash('Не удалось обновить событие', 'error')
-        return redirect(url_for('event_edit', guild_id=guild_id, event_id=event_id))
+    # Изменения применяет бот (фоновое задание), итог покажет страница события
+    return start_job('edit_event', {
+        'event_id': int(event_id),
+        'title': title,
+        'description': description,
+        'time': time_str,
+        'roles': [r.strip() for r in roles_raw.split('\n') if r.strip()] if roles_raw else None,
+        'reset_roles': reset_roles,
+    }, redirect_to=url_for('event_details', guild_id=guild_id, event_id=event_id),
+       pending_message='Изменения события применяются…')
 
 @app.route('/guild/<guild_id>/events/guest')
 def guild_events_guest(guild_id):
@@ -2465,7 +2186,8 @@ def guild_events_guest(guild_id):
                          guild=guild_info,
                          channels=text_channels,
                          templates=templates,
-                         user=session['user'])
+                         user=session['user'],
+                         idempotency_key=uuid.uuid4().hex)
 
 @app.route('/guild/<guild_id>/events/guest/create', methods=['POST'])
 def create_event_guest(guild_id):
@@ -2528,7 +2250,7 @@ def create_event_guest(guild_id):
         user_name = session['user'].get('username', 'Участник')
         prefixed_title = f"[{user_name}] {title}"
         
-        # Создаем команду для бота через файл очереди
+        # Создаем команду для бота (шина команд)
         command_data = {
             'type': 'create_event',
             'guild_id': int(guild_id),
@@ -2542,26 +2264,15 @@ def create_event_guest(guild_id):
             'timestamp': time.time()
         }
         
-        # Сохраняем команду в файл очереди
-        queue_file = 'command_queue.json'
-        commands = []
-        if os.path.exists(queue_file):
-            try:
-                with open(queue_file, 'r', encoding='utf-8') as f:
-                    commands = json.load(f)
-            except:
-                commands = []
-        
-        commands.append(command_data)
-        
-        with open(queue_file, 'w', encoding='utf-8') as f:
-            json.dump(commands, f, ensure_ascii=False, indent=2)
-        
-        success_msg = f'Событие "{title}" отправлено на создание! Оно появится в канале через несколько секунд.'
+        record = submit_bot_command(command_data)
+        ok, message = command_outcome(record, f'Событие "{title}" отправлено на создание! Оно появится в канале через несколько секунд.')
         if request.is_json:
-            return jsonify({'success': True, 'message': success_msg})
+            payload = {'success': ok, 'message': message, 'command_id': record['id'], 'status': record['status']}
+            if not ok:
+                payload['error'] = message
+            return jsonify(payload), (200 if ok else 500)
         else:
-            flash(success_msg, 'success')
+            flash(message, 'success' if ok else 'error')
             return redirect(url_for('guild_events_guest', guild_id=guild_id))
         
     except Exception as e:
@@ -2603,14 +2314,7 @@ def guild_events_role(guild_id, role_id):
         return redirect(url_for('dashboard'))
     
     # Получаем информацию о роли
-    bot = get_bot_instance()
-    role_name = "Особая роль"
-    if bot:
-        guild_obj = bot.get_guild(int(guild_id))
-        if guild_obj:
-            role_obj = guild_obj.get_role(int(role_id))
-            if role_obj:
-                role_name = role_obj.name
+    role_name = get_role_name(guild_id, role_id, "Особая роль")
     
     # Получаем каналы и шаблоны для создания события
     channels = get_guild_channels(guild_id, access_token)
@@ -2622,10 +2326,8 @@ def guild_events_role(guild_id, role_id):
     # Получаем события, созданные пользователем с этой ролью
     try:
         user_events = []
-        import main; _SESS = main.ALL_SESSIONS
-        for sid, ev in _SESS.items():
-            if (ev.get('guild_id') == int(guild_id) and 
-                ev.get('creator_id') == int(user_id) and 
+        for sid, ev in get_guild_sessions(guild_id):
+            if (ev.get('creator_id') == int(user_id) and 
                 ev.get('creator_role_id') == int(role_id)):
                 user_events.append({
                     'id': sid,
@@ -2644,7 +2346,8 @@ def guild_events_role(guild_id, role_id):
                          user=session['user'],
                          role_name=role_name,
                          role_id=role_id,
-                         user_events=user_events)
+                         user_events=user_events,
+                         idempotency_key=uuid.uuid4().hex)
 
 @app.route('/guild/<guild_id>/events/role/<role_id>/create', methods=['POST'])
 def create_event_role(guild_id, role_id):
@@ -2712,19 +2415,12 @@ def create_event_role(guild_id, role_id):
                 return redirect(url_for('guild_events_role', guild_id=guild_id, role_id=role_id))
         
         # Получаем название роли для префикса
-        bot = get_bot_instance()
-        role_name = "Роль"
-        if bot:
-            guild_obj = bot.get_guild(int(guild_id))
-            if guild_obj:
-                role_obj = guild_obj.get_role(int(role_id))
-                if role_obj:
-                    role_name = role_obj.name
+        role_name = get_role_name(guild_id, role_id, "Роль")
         
         user_name = session['user'].get('username', 'Участник')
         prefixed_title = f"[{role_name}] {title}"
         
-        # Создаем команду для бота через файл очереди
+        # Создаем команду для бота (шина команд)
         command_data = {
             'type': 'create_event',
             'guild_id': int(guild_id),
@@ -2739,26 +2435,15 @@ def create_event_role(guild_id, role_id):
             'timestamp': time.time()
         }
         
-        # Сохраняем команду в файл очереди
-        queue_file = 'command_queue.json'
-        commands = []
-        if os.path.exists(queue_file):
-            try:
-                with open(queue_file, 'r', encoding='utf-8') as f:
-                    commands = json.load(f)
-            except:
-                commands = []
-        
-        commands.append(command_data)
-        
-        with open(queue_file, 'w', encoding='utf-8') as f:
-            json.dump(commands, f, ensure_ascii=False, indent=2)
-        
-        success_msg = f'Событие "{title}" отправлено на создание! Оно появится в канале через несколько секунд.'
+        record = submit_bot_command(command_data)
+        ok, message = command_outcome(record, f'Событие "{title}" отправлено на создание! Оно появится в канале через несколько секунд.')
         if request.is_json:
-            return jsonify({'success': True, 'message': success_msg})
+            payload = {'success': ok, 'message': message, 'command_id': record['id'], 'status': record['status']}
+            if not ok:
+                payload['error'] = message
+            return jsonify(payload), (200 if ok else 500)
         else:
-            flash(success_msg, 'success')
+            flash(message, 'success' if ok else 'error')
             return redirect(url_for('guild_events_role', guild_id=guild_id, role_id=role_id))
         
     except Exception as e:
@@ -2953,182 +2638,13 @@ def deploy_panels_api(guild_id):
         complete = get_complete_guild_settings(int(guild_id))
         recruit_settings = complete.get('recruit_settings', {})
         
-        success_panels = []
-        error_panels = []
-        
-        # Импортируем бота для получения каналов
-        import discord
-        from discord.ext import commands
-        
-        # Получаем guild из бота
-        bot_instance = get_bot_instance()
-        
-        if not bot_instance:
-            return jsonify({
-                'success': False, 
-                'message': 'Бот недоступен. Попробуйте использовать Discord команды.'
-            }), 500
-        
-        guild = bot_instance.get_guild(int(guild_id))
-        if not guild:
-            return jsonify({
-                'success': False, 
-                'message': 'Сервер не найден в боте'
-            }), 404
-        
-        success_panels = []
-        error_panels = []
-        
-        # Размещение панели набора
-        if panel_type in ["recruit", "both"]:
-            recruit_channel_id = recruit_settings.get('recruit_panel_channel')
-            if recruit_channel_id:
-                try:
-                    channel = guild.get_channel(int(recruit_channel_id))
-                    if channel:
-                        # Отправляем асинхронно с более надёжным обработчиком
-                        try:
-                            # Проверяем, что цикл работает
-                            loop = bot_instance.loop
-                            if not loop or loop.is_closed():
-                                raise Exception("Event loop бота не работает")
-
-                            # Создаем корутину, внутри которой инициализируем Embed/View
-                            async def send_panel():
-                                # Используем постоянную кнопку из recruit_bot с корректным custom_id и callback
-                                from recruit_bot.bot import PersistentApplyButtonView
-                                embed = discord.Embed(
-                                    title="📝 Заявка в гильдию",
-                                    description=(
-                                        "Нажмите кнопку ниже, чтобы отправить заявку.\n"
-                                        "Модераторы рассмотрят вашу заявку и свяжутся с вами."
-                                    ),
-                                    color=discord.Color.blue()
-                                )
-                                view = PersistentApplyButtonView(bot_instance)
-                                return await channel.send(embed=embed, view=view)
-
-                            # Выполняем в цикле бота с правильной обработкой
-                            if loop.is_running():
-                                future = asyncio.run_coroutine_threadsafe(send_panel(), loop)
-                                result = future.result(timeout=10)
-                                print(f"Панель набора размещена: {result.id}")
-                            else:
-                                result = loop.run_until_complete(send_panel())
-                                print(f"Панель набора размещена: {result.id}")
-
-                        except Exception as send_error:
-                            print(f"Ошибка отправки панели набора: {send_error}")
-                            raise send_error
-                        
-                        success_panels.append(f"Панель набора в #{channel.name}")
-                    else:
-                        error_panels.append("Панель набора (канал не найден)")
-                except Exception as e:
-                    error_panels.append(f"Панель набора ({str(e)})")
-                    print(f"Ошибка размещения панели набора: {e}")
-            else:
-                error_panels.append("Панель набора (канал не настроен)")
-        
-        # Размещение панели очков
-        if panel_type in ["points", "both"]:
-            points_channel_id = recruit_settings.get('points_panel_channel')
-            if points_channel_id:
-                try:
-                    channel = guild.get_channel(int(points_channel_id))
-                    if channel:
-                        try:
-                            # Проверяем, что цикл работает
-                            loop = bot_instance.loop
-                            if not loop or loop.is_closed():
-                                raise Exception("Event loop бота не работает")
-
-                            # Создаем корутину, внутри которой инициализируем Embed/View
-                            async def send_points_panel():
-                                # Полностью соответствуем панели из команды /events_panel
-                                from recruit_bot.ui_components import UnifiedEventView
-                                embed = discord.Embed(
-                                    title="🎯 Система событий и наград",
-                                    description=(
-                                        "**🎮 Добро пожаловать в систему событий Albion Online!**\n\n"
-                                        "Здесь вы можете:\n"
-                                        "🎯 **Подать заявку** на участие в событии\n"
-                                        "💰 **Проверить баланс** очков и историю\n"
-                                        "🛒 **Купить награды** за накопленные очки\n\n"
-                                        "**Доступные события:**\n"
-                                        "🕷️ Кристальные жуки (убийство) - 1 очко\n"
-                                        "🔵 Синие сферы (доставка) - 1.5 очка\n"
-                                        "🟣 Фиолетовые сферы (доставка) - 3 очка\n"
-                                        "🟡 Золотые сферы (доставка) - 5 очков\n"
-                                        "🌪️ Зеленые вихри (доставка) - 2 очка\n"
-                                        "🌀 Синие вихри (доставка) - 3 очка\n"
-                                        "🌊 Фиолетовые вихри (доставка) - 6 очков\n"
-                                        "💫 Золотые вихри (доставка) - 10 очков"
-                                    ),
-                                    color=discord.Color.blue()
-                                )
-                                embed.add_field(
-                                    name="🛒 Доступные награды",
-                                    value=(
-                                        "💰 **200k серебра** - 10 очков\n"
-                                        "🎲 **Рандомная вещь** - 30 очков\n"
-                                        "⚔️ **Комплект экипировки** - 50 очков"
-                                    ),
-                                    inline=False
-                                )
-                                embed.add_field(
-                                    name="ℹ️ Как это работает",
-                                    value=(
-                                        "1. Участвуйте в событиях и зарабатывайте очки\n"
-                                        "2. Модератор проверяет и начисляет очки\n"
-                                        "3. Обменивайте очки на награды в магазине\n"
-                                        "4. Получайте награды в игре от модераторов"
-                                    ),
-                                    inline=False
-                                )
-                                embed.set_footer(text="💡 Всегда прикладывайте скриншоты к заявкам!")
-
-                                view = UnifiedEventView()
-                                return await channel.send(embed=embed, view=view)
-
-                            # Выполняем в цикле бота с правильной обработкой
-                            if loop.is_running():
-                                future = asyncio.run_coroutine_threadsafe(send_points_panel(), loop)
-                                result = future.result(timeout=10)
-                                print(f"Панель очков размещена: {result.id}")
-                            else:
-                                result = loop.run_until_complete(send_points_panel())
-                                print(f"Панель очков размещена: {result.id}")
-
-                        except Exception as send_error:
-                            print(f"Ошибка отправки панели очков: {send_error}")
-                            raise send_error
-                        
-                        success_panels.append(f"Панель очков в #{channel.name}")
-                    else:
-                        error_panels.append("Панель очков (канал не найден)")
-                except Exception as e:
-                    error_panels.append(f"Панель очков ({str(e)})")
-                    print(f"Ошибка размещения панели очков: {e}")
-            else:
-                error_panels.append("Панель очков (канал не настроен)")
-        
-        # Формируем ответ
-        if success_panels and not error_panels:
-            return jsonify({
-                'success': True,
-                'message': f"✅ Успешно размещены: {', '.join(success_panels)}"
-            })
-        elif success_panels and error_panels:
-            return jsonify({
-                'success': True,
-                'message': f"✅ Размещены: {', '.join(success_panels)}. ❌ Ошибки: {', '.join(error_panels)}"
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': f"❌ Ошибки размещения: {', '.join(error_panels)}"
-            })
+        # Панели отправляет бот (фоновое задание); результат клиент получит через /api/jobs/<id>
+        return start_job('deploy_panels', {
+            'guild_id': int(guild_id),
+            'panel_type': panel_type,
+            'recruit_channel_id': recruit_settings.get('recruit_panel_channel'),
+            'points_channel_id': recruit_settings.get('points_panel_channel'),
+        })
             
     except Exception as e:
         print(f"Ошибка в deploy_panels_api: {e}")
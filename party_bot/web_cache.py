@@ -0,0 +1,178 @@
+"""
+Кэш списков серверов для веб-панели.
+Списки серверов пользователя (OAuth) и бота запрашиваются у Discord почти на
+каждой странице; здесь они живут TTL секунд. Одновременные промахи по одному
+ключу объединяются: запрос к Discord делает один поток, остальные ждут его
+результат (single-flight). Сбросы со стороны бота доходят до воркеров gunicorn
+через общие версии кэшей (cache_versions).
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from party_bot.cache_versions import get_shared_versions
+
+DEFAULT_USER_GUILDS_TTL = 60.0
+DEFAULT_BOT_GUILDS_TTL = 300.0
+DEFAULT_MAX_ENTRIES = 1000
+
+BOT_GUILDS_KEY = "bot"
+# Общая версия списка серверов бота
+BOT_GUILDS_VERSION_KEY = "bot_guilds"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class _Flight:
+    """Загрузка одного ключа, которую ждут остальные потоки"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    """Потокобезопасный TTL-кэш с объединением одновременных загрузок"""
+
+    def __init__(self, name: str, ttl: float, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, tuple] = {}  # key -> (expires_at, value)
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._versions: Dict[Hashable, Any] = {}  # key -> последняя увиденная внешняя версия
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "invalidations": 0,
+        }
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Значение из кэша или loader() (один на ключ при одновременных промахах).
+        Если loader вернул None, результат не кэшируется (ошибка Discord, 429 и т.п.).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            self.stats["loads"] += 1
+        except BaseException as e:
+            flight.error = e
+            self.stats["load_errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                # Инвалидация во время загрузки снимает полёт: такой результат не сохраняем
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                    if flight.error is None and flight.value is not None:
+                        self._store(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            # Сначала выбрасываем просроченные, затем ближайшие к истечению
+            for stale in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[stale]
+            if len(self._entries) >= self.max_entries:
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+        self._entries[key] = (now + self.ttl, value)
+
+    def invalidate(self, key: Hashable = None):
+        """Сбросить один ключ или весь кэш"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._flights.clear()
+            else:
+                self._entries.pop(key, None)
+                self._flights.pop(key, None)
+            self.stats["invalidations"] += 1
+
+    def check_version(self, key: Hashable, version: Any):
+        """Сбросить ключ, если его внешняя версия изменилась с прошлой проверки"""
+        with self._lock:
+            seen = self._versions.get(key)
+            self._versions[key] = version
+            if seen is None or seen == version:
+                return
+            self._entries.pop(key, None)
+            self._flights.pop(key, None)
+            self.stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def token_key(access_token: str) -> str:
+    """Ключ кэша по токену: в памяти хранится только хэш, не сам токен"""
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+# Глобальные кэши веб-процесса
+user_guilds_cache = TTLCache("user_guilds", _env_float("WEB_USER_GUILDS_TTL", DEFAULT_USER_GUILDS_TTL))
+bot_guilds_cache = TTLCache("bot_guilds", _env_float("WEB_BOT_GUILDS_TTL", DEFAULT_BOT_GUILDS_TTL))
+
+
+def invalidate_user_guilds(access_token: str = None):
+    """Сбросить список серверов пользователя (или всех пользователей)"""
+    user_guilds_cache.invalidate(token_key(access_token) if access_token else None)
+
+
+def invalidate_bot_guilds():
+    """Сбросить список серверов бота (бот добавлен на сервер или удалён с него).
+    Пишет общую версию в SQLite — из цикла бота вызывать через STORAGE.run.
+    """
+    bot_guilds_cache.invalidate(BOT_GUILDS_KEY)
+    get_shared_versions().bump(BOT_GUILDS_VERSION_KEY)
+
+
+def get_bot_guilds(loader: Callable[[], Any]) -> Any:
+    """Список серверов бота из кэша (сброшенного, если бот сменил общую версию)"""
+    bot_guilds_cache.check_version(BOT_GUILDS_KEY, get_shared_versions().get(BOT_GUILDS_VERSION_KEY))
+    return bot_guilds_cache.get_or_load(BOT_GUILDS_KEY, loader)
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        "user_guilds": user_guilds_cache.get_stats(),
+        "bot_guilds": bot_guilds_cache.get_stats(),
+        "shared_versions": get_shared_versions().get_stats(),
+    }
@@ -0,0 +1,106 @@
+"""
+Фоновые задания веб-панели.
+Действие с ботом (остановка, клон, напоминание, правка, панели) уходит
+боту командой через шину команд, а маршрут сразу возвращает id задания;
+поток Flask не ждёт Discord. Клиент опрашивает /api/jobs/<id>, пока
+задание не завершится.
+
+Состояние задания — это запись команды в шине: при нескольких воркерах
+gunicorn опрос может прийти в любой из них. Гистограммы времени
+выполнения по видам заданий шина считает по command_bus.db, поэтому
+/api/metrics показывает их в любом воркере.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from party_bot.command_bus import CommandBus, get_command_bus
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+# Бот не подтвердил выполнение вовремя: итог ещё может появиться
+STATUS_TIMEOUT = "timeout"
+
+# Статус команды -> статус задания
+_COMMAND_STATUSES = {"pending": STATUS_QUEUED}
+
+
+class JobManager:
+    """Задания поверх шины команд: постановка из потока Flask, состояние по id"""
+
+    def __init__(self, bus: CommandBus = None):
+        self._bus = bus
+        self._lock = threading.Lock()
+        self.stats = {
+            "submitted": 0,
+            "submit_errors": 0,
+            # Время потока Flask на постановку задания
+            "submit_ms_total": 0.0,
+            "submit_ms_max": 0.0,
+        }
+
+    @property
+    def bus(self) -> CommandBus:
+        if self._bus is None:
+            self._bus = get_command_bus()
+        return self._bus
+
+    def submit(self, kind: str, payload: Dict[str, Any], owner_id: Any = None) -> Dict[str, Any]:
+        """Отправить задание боту; вернуть снимок задания (не ждёт выполнения)"""
+        started = time.perf_counter()
+        payload = dict(payload, requested_by=str(owner_id) if owner_id is not None else None)
+        try:
+            record = self.bus.submit(kind, payload)
+        except Exception:
+            with self._lock:
+                self.stats["submit_errors"] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.stats["submitted"] += 1
+            self.stats["submit_ms_total"] += elapsed_ms
+            self.stats["submit_ms_max"] = max(self.stats["submit_ms_max"], elapsed_ms)
+        return self._to_job(record)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Снимок задания (None — неизвестно или уже удалено)"""
+        record = self.bus.get(job_id)
+        return self._to_job(record) if record is not None else None
+
+    @staticmethod
+    def _to_job(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": record["id"],
+            "kind": record["type"],
+            "status": _COMMAND_STATUSES.get(record["status"], record["status"]),
+            "result": record["result"],
+            "error": record["error"],
+            "owner_id": (record["payload"] or {}).get("requested_by"),
+            "attempts": record["attempts"],
+            "created_at": record["created_at"],
+            "finished_at": record["finished_at"],
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["submit_ms_avg"] = stats["submit_ms_total"] / max(stats["submitted"], 1)
+        return stats
+
+
+# Глобальный экземпляр для быстрого доступа
+_jobs_instance: Optional[JobManager] = None
+_jobs_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Получить менеджер заданий веб-процесса"""
+    global _jobs_instance
+    if _jobs_instance is None:
+        with _jobs_lock:
+            if _jobs_instance is None:
+                _jobs_instance = JobManager()
+    return _jobs_instance
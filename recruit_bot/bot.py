@@ -19,17 +19,13 @@ from dotenv import load_dotenv
 from .database import EventDatabase, DB_PATH
 from .ui_components import PersistentEventSubmitView, UnifiedEventView, ResetPointsConfirmationView
 
-# Пытаемся импортировать единую систему настроек для авто-настройки
-try:
-    from ..unified_settings import unified_settings as _unified_settings
-except Exception:
-    _unified_settings = None
 from .events import EventManager, ShopManager
 
 # Импорт унифицированной системы настроек
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from unified_settings import UnifiedSettings
+from party_bot.settings_service import get_settings_service
 
 # ─── Логирование ───────────────────────────────────────────────────────────────
 logging.basicConfig(
@@ -212,6 +208,7 @@ async def init_db():
     async with aiosqlite.connect(DB_PATH) as db:
         await db.executescript(
             """
+            -- guild_config оставлена только для миграции в settings.db
             CREATE TABLE IF NOT EXISTS guild_config (
                 guild_id           INTEGER PRIMARY KEY,
                 default_role       INTEGER,
@@ -670,85 +667,10 @@ class ApplyButton(ui.Button):
     async def callback(self, interaction: discord.Interaction):
         try:
             logger.info(f"[ApplyButton] interaction from {interaction.user} in guild {interaction.guild.id}")
-            # 1) Пытаемся собрать конфиг максимально быстро из unified_settings
-            cfg = None
-            forum_id = None
-            apply_channel_id = None
-            if _unified_settings is not None:
-                try:
-                    # Базовые recruit-настройки
-                    rs = _unified_settings.get_recruit_settings(interaction.guild.id) or {}
-                    # Фоллбэк: если нужных полей нет, берем party.recruit_settings и дополняем
-                    try:
-                        guild_all = _unified_settings.get_guild_settings(interaction.guild.id)
-                        party_rs = (guild_all or {}).get("party", {}).get("recruit_settings", {}) or {}
-                        # Не затираем существующие, только добавляем отсутствующие
-                        for k, v in party_rs.items():
-                            if k not in rs or rs.get(k) in (None, "", []):
-                                rs[k] = v
-                    except Exception:
-                        pass
-                    def _to_int(val):
-                        try:
-                            return int(val) if val is not None else None
-                        except Exception:
-                            return None
-                    forum_id = _to_int(rs.get("forum_channel"))
-                    apply_channel_id = _to_int(rs.get("recruit_panel_channel") or rs.get("apply_channel_id"))
-                    if forum_id and apply_channel_id:
-                        cfg = {
-                            "default_role": rs.get("default_role"),
-                            "recruit_role": rs.get("recruit_role"),
-                            "recruiter_roles": rs.get("recruiter_roles"),
-                            "forum_id": forum_id,
-                            "apply_channel_id": apply_channel_id,
-                            "guild_name": rs.get("guild_name", ""),
-                            "cooldown_hours": rs.get("cooldown_hours", 1),
-                        }
-                        # Фоновый апсерт в БД
-                        async def _upsert_cfg():
-                            try:
-                                import aiosqlite
-                                from .database import DB_PATH
-                                async with aiosqlite.connect(DB_PATH) as db:
-                                    await db.execute(
-                                        """
-                                        INSERT INTO guild_config (
-                                            guild_id, default_role, recruit_role, recruiter_roles,
-                                            forum_id, apply_channel_id, guild_name, cooldown_hours
-                                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                        ON CONFLICT(guild_id) DO UPDATE SET
-                                            default_role     = excluded.default_role,
-                                            recruit_role     = excluded.recruit_role,
-                                            recruiter_roles  = excluded.recruiter_roles,
-                                            forum_id         = excluded.forum_id,
-                                            apply_channel_id = excluded.apply_channel_id,
-                                            guild_name       = excluded.guild_name,
-                                            cooldown_hours   = excluded.cooldown_hours
-                                        """,
-                                        (
-                                            interaction.guild_id,
-                                            str(cfg.get("default_role")) if cfg.get("default_role") else None,
-                                            str(cfg.get("recruit_role")) if cfg.get("recruit_role") else None,
-                                            str(cfg.get("recruiter_roles")) if cfg.get("recruiter_roles") is not None else None,
-                                            forum_id,
-                                            apply_channel_id,
-                                            cfg.get("guild_name", ""),
-                                            int(cfg.get("cooldown_hours", 1)),
-                                        ),
-                                    )
-                                    await db.commit()
-                            except Exception:
-                                pass
-                        self.bot.loop.create_task(_upsert_cfg())
-                except Exception:
-                    cfg = None
+            # 1) Конфигурация из единого сервиса настроек
+            cfg = await RecruitCog(self.bot)._get_cfg(interaction.guild.id)
 
-            # 2) Если unified_settings недостаточно, быстро читаем из БД
-            if not cfg:
-                cfg = await RecruitCog(self.bot)._get_cfg(interaction.guild.id)
-
-            # 3) Если форум не задан — предложим выбрать его интерактивно
+            # 2) Если форум не задан — предложим выбрать его интерактивно
             if not cfg or not cfg.get("forum_id"):
                 # Ищем доступные forum-каналы
                 forum_channels = [ch for ch in interaction.guild.channels if isinstance(ch, discord.ForumChannel)]
@@ -770,33 +692,15 @@ class ApplyButton(ui.Button):
                     async def callback(self, select_interaction: discord.Interaction):
                         try:
                             chosen_id = int(self.values[0])
-                            # Сохраняем в unified_settings (и дублируем в БД асинхронно)
-                            if _unified_settings is not None:
-                                rs = _unified_settings.get_recruit_settings(select_interaction.guild.id)
-                                rs["forum_channel"] = str(chosen_id)
-                                _unified_settings.update_recruit_settings(select_interaction.guild.id, rs)
+                            guild_id = select_interaction.guild.id
 
-                            async def _upsert_forum():
-                                try:
-                                    import aiosqlite
-                                    from .database import DB_PATH
-                                    async with aiosqlite.connect(DB_PATH) as db:
-                                        await db.execute(
-                                            """
-                                            INSERT INTO guild_config (guild_id, forum_id)
-                                            VALUES (?, ?)
-                                            ON CONFLICT(guild_id) DO UPDATE SET forum_id = excluded.forum_id
-                                            """,
-                                            (select_interaction.guild_id, chosen_id),
-                                        )
-                                        await db.commit()
-                                except Exception:
-                                    pass
+                            def _save_forum():
+                                service = get_settings_service()
+                                service.update_recruit_settings(guild_id, {"forum_channel": str(chosen_id)})
+                                return service.get_recruit_settings(guild_id)
 
-                            self.bot.loop.create_task(_upsert_forum())
-
-                            # Формируем cfg и открываем модалку
-                            rs2 = _unified_settings.get_recruit_settings(select_interaction.guild.id) if _unified_settings else {}
+                            # Сохраняем форум и формируем cfg (sqlite — в потоке), затем открываем модалку
+                            rs2 = await asyncio.to_thread(_save_forum)
                             def _to_int(val):
                                 try:
                                     return int(val) if val is not None else None
@@ -2232,44 +2136,26 @@ class RecruitCog(commands.Cog):
             await init_db()
         except Exception:
             pass
-        async with aiosqlite.connect(DB_PATH) as db:
-            cur = await db.execute(
-                """
-                SELECT default_role, recruit_role, recruiter_roles, forum_id, apply_channel_id, guild_name, cooldown_hours
-                  FROM guild_config
-                 WHERE guild_id = ?
-                """,
-                (guild_id,),
-            )
-            row = await cur.fetchone()
-            await cur.close()
+        # Конфигурация — блок recruit_settings единого сервиса настроек
+        # (guild_config перенесён в settings.db и больше не используется)
+        rs = await asyncio.to_thread(lambda: get_settings_service().get_recruit_settings(guild_id))
+        if not rs:
+            return None
 
-        if not row:
-            # Фоллбэк к unified_settings
+        def _to_int(val):
             try:
-                rs = _unified_settings.get_recruit_settings(guild_id) if _unified_settings else None
-            except Exception:
-                rs = None
-            if rs:
-                return {
-                    "default_role": rs.get("default_role"),
-                    "recruit_role": rs.get("recruit_role"),
-                    "recruiter_roles": rs.get("recruiter_roles"),
-                    "forum_id": rs.get("forum_channel"),
-                    "apply_channel_id": rs.get("recruit_panel_channel") or rs.get("apply_channel_id"),
-                    "guild_name": rs.get("guild_name", ""),
-                    "cooldown_hours": rs.get("cooldown_hours", 1),
-                }
-            return None
+                return int(val) if val not in (None, "") else None
+            except (TypeError, ValueError):
+                return None
 
-        default_role, recruit_role, recruiter_roles_csv, forum_id, apply_channel_id, guild_name, cooldown_hours = row
+        cooldown_hours = rs.get("cooldown_hours")
         return {
-            "default_role": default_role,
-            "recruit_role": recruit_role,
-            "recruiter_roles": comma_split(recruiter_roles_csv),
-            "forum_id": forum_id,
-            "apply_channel_id": apply_channel_id,
-            "guild_name": guild_name,
+            "default_role": _to_int(rs.get("default_role")),
+            "recruit_role": _to_int(rs.get("recruit_role")),
+            "recruiter_roles": comma_split(rs.get("recruiter_roles")),
+            "forum_id": _to_int(rs.get("forum_channel")),
+            "apply_channel_id": _to_int(rs.get("recruit_panel_channel") or rs.get("apply_channel_id")),
+            "guild_name": rs.get("guild_name", ""),
             "cooldown_hours": cooldown_hours if cooldown_hours is not None else 1,  # По умолчанию 1 час только если NULL
         }
 
@@ -4,8 +4,10 @@
 """
 
 import aiosqlite
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 from typing import List, Optional, Dict, Tuple
 from datetime import datetime, timezone
 from .events import EventType, EventAction, EventSubmission
@@ -15,13 +17,118 @@ logger = logging.getLogger("potatos_recruit.database")
 # Используем абсолютный путь к базе данных в корне проекта
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "potatos_recruit.db")
 
+# Размер пула соединений на цикл событий и ожидание блокировки БД, с
+try:
+    POOL_SIZE = max(int(os.getenv("RECRUIT_DB_POOL_SIZE", "4")), 1)
+except ValueError:
+    POOL_SIZE = 4
+BUSY_TIMEOUT = 5.0
+
+
+class ConnectionPool:
+    """Постоянные aiosqlite-соединения одного цикла событий.
+    Соединение выдаётся монопольно на время блока async with, поэтому
+    транзакции разных корутин не перемешиваются. Незафиксированная
+    транзакция при возврате откатывается — как при закрытии соединения.
+    """
+
+    def __init__(self, db_path: str, size: int = POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        # Очередь создаётся в цикле пула при первом обращении
+        self._idle: Optional[asyncio.Queue] = None
+        self._opened = 0
+        self.stats = {"pool_acquires": 0, "pool_waits": 0, "pool_connections_opened": 0, "pool_discarded": 0}
+
+    async def _open(self) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.db_path, timeout=BUSY_TIMEOUT)
+        # WAL: читатели не ждут писателя
+        await db.execute("PRAGMA journal_mode = WAL")
+        await db.execute("PRAGMA synchronous = NORMAL")
+        self.stats["pool_connections_opened"] += 1
+        return db
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.stats["pool_acquires"] += 1
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        if self._idle.empty() and self._opened < self.size:
+            self._opened += 1
+            try:
+                db = await self._open()
+            except Exception:
+                self._opened -= 1
+                raise
+        else:
+            if self._idle.empty():
+                self.stats["pool_waits"] += 1
+            db = await self._idle.get()
+        try:
+            yield db
+        finally:
+            await self._release(db)
+
+    async def _release(self, db: aiosqlite.Connection):
+        try:
+            if db.in_transaction:
+                await db.rollback()
+        except Exception:
+            # Соединение сломано — закрываем, следующее откроется заново
+            self._opened -= 1
+            self.stats["pool_discarded"] += 1
+            try:
+                await db.close()
+            except Exception:
+                pass
+            return
+        self._idle.put_nowait(db)
+
+    async def close(self):
+        while self._idle is not None and not self._idle.empty():
+            db = self._idle.get_nowait()
+            self._opened -= 1
+            await db.close()
+
+
+# Пулы долгоживущих циклов: бота и веб-моста (party_bot.async_bridge)
+_pools: Dict[asyncio.AbstractEventLoop, ConnectionPool] = {}
+
+
+def enable_pool(loop: asyncio.AbstractEventLoop = None):
+    """Включить пул соединений для долгоживущего цикла событий"""
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    if loop not in _pools:
+        _pools[loop] = ConnectionPool(DB_PATH)
+
+
+def connect():
+    """Соединение из пула текущего цикла (вместо aiosqlite.connect на каждый вызов).
+    В коротком цикле без пула (asyncio.run в скриптах) — отдельное соединение, как раньше.
+    """
+    pool = _pools.get(asyncio.get_running_loop())
+    if pool is None:
+        return aiosqlite.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+    return pool.acquire()
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """Суммарная статистика пулов всех живых циклов"""
+    totals = {"pool_loops": 0}
+    for pool in list(_pools.values()):
+        totals["pool_loops"] += 1
+        for key, value in pool.stats.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
 class EventDatabase:
     """Класс для работы с базой данных событий"""
     
     @staticmethod
     async def init_event_tables():
         """Инициализация таблиц для системы событий"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             await db.executescript("""
                 -- Таблица для хранения заявок на события
                 CREATE TABLE IF NOT EXISTS event_submissions (
@@ -97,7 +204,8 @@ class EventDatabase:
                 CREATE INDEX IF NOT EXISTS idx_shop_purchases_user 
                 ON shop_purchases (user_id);
                 
-                -- Таблица конфигурации гильдий
+                -- Таблица конфигурации гильдий: оставлена только для миграции
+                -- в settings.db (старые базы дополняются колонками ниже)
                 CREATE TABLE IF NOT EXISTS guild_config (
                     guild_id INTEGER PRIMARY KEY,
                     admin_role TEXT,
@@ -190,7 +298,7 @@ class EventDatabase:
         points_cost: int
     ) -> bool:
         """Создать покупку в магазине"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             # Проверяем баланс пользователя
             cursor = await db.execute("""
                 SELECT total_points FROM user_points 
@@ -238,7 +346,7 @@ class EventDatabase:
     @staticmethod
     async def get_latest_purchase_id(guild_id: int, user_id: int) -> int:
         """Получить ID последней покупки пользователя"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT id FROM shop_purchases 
                 WHERE guild_id = ? AND user_id = ? AND status = 'pending'
@@ -252,7 +360,7 @@ class EventDatabase:
     @staticmethod
     async def get_purchase_by_id(purchase_id: int) -> dict:
         """Получить данные покупки по ID"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT guild_id, user_id, item_id, item_name, points_cost, status, created_at
                 FROM shop_purchases 
@@ -275,7 +383,7 @@ class EventDatabase:
     @staticmethod
     async def get_pending_purchases(guild_id: int) -> List[Dict]:
         """Получить список ожидающих покупок"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT id, user_id, item_id, item_name, points_cost, created_at
                 FROM shop_purchases 
@@ -304,7 +412,7 @@ class EventDatabase:
         admin_notes: str = None
     ) -> bool:
         """Обработать покупку (выдать или отклонить)"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT guild_id, user_id, points_cost, status 
                 FROM shop_purchases 
@@ -362,7 +470,7 @@ class EventDatabase:
         limit: int = 10
     ) -> List[Dict]:
         """Получить историю покупок пользователя"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT item_name, points_cost, status, created_at, processed_at, admin_notes
                 FROM shop_purchases 
@@ -393,7 +501,7 @@ class EventDatabase:
         original_channel_id: Optional[int] = None
     ) -> int:
         """Создать заявку на событие"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             # Создаем основную заявку
             cursor = await db.execute("""
                 INSERT INTO event_submissions (
@@ -436,7 +544,7 @@ class EventDatabase:
         final_multiplier: float
     ) -> bool:
         """Одобрить заявку и начислить очки"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             # Получаем данные заявки
             cursor = await db.execute("""
                 SELECT guild_id, base_points, group_size, status
@@ -506,7 +614,7 @@ class EventDatabase:
         reason: Optional[str] = None
     ) -> bool:
         """Отклонить заявку"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT status FROM event_submissions WHERE id = ?
             """, (submission_id,))
@@ -527,7 +635,7 @@ class EventDatabase:
                 WHERE id = ?
             """, (
                 reviewer_id,
-                f"{reason}\n---\n{await EventDatabase._get_submission_description(submission_id)}" if reason else None,
+                f"{reason}\n---\n{await EventDatabase._get_submission_description(submission_id, db)}" if reason else None,
                 datetime.now(timezone.utc).isoformat(),
                 submission_id
             ))
@@ -544,7 +652,7 @@ class EventDatabase:
         final_points_per_person: float = None
     ) -> bool:
         """Обновить статус заявки"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             # Получаем данные заявки
             cursor = await db.execute("""
                 SELECT guild_id, status FROM event_submissions WHERE id = ?
@@ -593,7 +701,7 @@ class EventDatabase:
     @staticmethod
     async def get_submission_participants(submission_id: int) -> List[int]:
         """Получить список участников заявки"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT user_id FROM event_participants WHERE submission_id = ?
             """, (submission_id,))
@@ -604,7 +712,7 @@ class EventDatabase:
     @staticmethod
     async def get_user_points(guild_id: int, user_id: int) -> Tuple[float, int]:
         """Получить очки и количество событий пользователя"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT total_points, events_participated 
                 FROM user_points 
@@ -620,7 +728,7 @@ class EventDatabase:
     async def add_user_points(guild_id: int, user_id: int, points: float, reason: str = None) -> bool:
         """Добавить очки пользователю"""
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
+            async with connect() as db:
                 await EventDatabase._update_user_points(db, guild_id, user_id, points)
                 await db.commit()
                 logger.info(f"Добавлено {points} очков пользователю {user_id} в гильдии {guild_id}" + (f" (причина: {reason})" if reason else ""))
@@ -633,7 +741,7 @@ class EventDatabase:
     async def set_user_points(guild_id: int, user_id: int, points: float, reason: str = None) -> bool:
         """Установить точное количество очков пользователю"""
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
+            async with connect() as db:
                 # Проверяем, есть ли запись пользователя
                 cursor = await db.execute("""
                     SELECT total_points FROM user_points 
@@ -667,7 +775,7 @@ class EventDatabase:
     async def reset_all_points(guild_id: int) -> bool:
         """Обнулить очки всем пользователям в гильдии"""
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
+            async with connect() as db:
                 cursor = await db.execute("""
                     SELECT COUNT(*) FROM user_points WHERE guild_id = ? AND total_points > 0
                 """, (guild_id,))
@@ -691,7 +799,7 @@ class EventDatabase:
     @staticmethod
     async def get_leaderboard(guild_id: int, limit: int = 10) -> List[Tuple[int, float, int]]:
         """Получить топ пользователей по очкам"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT user_id, total_points, events_participated
                 FROM user_points 
@@ -705,7 +813,7 @@ class EventDatabase:
     @staticmethod
     async def get_pending_submissions(guild_id: int) -> List[Dict]:
         """Получить список ожидающих заявок"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT es.id, es.submitter_id, es.event_type, es.action,
                        es.group_size, es.base_points, es.created_at, es.thread_id,
@@ -739,7 +847,7 @@ class EventDatabase:
     @staticmethod
     async def get_all_submissions(guild_id: int, status: str = None, limit: int = 50) -> List[Dict]:
         """Получить список всех заявок с фильтрацией"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             if status:
                 cursor = await db.execute("""
                     SELECT es.id, es.submitter_id, es.event_type, es.action,
@@ -791,7 +899,7 @@ class EventDatabase:
     @staticmethod
     async def get_submission_details(submission_id: int) -> Optional[Dict]:
         """Получить детали заявки"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT es.*, GROUP_CONCAT(ep.user_id) as participant_ids
                 FROM event_submissions es
@@ -819,7 +927,7 @@ class EventDatabase:
     async def delete_event_submission(submission_id: int) -> bool:
         """Полностью удалить заявку на событие из базы данных"""
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
+            async with connect() as db:
                 # Проверяем существование заявки
                 cursor = await db.execute("""
                     SELECT id, status FROM event_submissions WHERE id = ?
@@ -857,7 +965,7 @@ class EventDatabase:
         limit: int = 10
     ) -> List[Dict]:
         """Получить историю событий пользователя"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             cursor = await db.execute("""
                 SELECT es.id, es.event_type, es.action, es.status,
                        es.created_at, es.reviewed_at, ep.points_awarded,
@@ -903,20 +1011,23 @@ class EventDatabase:
         ))
     
     @staticmethod
-    async def _get_submission_description(submission_id: int) -> Optional[str]:
-        """Получить описание заявки (внутренний метод)"""
-        async with aiosqlite.connect(DB_PATH) as db:
+    async def _get_submission_description(submission_id: int, db: aiosqlite.Connection = None) -> Optional[str]:
+        """Получить описание заявки (внутренний метод).
+        db — уже взятое соединение, чтобы не занимать второе из пула
+        """
+        if db is not None:
             cursor = await db.execute("""
                 SELECT description FROM event_submissions WHERE id = ?
             """, (submission_id,))
-            
             row = await cursor.fetchone()
             return row[0] if row else None
+        async with connect() as db:
+            return await EventDatabase._get_submission_description(submission_id, db)
     
     @staticmethod
     async def get_guild_event_stats(guild_id: int) -> Dict:
         """Получить статистику событий гильдии"""
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect() as db:
             # Общее количество заявок по статусам
             cursor = await db.execute("""
                 SELECT status, COUNT(*) 
@@ -951,86 +1062,28 @@ class EventDatabase:
                 'active_users': active_users
             }
     
+    # Поля конфигурации гильдии (блок recruit_settings единого сервиса настроек)
+    GUILD_CONFIG_FIELDS = ['admin_role', 'moderator_role', 'points_moderator_roles', 'events_channel', 'shop_channel', 'events_data', 'points_start_date', 'points_end_date', 'default_role', 'recruit_role', 'recruiter_roles', 'guild_name', 'cooldown_hours']
+
     @staticmethod
     async def get_guild_config(guild_id: int) -> Dict:
-        """Получить конфигурацию гильдии"""
-        async with aiosqlite.connect(DB_PATH) as db:
-            cursor = await db.execute("""
-                SELECT admin_role, moderator_role, points_moderator_roles, events_channel, shop_channel, 
-                       events_data, points_start_date, points_end_date,
-                       default_role, recruit_role, recruiter_roles, guild_name, cooldown_hours
-                FROM guild_config WHERE guild_id = ?
-            """, (guild_id,))
-            
-            row = await cursor.fetchone()
-            if row:
-                return {
-                    'admin_role': row[0],
-                    'moderator_role': row[1],
-                    'points_moderator_roles': row[2],
-                    'events_channel': row[3],
-                    'shop_channel': row[4],
-                    'events_data': row[5],
-                    'points_start_date': row[6],
-                    'points_end_date': row[7],
-                    'default_role': row[8],
-                    'recruit_role': row[9],
-                    'recruiter_roles': row[10],
-                    'guild_name': row[11],
-                    'cooldown_hours': row[12]
-                }
-            return {}
+        """Получить конфигурацию гильдии.
+        Источник — единый сервис настроек (settings.db); таблица guild_config
+        перенесена в него и больше не читается и не пишется.
+        Чтение sqlite выполняется в потоке, чтобы не блокировать цикл бота.
+        """
+        from party_bot.settings_service import get_settings_service
+        return await asyncio.to_thread(lambda: get_settings_service().get_recruit_settings(guild_id))
     
     @staticmethod
     async def update_guild_config(guild_id: int, **kwargs) -> bool:
         """Обновить конфигурацию гильдии"""
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
-                # Сначала проверяем, существует ли запись
-                cursor = await db.execute("""
-                    SELECT guild_id FROM guild_config WHERE guild_id = ?
-                """, (guild_id,))
-                
-                exists = await cursor.fetchone() is not None
-                
-                if exists:
-                    # Обновляем существующую запись
-                    set_clauses = []
-                    values = []
-                    
-                    allowed = ['admin_role', 'moderator_role', 'points_moderator_roles', 'events_channel', 'shop_channel', 'events_data', 'points_start_date', 'points_end_date', 'default_role', 'recruit_role', 'recruiter_roles', 'guild_name', 'cooldown_hours']
-                    for key, value in kwargs.items():
-                        if key in allowed:
-                            set_clauses.append(f"{key} = ?")
-                            values.append(value)
-                    
-                    if set_clauses:
-                        values.append(guild_id)
-                        await db.execute(f"""
-                            UPDATE guild_config SET {', '.join(set_clauses)}
-                            WHERE guild_id = ?
-                        """, values)
-                else:
-                    # Создаем новую запись с default значениями
-                    columns = ['guild_id']
-                    values = [guild_id]
-                    placeholders = ['?']
-                    
-                    # Добавляем переданные поля
-                    allowed = ['admin_role', 'moderator_role', 'points_moderator_roles', 'events_channel', 'shop_channel', 'events_data', 'points_start_date', 'points_end_date', 'default_role', 'recruit_role', 'recruiter_roles', 'guild_name', 'cooldown_hours']
-                    for key, value in kwargs.items():
-                        if key in allowed:
-                            columns.append(key)
-                            values.append(value)
-                            placeholders.append('?')
-                    
-                    await db.execute(f"""
-                        INSERT INTO guild_config ({', '.join(columns)})
-                        VALUES ({', '.join(placeholders)})
-                    """, values)
-                
-                await db.commit()
-                return True
+            from party_bot.settings_service import get_settings_service
+            updates = {key: value for key, value in kwargs.items() if key in EventDatabase.GUILD_CONFIG_FIELDS}
+            if updates:
+                await asyncio.to_thread(lambda: get_settings_service().update_recruit_settings(guild_id, updates))
+            return True
         except Exception as e:
             logger.error(f"Ошибка обновления конфигурации гильдии: {e}")
             return False
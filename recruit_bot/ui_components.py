@@ -1784,20 +1784,8 @@ class EventConfirmationView(ui.View):
         """Настроить права доступа к треду"""
         try:
             # Получаем конфигурацию гильдии для ролей рекрутеров
-            import aiosqlite
-            from database import DB_PATH
-            
-            async with aiosqlite.connect(DB_PATH) as db:
-                cursor = await db.execute("""
-                    SELECT recruiter_roles FROM guild_config WHERE guild_id = ?
-                """, (guild.id,))
-                row = await cursor.fetchone()
-                await cursor.close()
-            
-            if not row:
-                return
-            
-            recruiter_role_ids = row[0]
+            config = await EventDatabase.get_guild_config(guild.id)
+            recruiter_role_ids = config.get('recruiter_roles')
             if not recruiter_role_ids:
                 return
             
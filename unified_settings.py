@@ -1,247 +1,190 @@
 # -*- coding: utf-8 -*-
 """
-Единая система настроек для Bigbot
-Объединяет party и recruit настройки в один JSON файл
+Единая система настроек для Bigbot (совместимая обёртка)
+Настройки хранятся в settings.db через party_bot.settings_service, а блоки
+party/recruit собираются из него. unified_settings.json больше не пишется:
+его содержимое один раз перенесено в settings.db.
+
+Запись инкрементальная: пишутся только изменённые ключи одного сервера.
+Внутри deferred() изменения копятся и записываются одной транзакцией
+на сервер при выходе. Вместо печати содержимого ведутся счётчики (get_stats).
 """
 
 import json
 import os
-import asyncio
-from typing import Dict, Any, Optional
+import threading
+import time
+from contextlib import contextmanager
+from copy import deepcopy
+from typing import Dict, Any
+
+from party_bot.settings_service import (
+    PARTY_DEFAULTS, RECRUIT_DEFAULTS, RECRUIT_KEY, get_settings_service
+)
+from party_bot.storage_gateway import write_text_atomic
 
-# Путь к единому файлу настроек
+# Путь к бывшему файлу настроек (источник однократной миграции)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 UNIFIED_SETTINGS_FILE = os.path.join(SCRIPT_DIR, "unified_settings.json")
 
 # Настройки по умолчанию для каждой гильдии
 DEFAULT_GUILD_SETTINGS = {
-    # Party Bot настройки
-    "party": {
-        "event_creator_role": None,
-        "moderator_role": None,
-        "ping_role": "everyone",
-        "monitored_channels": [],
-        "monitoring_enabled": True,
-        "cleanup_enabled": True,
-        "reminders_enabled": False,
-        "monitoring_time": [10, 20],
-        "cleanup_time": [0, 0],
-        "reminder_time": [0, 15],
-        "cleanup_channels": None,
-        "event_creator_roles": []  # Поле для множественных ролей создания событий
-    },
-    # Recruit Bot настройки
-    "recruit": {
-        "admin_role": None,
-        "moderator_role": None,
-        "points_moderator_roles": "",
-        "recruiter_roles": "",
-        "events_channel": None,
-        "shop_channel": None,
-        "events_data": None,
-        "points_start_date": "",
-        "points_end_date": "",
-        "default_role": None,
-        "recruit_role": None,
-        "guild_name": "",
-        "cooldown_hours": 1,
-        # Новые настройки для каналов
-        "forum_channel": None,  # Канал-форум для заявок в гильдию
-        "points_panel_channel": None,  # Канал для панели подачи заявок на очки
-    "recruit_panel_channel": None,  # Канал для панели подачи заявок в гильдию
-    # Служебные флаги
-    "onboarding_sent": False  # Отправлялось ли приветственное сообщение с ссылкой на веб
-    }
+    "party": PARTY_DEFAULTS,
+    "recruit": RECRUIT_DEFAULTS,
 }
 
 class UnifiedSettings:
-    """Класс для управления едиными настройками"""
-    
+    """Блоки party/recruit поверх единого сервиса настроек"""
+
     def __init__(self):
-        self.settings = self._load_settings()
-    
-    def _load_settings(self) -> Dict[str, Any]:
-        """Загрузить настройки из файла"""
-        if os.path.exists(UNIFIED_SETTINGS_FILE):
-            try:
-                with open(UNIFIED_SETTINGS_FILE, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Ошибка загрузки настроек: {e}")
-                return {"guilds": {}}
-        else:
-            return {"guilds": {}}
-    
-    def _save_settings(self):
-        """Сохранить настройки в файл"""
-        print("💾 Сохранение настроек. SETTINGS в памяти:", self.settings)
+        self.service = get_settings_service()
+        # Отложенные изменения своего потока: guild_id -> {"party": {...}, "recruit": {...}}
+        self._local = threading.local()
+        self.stats = {
+            "reads": 0,
+            "writes": 0,
+            "keys_written": 0,
+            "bytes_written": 0,
+            "write_ms_total": 0.0,
+            "last_write_ms": 0.0,
+            "deferred_flushes": 0,
+            "exports": 0,
+            "export_bytes": 0,
+        }
+
+    # ---- Отложенная запись ----
+
+    def _pending(self) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            pending = self._local.pending = {}
+            self._local.depth = 0
+        return pending
+
+    @contextmanager
+    def deferred(self):
+        """Копить изменения и записать их при выходе (по транзакции на блок сервера)"""
+        self._pending()
+        self._local.depth += 1
         try:
-            with open(UNIFIED_SETTINGS_FILE, "r", encoding="utf-8") as f:
-                disk_data = json.load(f)
-            print("📁 Настройки с диска:", disk_data)
-            
-            # Объединяем настройки
-            merged = self._deep_merge_dicts(disk_data, self.settings)
-            print("🔀 Объединённые настройки:", merged)
-            
-            with open(UNIFIED_SETTINGS_FILE, "w", encoding="utf-8") as f:
-                json.dump(merged, f, indent=2, ensure_ascii=False)
-            print("✅ Настройки сохранены в файл")
-            
-            # Перезагружаем настройки в память
-            self.settings = merged
-            print("🔄 Настройки перезагружены в память")
-            
-        except FileNotFoundError:
-            # Файла нет, создаем новый
-            with open(UNIFIED_SETTINGS_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.settings, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"Ошибка сохранения настроек: {e}")
-    
-    def _deep_merge_dicts(self, base: dict, incoming: dict) -> dict:
-        """Глубокое слияние словарей. Значения из incoming имеют приоритет."""
-        result = base.copy()
-        for key, value in incoming.items():
-            if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-                result[key] = self._deep_merge_dicts(result[key], value)
-            else:
-                result[key] = value
-        return result
-    
+            yield self
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                self.flush()
+
+    def _stage(self, guild_id: int, block: str, updates: Dict[str, Any]):
+        if not updates:
+            return
+        pending = self._pending()
+        if self._local.depth:
+            pending.setdefault(int(guild_id), {"party": {}, "recruit": {}})[block].update(updates)
+            return
+        self._write(int(guild_id), block, updates)
+
+    def flush(self):
+        """Записать отложенные изменения своего потока"""
+        pending = self._pending()
+        if not pending:
+            return
+        self._local.pending = {}
+        self.stats["deferred_flushes"] += 1
+        for guild_id, blocks in pending.items():
+            for block, updates in blocks.items():
+                if updates:
+                    self._write(guild_id, block, updates)
+
+    def _write(self, guild_id: int, block: str, updates: Dict[str, Any]):
+        started = time.perf_counter()
+        if block == "party":
+            self.service.update(guild_id, updates)
+        else:
+            self.service.update_recruit_settings(guild_id, updates)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["writes"] += 1
+        self.stats["keys_written"] += len(updates)
+        self.stats["bytes_written"] += len(json.dumps(updates, ensure_ascii=False, default=str).encode("utf-8"))
+        self.stats["write_ms_total"] += elapsed_ms
+        self.stats["last_write_ms"] = elapsed_ms
+
+    def _overlay(self, guild_id: int, block: str, values: Dict[str, Any]) -> Dict[str, Any]:
+        # Внутри deferred() поток видит свои ещё не записанные изменения
+        staged = self._pending().get(int(guild_id))
+        if staged and staged[block]:
+            values.update(deepcopy(staged[block]))
+        return values
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["avg_write_ms"] = stats["write_ms_total"] / max(stats["writes"], 1)
+        return stats
+
+    # ---- Чтение и запись блоков ----
+
     def get_guild_settings(self, guild_id: int) -> Dict[str, Any]:
-        """Получить настройки гильдии"""
-        guild_id_str = str(guild_id)
-        if "guilds" not in self.settings:
-            self.settings["guilds"] = {}
-        
-        if guild_id_str not in self.settings["guilds"]:
-            # Создаем настройки по умолчанию
-            self.settings["guilds"][guild_id_str] = {
-                "party": DEFAULT_GUILD_SETTINGS["party"].copy(),
-                "recruit": DEFAULT_GUILD_SETTINGS["recruit"].copy()
-            }
-            self._save_settings()
-        
-        return self.settings["guilds"][guild_id_str]
-    
+        """Получить настройки гильдии (чтение ничего не записывает)"""
+        return {
+            "party": self.get_party_settings(guild_id),
+            "recruit": self.get_recruit_settings(guild_id)
+        }
+
     def get_party_settings(self, guild_id: int) -> Dict[str, Any]:
         """Получить только party настройки"""
-        guild_settings = self.get_guild_settings(guild_id)
-        return guild_settings.get("party", DEFAULT_GUILD_SETTINGS["party"].copy())
-    
+        self.stats["reads"] += 1
+        party = deepcopy(PARTY_DEFAULTS)
+        stored = self.service.get_settings(int(guild_id))
+        stored.pop(RECRUIT_KEY, None)
+        party.update(stored)
+        return self._overlay(guild_id, "party", party)
+
     def get_recruit_settings(self, guild_id: int) -> Dict[str, Any]:
         """Получить только recruit настройки"""
-        guild_settings = self.get_guild_settings(guild_id)
-        return guild_settings.get("recruit", DEFAULT_GUILD_SETTINGS["recruit"].copy())
-    
+        self.stats["reads"] += 1
+        recruit = deepcopy(RECRUIT_DEFAULTS)
+        recruit.update(self.service.get_recruit_settings(int(guild_id)))
+        return self._overlay(guild_id, "recruit", recruit)
+
     def set_party_setting(self, guild_id: int, key: str, value: Any):
         """Установить party настройку"""
-        guild_settings = self.get_guild_settings(guild_id)
-        if "party" not in guild_settings:
-            guild_settings["party"] = DEFAULT_GUILD_SETTINGS["party"].copy()
-        
-        guild_settings["party"][key] = value
-        self._save_settings()
-    
+        self._stage(guild_id, "party", {key: value})
+
     def set_recruit_setting(self, guild_id: int, key: str, value: Any):
         """Установить recruit настройку"""
-        guild_settings = self.get_guild_settings(guild_id)
-        if "recruit" not in guild_settings:
-            guild_settings["recruit"] = DEFAULT_GUILD_SETTINGS["recruit"].copy()
-        
-        guild_settings["recruit"][key] = value
-        self._save_settings()
-    
+        self._stage(guild_id, "recruit", {key: value})
+
     def update_party_settings(self, guild_id: int, updates: Dict[str, Any]):
         """Обновить несколько party настроек"""
-        guild_settings = self.get_guild_settings(guild_id)
-        if "party" not in guild_settings:
-            guild_settings["party"] = DEFAULT_GUILD_SETTINGS["party"].copy()
-        
-        guild_settings["party"].update(updates)
-        self._save_settings()
-    
+        self._stage(guild_id, "party", dict(updates))
+
     def update_recruit_settings(self, guild_id: int, updates: Dict[str, Any]):
         """Обновить несколько recruit настроек"""
-        guild_settings = self.get_guild_settings(guild_id)
-        if "recruit" not in guild_settings:
-            guild_settings["recruit"] = DEFAULT_GUILD_SETTINGS["recruit"].copy()
-        
-        guild_settings["recruit"].update(updates)
-        self._save_settings()
-    
+        self._stage(guild_id, "recruit", dict(updates))
+
     def migrate_from_old_settings(self):
-        """Миграция из старых файлов настроек"""
-        print("🔄 Начинаем миграцию настроек...")
-        
-        # Миграция из settings.json (party)
-        old_settings_file = os.path.join(SCRIPT_DIR, "settings.json")
-        if os.path.exists(old_settings_file):
-            try:
-                with open(old_settings_file, "r", encoding="utf-8") as f:
-                    old_settings = json.load(f)
-                
-                if "guilds" in old_settings:
-                    for guild_id, guild_data in old_settings["guilds"].items():
-                        print(f"  📋 Мигрируем party настройки для гильдии {guild_id}")
-                        
-                        # Копируем party настройки
-                        party_settings = {}
-                        for key in DEFAULT_GUILD_SETTINGS["party"].keys():
-                            if key in guild_data:
-                                party_settings[key] = guild_data[key]
-                        
-                        self.update_party_settings(int(guild_id), party_settings)
-                
-                print("  ✅ Party настройки мигрированы")
-            except Exception as e:
-                print(f"  ❌ Ошибка миграции party настроек: {e}")
-        
-        # Миграция из recruit DB
-        try:
-            # Импортируем EventDatabase для миграции
-            from recruit_bot.database import EventDatabase
-            
-            async def migrate_recruit():
-                # Получаем список всех гильдий с настройками
-                db_path = os.path.join(SCRIPT_DIR, "potatos_recruit.db")
-                if os.path.exists(db_path):
-                    import aiosqlite
-                    async with aiosqlite.connect(db_path) as db:
-                        cursor = await db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='guild_config'")
-                        table_exists = await cursor.fetchone()
-                        
-                        if table_exists:
-                            cursor = await db.execute("SELECT guild_id FROM guild_config")
-                            guild_ids = await cursor.fetchall()
-                            
-                            for (guild_id,) in guild_ids:
-                                print(f"  📋 Мигрируем recruit настройки для гильдии {guild_id}")
-                                config = await EventDatabase.get_guild_config(guild_id)
-                                if config:
-                                    self.update_recruit_settings(guild_id, config)
-            
-            # Запускаем миграцию recruit настроек
-            try:
-                asyncio.run(migrate_recruit())
-                print("  ✅ Recruit настройки мигрированы")
-            except Exception as e:
-                print(f"  ❌ Ошибка миграции recruit настроек: {e}")
-                
-        except ImportError:
-            print("  ⚠️ Модуль recruit_bot недоступен, пропускаем миграцию recruit настроек")
-        
-        print("✅ Миграция настроек завершена")
-    
-    def export_settings(self) -> Dict[str, Any]:
-        """Экспорт всех настроек"""
-        return self.settings.copy()
-    
+        """Миграция из старых хранилищ (выполняется один раз, повторный вызов ничего не делает)"""
+        self.service.migrate_legacy_stores()
+
+    def export_settings(self, path: str = None) -> Dict[str, Any]:
+        """Экспорт всех настроек; с path — атомарная запись в JSON (временный файл + rename)"""
+        exported = {
+            "guilds": {
+                guild_id: self.get_guild_settings(int(guild_id))
+                for guild_id in self.service.db.get_all_guilds()
+            }
+        }
+        if path:
+            payload = json.dumps(exported, indent=2, ensure_ascii=False)
+            write_text_atomic(path, payload)
+            self.stats["exports"] += 1
+            self.stats["export_bytes"] = len(payload.encode("utf-8"))
+        return exported
+
     def import_settings(self, imported_settings: Dict[str, Any]):
-        """Импорт настроек"""
-        self.settings = imported_settings
-        self._save_settings()
+        """Импорт настроек (по одной записи на блок сервера)"""
+        with self.deferred():
+            for guild_id, guild_data in (imported_settings.get("guilds") or {}).items():
+                self.update_party_settings(int(guild_id), guild_data.get("party") or {})
+                self.update_recruit_settings(int(guild_id), guild_data.get("recruit") or {})
 
 # Глобальный экземпляр
 unified_settings = UnifiedSettings()